@@ -0,0 +1,25 @@
+from django.contrib import admin
+from .models import DailyRollup, LinkClickRollup
+
+
+class ReadOnlyRollupAdmin(admin.ModelAdmin):
+    """Rollups are written by `manage.py aggregate_analytics` only."""
+    date_hierarchy = 'day'
+    list_select_related = ('profile__user',)
+    search_fields = ('profile__user__username',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(ReadOnlyRollupAdmin):
+    list_display = ('day', 'profile', 'views', 'unique_visitors', 'vcard_downloads', 'link_clicks')
+
+
+@admin.register(LinkClickRollup)
+class LinkClickRollupAdmin(ReadOnlyRollupAdmin):
+    list_display = ('day', 'profile', 'label', 'clicks')
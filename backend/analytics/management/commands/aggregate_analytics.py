@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.rollups import aggregate, compact
+
+
+class Command(BaseCommand):
+    help = 'Fold new tap events into the daily/hourly rollups, then delete rolled-up raw events past retention.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000, help='Events per aggregation transaction')
+        parser.add_argument('--retention-days', type=int, default=settings.ANALYTICS_RAW_RETENTION_DAYS,
+                            help='Keep raw events this many days (default: ANALYTICS_RAW_RETENTION_DAYS)')
+        parser.add_argument('--no-compact', action='store_true', help='Only aggregate, keep all raw events')
+
+    def handle(self, *args, **options):
+        if options['retention_days'] < 2:
+            # Unique visitors of the current day are recounted from raw events
+            raise CommandError('--retention-days must be at least 2')
+
+        started = time.perf_counter()
+        processed = aggregate(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Aggregated {processed} event(s) in {time.perf_counter() - started:.2f}s.'
+        ))
+
+        if not options['no_compact']:
+            deleted = compact(options['retention_days'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Deleted {deleted} raw event(s) older than {options['retention_days']} days."
+            ))
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('profiles', '0013_profilestatuschange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TapEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('view', 'Profile view'), ('vcard', 'vCard download'), ('click', 'Link click')], max_length=10)),
+                ('label', models.CharField(blank=True, default='', help_text='Link label for clicks', max_length=100)),
+                ('visitor', models.CharField(blank=True, default='', help_text='Salted hash of client IP and user agent', max_length=16)),
+                ('weight', models.PositiveIntegerField(default=1, help_text='Events this row stands for (>1 when sampled under load)')),
+                ('occurred_at', models.DateTimeField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tap_events', to='profiles.profile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['occurred_at'], name='analytics_t_occurre_453cc7_idx'), models.Index(fields=['profile', 'occurred_at'], name='analytics_t_profile_2bdad2_idx')],
+            },
+        ),
+    ]
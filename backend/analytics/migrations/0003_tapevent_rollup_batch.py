@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+def mark_aggregated_events(apps, schema_editor):
+    """Events up to the old ID watermark were already folded into the rollups."""
+    AggregationWatermark = apps.get_model('analytics', 'AggregationWatermark')
+    TapEvent = apps.get_model('analytics', 'TapEvent')
+    watermark = AggregationWatermark.objects.filter(name='tap_events').first()
+    if watermark is not None and watermark.last_event_id:
+        TapEvent.objects.filter(id__lte=watermark.last_event_id).update(rollup_batch=watermark.last_event_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_aggregationwatermark_linkclickrollup_hourlyrollup_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tapevent',
+            name='rollup_batch',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_aggregated_events, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='tapevent',
+            index=models.Index(fields=['rollup_batch'], name='analytics_t_rollup__3f5d2a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tapevent',
+            index=models.Index(condition=models.Q(('rollup_batch__isnull', True)), fields=['id'], name='analytics_tap_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,104 @@
+from django.db import models
+
+
+class TapEvent(models.Model):
+    """
+    One card view, vCard download or link click. Written in batches by
+    analytics.recorder, never from the request itself.
+    """
+    KIND_CHOICES = [
+        ('view', 'Profile view'),
+        ('vcard', 'vCard download'),
+        ('click', 'Link click'),
+    ]
+
+    profile = models.ForeignKey('profiles.Profile', on_delete=models.CASCADE, related_name='tap_events')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    label = models.CharField(max_length=100, blank=True, default='', help_text='Link label for clicks')
+    visitor = models.CharField(max_length=16, blank=True, default='', help_text='Salted hash of client IP and user agent')
+    weight = models.PositiveIntegerField(default=1, help_text='Events this row stands for (>1 when sampled under load)')
+    occurred_at = models.DateTimeField()
+    # Set when the event is folded into the rollups: the batch that claimed it (see analytics/rollups.py)
+    rollup_batch = models.BigIntegerField(blank=True, null=True, editable=False)
+
+    def __str__(self):
+        return f"{self.kind} of profile {self.profile_id} at {self.occurred_at}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['occurred_at']),
+            models.Index(fields=['profile', 'occurred_at']),
+            models.Index(fields=['rollup_batch']),
+            models.Index(fields=['id'], condition=models.Q(rollup_batch__isnull=True), name='analytics_tap_pending_idx'),
+        ]
+
+
+class RollupCounts(models.Model):
+    """Counters shared by the daily and hourly rollups (weighted event sums)."""
+    views = models.PositiveIntegerField(default=0)
+    unique_visitors = models.PositiveIntegerField(default=0)
+    vcard_downloads = models.PositiveIntegerField(default=0)
+    link_clicks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailyRollup(RollupCounts):
+    """Per-profile totals for one day (UTC), maintained by `manage.py aggregate_analytics`."""
+    profile = models.ForeignKey('profiles.Profile', on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+
+    def __str__(self):
+        return f"Profile {self.profile_id} on {self.day}"
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'day'], name='analytics_daily_profile_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+
+class HourlyRollup(RollupCounts):
+    """Per-profile totals for one hour, maintained by `manage.py aggregate_analytics`."""
+    profile = models.ForeignKey('profiles.Profile', on_delete=models.CASCADE, related_name='hourly_rollups')
+    hour = models.DateTimeField()
+
+    def __str__(self):
+        return f"Profile {self.profile_id} at {self.hour}"
+
+    class Meta:
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'hour'], name='analytics_hourly_profile_hour'),
+        ]
+
+
+class LinkClickRollup(models.Model):
+    """Clicks per profile link label per day."""
+    profile = models.ForeignKey('profiles.Profile', on_delete=models.CASCADE, related_name='link_click_rollups')
+    day = models.DateField()
+    label = models.CharField(max_length=100)
+    clicks = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.label} of profile {self.profile_id} on {self.day}"
+
+    class Meta:
+        ordering = ['-day', 'label']
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'day', 'label'], name='analytics_link_profile_day_label'),
+        ]
+
+
+class AggregationWatermark(models.Model):
+    """Highest TapEvent ID already folded into the rollups; its row also serializes aggregation runs."""
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_event_id}"
@@ -0,0 +1,225 @@
+"""
+Buffered recording of card views, vCard downloads and link clicks.
+
+Requests only append a tuple to an in-memory buffer; a background thread in
+each worker process writes the buffer with one ``bulk_create`` whenever
+ANALYTICS_FLUSH_SIZE events are waiting or every ANALYTICS_FLUSH_INTERVAL
+seconds. Recording never touches the database and never blocks on a flush.
+
+Under backpressure (a slow or unavailable database) the buffer is bounded:
+past half of ANALYTICS_BUFFER_CAPACITY only every n-th event is kept, with a
+``weight`` of n so totals stay right, and at capacity events are dropped.
+Counters for all of this, and for the time spent flushing, are kept in
+``recorder.stats()``.
+"""
+import atexit
+import functools
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from profiles.models import Profile
+from .models import TapEvent
+
+logger = logging.getLogger(__name__)
+
+RESOLVE_CHUNK_SIZE = 500
+MAX_SAMPLE_RATE = 10
+
+
+def client_ip(meta):
+    """
+    The socket peer, or the client address forwarded by a proxy in
+    TRUSTED_PROXIES (see DEPLOYMENT.md). X-Forwarded-For is read from the
+    right: the entries on its left come from the client and can be forged.
+    """
+    peer = meta.get('REMOTE_ADDR', '')
+    if peer not in settings.TRUSTED_PROXIES:
+        return peer
+    real_ip = meta.get('HTTP_X_REAL_IP', '').strip()
+    if real_ip:
+        return real_ip
+    for address in reversed(meta.get('HTTP_X_FORWARDED_FOR', '').split(',')):
+        address = address.strip()
+        if address and address not in settings.TRUSTED_PROXIES:
+            return address
+    return peer
+
+
+@functools.lru_cache(maxsize=1)
+def _visitor_key():
+    return hashlib.sha256(settings.SECRET_KEY.encode()).digest()
+
+
+def visitor_hash(ip, user_agent):
+    """Stable pseudonymous visitor ID; the raw address is never stored."""
+    return hashlib.blake2b(f'{ip}|{user_agent}'.encode(), digest_size=8, key=_visitor_key()).hexdigest()
+
+
+class EventRecorder:
+    """Per-process event buffer with a background flusher thread."""
+
+    def __init__(self, flush_size, flush_interval, capacity):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._events = []
+        self._seen = 0
+        self._stats = {
+            'recorded': 0,
+            'sampled_out': 0,
+            'dropped': 0,
+            'written': 0,
+            'unknown_profile': 0,
+            'failed': 0,
+            'flushes': 0,
+            'flush_seconds_total': 0.0,
+            'last_flush_seconds': 0.0,
+            'max_flush_seconds': 0.0,
+        }
+
+    def record(self, kind, username, meta, label=''):
+        """Buffer one event. Returns False if it was sampled out or dropped."""
+        if self._pid != os.getpid():
+            # Forked worker: the parent's buffer and thread don't belong to us
+            self._reset()
+        occurred_at = timezone.now()
+        with self._lock:
+            size = len(self._events)
+            weight = 1
+            if size >= self.capacity:
+                self._stats['dropped'] += 1
+                return False
+            half = self.capacity // 2
+            if size >= half:
+                # Keep 1 in `rate` events, more aggressively the fuller the buffer
+                weight = min(2 + (size - half) * (MAX_SAMPLE_RATE - 2) // max(half, 1), MAX_SAMPLE_RATE)
+                self._seen += 1
+                if self._seen % weight:
+                    self._stats['sampled_out'] += 1
+                    return False
+            self._events.append((
+                kind, username, label[:100], client_ip(meta),
+                meta.get('HTTP_USER_AGENT', '')[:256], weight, occurred_at,
+            ))
+            self._stats['recorded'] += 1
+            start_thread = self._thread is None
+            if start_thread:
+                self._thread = threading.Thread(target=self._run, name='analytics-flusher', daemon=True)
+        if start_thread:
+            self._thread.start()
+        if size + 1 >= self.flush_size:
+            self._wakeup.set()
+        return True
+
+    def _run(self):
+        atexit.register(self.flush)
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Analytics flush failed')
+
+    def flush(self):
+        """Write every buffered event. Returns the number of rows written."""
+        with self._lock:
+            events, self._events = self._events, []
+        if not events:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            usernames = list({event[1] for event in events})
+            profile_ids = {}
+            for i in range(0, len(usernames), RESOLVE_CHUNK_SIZE):
+                profile_ids.update(
+                    Profile.objects.filter(user__username__in=usernames[i:i + RESOLVE_CHUNK_SIZE])
+                    .values_list('user__username', 'pk')
+                )
+            rows = [
+                TapEvent(
+                    profile_id=profile_ids[username],
+                    kind=kind,
+                    label=label,
+                    visitor=visitor_hash(ip, user_agent),
+                    weight=weight,
+                    occurred_at=occurred_at,
+                )
+                for kind, username, label, ip, user_agent, weight, occurred_at in events
+                if username in profile_ids
+            ]
+            TapEvent.objects.bulk_create(rows, batch_size=RESOLVE_CHUNK_SIZE)
+        except Exception:
+            with self._lock:
+                self._stats['failed'] += len(events)
+            logger.exception('Could not write %d analytics events', len(events))
+            return 0
+        finally:
+            close_old_connections()
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            stats = self._stats
+            stats['flushes'] += 1
+            stats['written'] += len(rows)
+            stats['unknown_profile'] += len(events) - len(rows)
+            stats['flush_seconds_total'] += elapsed
+            stats['last_flush_seconds'] = elapsed
+            stats['max_flush_seconds'] = max(stats['max_flush_seconds'], elapsed)
+        logger.debug('Wrote %d analytics events in %.1f ms', len(rows), elapsed * 1000)
+        return len(rows)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'buffered': len(self._events), 'pid': self._pid}
+
+
+recorder = EventRecorder(
+    flush_size=settings.ANALYTICS_FLUSH_SIZE,
+    flush_interval=settings.ANALYTICS_FLUSH_INTERVAL,
+    capacity=settings.ANALYTICS_BUFFER_CAPACITY,
+)
+
+
+def record(kind, username, request, label=''):
+    """Record an event for the profile of ``username`` (no database access)."""
+    if settings.ANALYTICS_ENABLED:
+        recorder.record(kind, username, request.META, label)
+
+
+def track(kind):
+    """View decorator recording ``kind`` for successful (200/304) responses; sync or async views."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, username, *args, **kwargs):
+                response = await view(request, username, *args, **kwargs)
+                if response.status_code in (200, 304):
+                    record(kind, username, request)
+                return response
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, username, *args, **kwargs):
+            response = view(request, username, *args, **kwargs)
+            if response.status_code in (200, 304):
+                record(kind, username, request)
+            return response
+        return wrapper
+    return decorator
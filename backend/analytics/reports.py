@@ -0,0 +1,113 @@
+"""
+Analytics read models for the dashboard and the admin.
+
+Everything here reads the rollup tables only; a chart over N days is one
+range query on the (profile, day) or day index, never a scan of raw events.
+"""
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import DailyRollup, HourlyRollup, LinkClickRollup
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 365
+MAX_HOURLY_DAYS = 14
+COUNTERS = ('views', 'unique_visitors', 'vcard_downloads', 'link_clicks')
+TOTALS = ('views', 'vcard_downloads', 'link_clicks')  # unique visitors don't add up across days
+
+
+def parse_range(params):
+    """(days, granularity) from the ``days`` and ``granularity`` query params."""
+    granularity = params.get('granularity', 'day')
+    if granularity not in ('day', 'hour'):
+        raise ValidationError({'granularity': ['Must be "day" or "hour"']})
+    limit = MAX_HOURLY_DAYS if granularity == 'hour' else MAX_DAYS
+    try:
+        days = int(params.get('days', DEFAULT_DAYS))
+    except ValueError:
+        raise ValidationError({'days': ['Must be an integer']})
+    if not 1 <= days <= limit:
+        raise ValidationError({'days': [f'Must be between 1 and {limit} for {granularity} granularity']})
+    return days, granularity
+
+
+def _buckets(days, granularity):
+    """Every bucket start in the range, oldest first (today/this hour included)."""
+    if granularity == 'hour':
+        end = timezone.now().replace(minute=0, second=0, microsecond=0)
+        return [end - timedelta(hours=i) for i in range(days * 24 - 1, -1, -1)]
+    today = timezone.now().date()
+    return [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+
+
+def _series(rows, buckets, key):
+    """Dense series: one entry per bucket, zeros where nothing happened."""
+    by_bucket = {row[key]: row for row in rows}
+    empty = dict.fromkeys(COUNTERS, 0)
+    return [
+        {'start': bucket.isoformat(), **{name: by_bucket.get(bucket, empty)[name] for name in COUNTERS}}
+        for bucket in buckets
+    ]
+
+
+def _totals(series):
+    return {name: sum(point[name] for point in series) for name in TOTALS}
+
+
+def profile_report(profile_id, days=DEFAULT_DAYS, granularity='day'):
+    buckets = _buckets(days, granularity)
+    first_day = buckets[0] if granularity == 'day' else buckets[0].date()
+    if granularity == 'hour':
+        rows = HourlyRollup.objects.filter(profile_id=profile_id, hour__gte=buckets[0])
+        series = _series(rows.values('hour', *COUNTERS), buckets, 'hour')
+    else:
+        rows = DailyRollup.objects.filter(profile_id=profile_id, day__gte=buckets[0])
+        series = _series(rows.values('day', *COUNTERS), buckets, 'day')
+
+    links = (
+        LinkClickRollup.objects.filter(profile_id=profile_id, day__gte=first_day)
+        .values('label')
+        .annotate(clicks=Sum('clicks'))
+        .order_by('-clicks', 'label')
+    )
+    return {
+        'granularity': granularity,
+        'days': days,
+        'totals': _totals(series),
+        'series': series,
+        'links': list(links),
+    }
+
+
+def site_report(days=DEFAULT_DAYS, top=10):
+    """Totals across all profiles per day, plus the most viewed profiles."""
+    buckets = _buckets(days, 'day')
+    rows = DailyRollup.objects.filter(day__gte=buckets[0])
+    # Annotations can't reuse the field names, hence the total_ prefix
+    per_day = rows.values('day').annotate(**{f'total_{name}': Sum(name) for name in COUNTERS})
+    series = _series(
+        [{'day': row['day'], **{name: row[f'total_{name}'] for name in COUNTERS}} for row in per_day],
+        buckets, 'day',
+    )
+    top_profiles = (
+        rows.values('profile_id', 'profile__user__username')
+        .annotate(**{f'total_{name}': Sum(name) for name in TOTALS})
+        .order_by('-total_views')[:top]
+    )
+    return {
+        'granularity': 'day',
+        'days': days,
+        'totals': _totals(series),
+        'series': series,
+        'top_profiles': [
+            {
+                'profile_id': row['profile_id'],
+                'username': row['profile__user__username'],
+                **{name: row[f'total_{name}'] for name in TOTALS},
+            }
+            for row in top_profiles
+        ],
+    }
@@ -0,0 +1,194 @@
+"""
+Incremental aggregation of TapEvents into daily, hourly and link rollups.
+
+Each batch claims up to ``batch_size`` events not yet aggregated by
+stamping them with a batch number (``rollup_batch``), folds exactly the
+claimed events into the rollup rows and commits both together, so every
+event is counted exactly once. View, download and click counters are
+incremented by the batch's weighted sums. Unique visitors can't be summed
+across batches; for every bucket a batch touches they are recounted from
+the raw events, which is why raw events are kept for some days (see
+``compact``) before being deleted.
+
+Event IDs don't become visible in order: every worker process flushes its
+own buffer, and bulk_create may split a flush into several INSERTs, so a
+transaction holding lower IDs can commit after higher ones are visible.
+Claiming rows instead of advancing an ID watermark means such late events
+are simply claimed by the next run, and ``compact`` only deletes claimed
+events.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import (
+    AggregationWatermark, DailyRollup, HourlyRollup, LinkClickRollup, TapEvent,
+)
+
+WATERMARK_NAME = 'tap_events'
+
+# Event kind -> rollup counter
+KIND_FIELDS = {
+    'view': 'views',
+    'vcard': 'vcard_downloads',
+    'click': 'link_clicks',
+}
+
+
+def _counts(events, bucket):
+    """{(profile_id, bucket): {field: weighted total}} for a batch."""
+    totals = defaultdict(dict)
+    rows = (
+        events.annotate(bucket=bucket)
+        .values('profile_id', 'bucket', 'kind')
+        .annotate(total=Sum('weight'))
+    )
+    for row in rows:
+        field = KIND_FIELDS.get(row['kind'])
+        if field:
+            totals[(row['profile_id'], row['bucket'])][field] = row['total']
+    return totals
+
+
+def _unique_visitors(keys, bucket, bucket_size):
+    """Distinct viewing visitors of each (profile_id, bucket) key, from the raw events."""
+    if not keys:
+        return {}
+    starts = [key[1] for key in keys]
+    start, end = min(starts), max(starts) + bucket_size
+    if not isinstance(start, datetime):  # day buckets
+        start = timezone.make_aware(datetime.combine(start, time.min))
+        end = timezone.make_aware(datetime.combine(end, time.min))
+    rows = (
+        TapEvent.objects.filter(
+            kind='view',
+            rollup_batch__isnull=False,
+            profile_id__in={key[0] for key in keys},
+            occurred_at__gte=start,
+            occurred_at__lt=end,
+        )
+        .exclude(visitor='')
+        .annotate(bucket=bucket)
+        .values('profile_id', 'bucket')
+        .annotate(visitors=Count('visitor', distinct=True))
+    )
+    return {
+        (row['profile_id'], row['bucket']): row['visitors']
+        for row in rows
+        if (row['profile_id'], row['bucket']) in keys
+    }
+
+
+def _apply(model, bucket_field, counts, visitors):
+    """Add ``counts`` to the rollup rows (creating missing ones) and set unique visitors."""
+    if not counts:
+        return
+    existing = {
+        (row.profile_id, getattr(row, bucket_field)): row
+        for row in model.objects.filter(
+            profile_id__in={key[0] for key in counts},
+            **{f'{bucket_field}__in': {key[1] for key in counts}},
+        )
+    }
+    to_create, to_update = [], []
+    for key, fields in counts.items():
+        row = existing.get(key)
+        if row is None:
+            row = model(profile_id=key[0], **{bucket_field: key[1]})
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        for field, total in fields.items():
+            setattr(row, field, getattr(row, field) + total)
+        # Never lower: the raw events of an old bucket may already be compacted
+        row.unique_visitors = max(row.unique_visitors, visitors.get(key, 0))
+    model.objects.bulk_create(to_create)
+    model.objects.bulk_update(to_update, ['views', 'unique_visitors', 'vcard_downloads', 'link_clicks'])
+
+
+def _apply_link_clicks(events):
+    rows = (
+        events.filter(kind='click')
+        .annotate(day=TruncDate('occurred_at'))
+        .values('profile_id', 'day', 'label')
+        .annotate(total=Sum('weight'))
+    )
+    counts = {(row['profile_id'], row['day'], row['label']): row['total'] for row in rows}
+    if not counts:
+        return
+    existing = {
+        (row.profile_id, row.day, row.label): row
+        for row in LinkClickRollup.objects.filter(
+            profile_id__in={key[0] for key in counts},
+            day__in={key[1] for key in counts},
+            label__in={key[2] for key in counts},
+        )
+    }
+    to_create, to_update = [], []
+    for key, total in counts.items():
+        row = existing.get(key)
+        if row is None:
+            to_create.append(LinkClickRollup(profile_id=key[0], day=key[1], label=key[2], clicks=total))
+        else:
+            row.clicks += total
+            to_update.append(row)
+    LinkClickRollup.objects.bulk_create(to_create)
+    LinkClickRollup.objects.bulk_update(to_update, ['clicks'])
+
+
+def aggregate(batch_size=50000):
+    """
+    Fold every event not yet aggregated into the rollups, ``batch_size``
+    events per transaction. Returns the number of events processed.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            # Locking the watermark row keeps concurrent runs from interleaving
+            watermark, created = AggregationWatermark.objects.select_for_update().get_or_create(
+                name=WATERMARK_NAME
+            )
+            pending = TapEvent.objects.filter(rollup_batch__isnull=True).order_by('id')
+            upper_id = (
+                pending.values_list('id', flat=True)[batch_size - 1:batch_size].first()
+                or pending.aggregate(last=Max('id'))['last']
+            )
+            if upper_id is None:
+                return processed
+            # The batch number is the ID of its last event, which no earlier batch
+            # can have used: that event was unclaimed until now
+            claimed = pending.filter(id__lte=upper_id).update(rollup_batch=upper_id)
+            events = TapEvent.objects.filter(rollup_batch=upper_id)
+
+            hourly = _counts(events, TruncHour('occurred_at'))
+            daily = _counts(events, TruncDate('occurred_at'))
+            _apply(HourlyRollup, 'hour', hourly, _unique_visitors(
+                hourly.keys(), TruncHour('occurred_at'), timedelta(hours=1)
+            ))
+            _apply(DailyRollup, 'day', daily, _unique_visitors(
+                daily.keys(), TruncDate('occurred_at'), timedelta(days=1)
+            ))
+            _apply_link_clicks(events)
+
+            processed += claimed
+            watermark.last_event_id = max(watermark.last_event_id, upper_id)
+            watermark.save(update_fields=['last_event_id', 'updated_at'])
+
+
+def compact(days, chunk_size=10000):
+    """
+    Delete raw events older than ``days`` days that are already aggregated.
+    Returns the number of deleted events.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    stale = TapEvent.objects.filter(occurred_at__lt=cutoff, rollup_batch__isnull=False)
+    deleted = 0
+    while True:
+        ids = list(stale.order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += TapEvent.objects.filter(id__in=ids).delete()[0]
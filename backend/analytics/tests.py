@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .models import DailyRollup, TapEvent
+from .recorder import client_ip
+from .rollups import aggregate, compact
+
+User = get_user_model()
+
+
+class AggregateTests(TestCase):
+    def setUp(self):
+        self.profile = User.objects.create_user('owner', 'owner@example.com', 'password123').profile
+
+    def event(self, occurred_at, **fields):
+        return TapEvent.objects.create(profile=self.profile, kind='view', occurred_at=occurred_at, **fields)
+
+    def views(self):
+        return sum(DailyRollup.objects.filter(profile=self.profile).values_list('views', flat=True))
+
+    def test_events_committed_out_of_id_order_are_still_counted(self):
+        now = timezone.now()
+        self.event(now, id=100)
+        self.event(now, id=101)
+        self.assertEqual(aggregate(), 2)
+
+        # Another worker's flush with lower IDs commits only now
+        self.event(now, id=50)
+        self.assertEqual(aggregate(), 1)
+        self.assertEqual(self.views(), 3)
+        self.assertEqual(aggregate(), 0)
+
+    def test_batches_count_each_event_once(self):
+        now = timezone.now()
+        for _ in range(5):
+            self.event(now)
+        self.assertEqual(aggregate(batch_size=2), 5)
+        self.assertEqual(self.views(), 5)
+
+    def test_compact_keeps_events_not_yet_aggregated(self):
+        old = timezone.now() - timedelta(days=40)
+        self.event(old, id=100)
+        aggregate()
+        self.event(old, id=50)
+
+        self.assertEqual(compact(30), 1)
+        self.assertEqual(list(TapEvent.objects.values_list('id', flat=True)), [50])
+
+
+class ClientIPTests(SimpleTestCase):
+    forged = {'HTTP_X_REAL_IP': '203.0.113.9', 'HTTP_X_FORWARDED_FOR': '203.0.113.9'}
+
+    @override_settings(TRUSTED_PROXIES=[])
+    def test_forwarded_headers_are_ignored_by_default(self):
+        self.assertEqual(client_ip({'REMOTE_ADDR': '198.51.100.7', **self.forged}), '198.51.100.7')
+
+    @override_settings(TRUSTED_PROXIES=['127.0.0.1'])
+    def test_trusted_proxy_headers_name_the_visitor(self):
+        self.assertEqual(client_ip({'REMOTE_ADDR': '127.0.0.1', 'HTTP_X_REAL_IP': '198.51.100.7'}), '198.51.100.7')
+        # The client's own X-Forwarded-For entries come first; nginx appends the real peer
+        meta = {'REMOTE_ADDR': '127.0.0.1', 'HTTP_X_FORWARDED_FOR': '203.0.113.9, 198.51.100.7'}
+        self.assertEqual(client_ip(meta), '198.51.100.7')
+        self.assertEqual(client_ip({'REMOTE_ADDR': '127.0.0.1'}), '127.0.0.1')
+        self.assertEqual(client_ip({'REMOTE_ADDR': '198.51.100.7', **self.forged}), '198.51.100.7')
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('my-profile/stats/', views.get_my_stats, name='my-stats'),
+    path('admin/users/<int:profile_id>/stats/', views.get_user_stats, name='admin-user-stats'),
+    path('admin/stats/', views.get_site_stats, name='admin-site-stats'),
+]
@@ -0,0 +1,47 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
+from django.shortcuts import get_object_or_404
+
+from config.routers import reads_from_replica
+from profiles.models import Profile
+from users.authentication import profile_id_for
+from .reports import parse_range, profile_report, site_report
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@reads_from_replica
+def get_my_stats(request):
+    """
+    Views, vCard downloads and link clicks of the authenticated user's card.
+    Query params: days (default 30), granularity=day|hour.
+    """
+    profile_id = profile_id_for(request.user)
+    if profile_id is None:
+        return Response(
+            {'error': 'Profile not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    days, granularity = parse_range(request.query_params)
+    return Response(profile_report(profile_id, days, granularity))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@reads_from_replica
+def get_user_stats(request, profile_id):
+    """Stats of one user's card (admin only); same params as get_my_stats."""
+    profile = get_object_or_404(Profile, pk=profile_id)
+    days, granularity = parse_range(request.query_params)
+    return Response(profile_report(profile.pk, days, granularity))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@reads_from_replica
+def get_site_stats(request):
+    """Daily totals across all cards and the most viewed profiles (admin only). Query param: days."""
+    days, granularity = parse_range({'days': request.query_params.get('days', 30)})
+    return Response(site_report(days))
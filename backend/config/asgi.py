@@ -2,6 +2,10 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Run it with SERVER_MODE=asgi so the public read endpoints use their async
+views (profiles/async_views.py), e.g.::
+
+    gunicorn config.asgi:application -k uvicorn_worker.UvicornWorker --workers 2
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -15,4 +19,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
 
+# Load the short code index now rather than on the first NFC tap
+from profiles.shortcodes import index as short_codes
 
+short_codes.start()
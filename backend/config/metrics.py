@@ -0,0 +1,430 @@
+"""
+Request metrics: per-request phase timings and Prometheus histograms.
+
+``PerformanceMiddleware`` (config/middleware.py) measures every request and
+feeds ``registry``, one per worker process. Each worker writes its
+registry to METRICS_DIR/<pid>-<generation>.json at most every
+METRICS_FLUSH_INTERVAL seconds (atomically), and ``/api/metrics/`` sums the
+files of all workers into the Prometheus text format. The generation is
+random per process, so a reused PID never overwrites an exited worker's
+file. On each scrape the files of exited workers are folded into
+retired.json and removed, so totals don't go backwards when Gunicorn
+recycles a worker and the directory doesn't grow.
+
+Serializer and renderer time is collected with ``timed('serialize')``,
+used by TimedSerializerMixin and TimedJSONRenderer; SQL queries by
+``count_query``, installed on every database connection as it connects.
+"""
+import atexit
+import contextvars
+import fcntl
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework.renderers import JSONRenderer
+
+# Histogram name -> (help, upper bounds)
+HISTOGRAMS = {
+    'card_http_request_duration_seconds': (
+        'Wall time of requests, middleware included',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'card_http_db_queries': (
+        'SQL queries per request',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    'card_http_db_duration_seconds': (
+        'Time spent in SQL per request',
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+    ),
+    'card_http_serialize_duration_seconds': (
+        'Time spent in serializers and renderers per request',
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+    ),
+    'card_http_response_bytes': (
+        'Response body size',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+}
+REQUESTS_TOTAL = 'card_http_requests_total'
+
+# Labelled counters incremented with registry.increment(): name -> help
+COUNTERS = {
+    'card_db_read_routes_total': 'Database chosen for the reads of a view, by reason (see config/routers.py)',
+}
+
+# Analytics recorder counter -> outcome label of card_analytics_events_total
+ANALYTICS_OUTCOMES = ('recorded', 'sampled_out', 'dropped', 'written', 'unknown_profile', 'failed')
+
+_phases = contextvars.ContextVar('metric_phases', default=None)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to ``phase`` of the current request (outermost block only)."""
+    phases = _phases.get()
+    if phases is None or phases.get(f'_{phase}_depth'):
+        yield
+        return
+    phases[f'_{phase}_depth'] = 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - started
+        phases[f'_{phase}_depth'] = 0
+
+
+def start_request():
+    """Begin collecting phases for this request; returns the dict they land in."""
+    phases = {}
+    return phases, _phases.set(phases)
+
+
+def end_request(token):
+    _phases.reset(token)
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper adding each query and its time to the current request."""
+    phases = _phases.get()
+    if phases is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        phases['db_queries'] = phases.get('db_queries', 0) + 1
+        phases['db'] = phases.get('db', 0.0) + time.perf_counter() - started
+
+
+@receiver(connection_created)
+def _install_query_counter(sender, connection, **kwargs):
+    # Connections are per thread, and under ASGI queries run in other threads
+    # than the middleware, so every connection carries the wrapper for good
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def mark(name):
+    """Store the current time as ``name`` in the phases of this request."""
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = time.perf_counter()
+
+
+class TimedSerializerMixin:
+    """Serializer mixin counting to_representation() time as 'serialize'."""
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class Registry:
+    """Counters and histograms of one worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._generation = secrets.token_hex(4)
+        self._requests = {}  # (view, method, status) -> count
+        self._counters = {}  # (name, ((label, value), ...)) -> count
+        self._histograms = {name: {} for name in HISTOGRAMS}  # name -> view -> [bucket counts..., +Inf, sum]
+        self._last_flush = 0.0
+
+    def observe(self, view, method, status, values):
+        """Record one request; ``values`` maps histogram names to observations."""
+        if self._pid != os.getpid():
+            self._reset()  # forked worker: start from zero, the parent has its own file
+        with self._lock:
+            key = (view, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for name, value in values.items():
+                bounds = HISTOGRAMS[name][1]
+                series = self._histograms[name].get(view)
+                if series is None:
+                    series = self._histograms[name][view] = [0] * (len(bounds) + 2)
+                for i, bound in enumerate(bounds):
+                    if value <= bound:
+                        series[i] += 1
+                        break
+                else:
+                    series[len(bounds)] += 1
+                series[-1] += value
+            due = time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def increment(self, name, **labels):
+        """Add one to the counter ``name`` (declared in COUNTERS) with these labels."""
+        if self._pid != os.getpid():
+            self._reset()
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def snapshot(self):
+        from analytics.recorder import recorder
+
+        with self._lock:
+            data = {
+                'pid': self._pid,
+                'updated_at': time.time(),
+                'requests': [[*key, count] for key, count in self._requests.items()],
+                'counters': [[name, dict(labels), count] for (name, labels), count in self._counters.items()],
+                'histograms': {name: {view: list(series) for view, series in views.items()}
+                               for name, views in self._histograms.items()},
+            }
+        data['analytics'] = recorder.stats()
+        return data
+
+    def flush(self):
+        """Write this worker's snapshot for the metrics endpoint."""
+        self._last_flush = time.monotonic()
+        try:
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            path = os.path.join(settings.METRICS_DIR, f'{self._pid}-{self._generation}.json')
+            temp_path = f'{path}.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temp_path, path)
+        except OSError:
+            pass  # metrics must never fail a request
+
+
+registry = Registry()
+
+
+@atexit.register
+def _flush_at_exit():
+    if registry._requests and registry._pid == os.getpid():  # only processes that served requests
+        registry.flush()
+
+
+RETIRED_FILE = 'retired.json'
+
+
+def _load_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # being replaced right now
+
+
+def _load_snapshots():
+    snapshots = []
+    try:
+        names = os.listdir(settings.METRICS_DIR)
+    except FileNotFoundError:
+        return snapshots
+    for name in names:
+        if name.endswith('.json'):
+            snapshot = _load_snapshot(os.path.join(settings.METRICS_DIR, name))
+            if snapshot is not None:
+                snapshots.append(snapshot)
+    return snapshots
+
+
+def _worker_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by someone else
+    return True
+
+
+def _merge(snapshots):
+    """One snapshot holding the counter and histogram totals of several."""
+    requests, counters, histograms, analytics = {}, {}, {}, {}
+    for snapshot in snapshots:
+        for view, method, status, count in snapshot.get('requests', []):
+            requests[(view, method, status)] = requests.get((view, method, status), 0) + count
+        for name, labels, count in snapshot.get('counters', []):
+            key = (name, tuple(sorted(labels.items())))
+            counters[key] = counters.get(key, 0) + count
+        for name, views in snapshot.get('histograms', {}).items():
+            for view, series in views.items():
+                total = histograms.setdefault(name, {}).get(view)
+                histograms[name][view] = series if total is None else [a + b for a, b in zip(total, series)]
+        for key, value in (snapshot.get('analytics') or {}).items():
+            if key not in ('buffered', 'pid'):  # a gauge and an identity, not totals
+                analytics[key] = analytics.get(key, 0) + value
+    return {
+        'pid': None,
+        'updated_at': 0,
+        'requests': [[*key, count] for key, count in requests.items()],
+        'counters': [[name, dict(labels), count] for (name, labels), count in counters.items()],
+        'histograms': histograms,
+        'analytics': analytics,
+    }
+
+
+def _retire_exited_workers():
+    """Fold the files of workers that exited into retired.json."""
+    directory = settings.METRICS_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    exited = []
+    for name in names:
+        pid = name[:-len('.json')].partition('-')[0]  # '<pid>-<generation>.json', or '<pid>.json' from before
+        if name.endswith('.json') and name != RETIRED_FILE and pid.isdigit() and not _worker_alive(int(pid)):
+            exited.append(os.path.join(directory, name))
+    if not exited:
+        return
+    # Concurrent scrapes must not fold the same file twice
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired_path = os.path.join(directory, RETIRED_FILE)
+        exited = [path for path in exited if os.path.exists(path)]
+        snapshots = [snapshot for snapshot in map(_load_snapshot, exited) if snapshot is not None]
+        retired = _load_snapshot(retired_path)
+        if retired is not None:
+            snapshots.append(retired)
+        temp_path = f'{retired_path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(_merge(snapshots), f)
+        os.replace(temp_path, retired_path)
+        for path in exited:
+            os.remove(path)
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(snapshots):
+    """Sum worker snapshots into the Prometheus text exposition format."""
+    requests = {}
+    counters = {name: {} for name in COUNTERS}
+    histograms = {name: {} for name in HISTOGRAMS}
+    analytics = dict.fromkeys(ANALYTICS_OUTCOMES, 0)
+    flushes, flush_seconds, buffered = 0, 0.0, 0
+    stale_after = time.time() - max(60, settings.METRICS_FLUSH_INTERVAL * 4)
+    for snapshot in snapshots:
+        for view, method, status, count in snapshot.get('requests', []):
+            requests[(view, method, status)] = requests.get((view, method, status), 0) + count
+        for name, labels, count in snapshot.get('counters', []):
+            if name in counters:
+                key = tuple(sorted(labels.items()))
+                counters[name][key] = counters[name].get(key, 0) + count
+        for name, views in snapshot.get('histograms', {}).items():
+            if name not in histograms:
+                continue
+            for view, series in views.items():
+                total = histograms[name].get(view)
+                histograms[name][view] = series if total is None else [a + b for a, b in zip(total, series)]
+        stats = snapshot.get('analytics') or {}
+        for outcome in ANALYTICS_OUTCOMES:
+            analytics[outcome] += stats.get(outcome, 0)
+        flushes += stats.get('flushes', 0)
+        flush_seconds += stats.get('flush_seconds_total', 0.0)
+        if snapshot.get('updated_at', 0) >= stale_after:
+            buffered += stats.get('buffered', 0)  # a gauge: only workers that are still alive
+
+    lines = [
+        f'# HELP {REQUESTS_TOTAL} Requests by URL name, method and status',
+        f'# TYPE {REQUESTS_TOTAL} counter',
+    ]
+    for (view, method, status), count in sorted(requests.items()):
+        lines.append(f'{REQUESTS_TOTAL}{_labels(view=view, method=method, status=status)} {count}')
+
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for labels, count in sorted(counters[name].items()):
+            lines.append(f'{name}{_labels(**dict(labels))} {count}')
+
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for view, series in sorted(histograms[name].items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(view=view, le=_number(bound))} {cumulative}')
+            cumulative += series[len(bounds)]
+            lines.append(f'{name}_bucket{_labels(view=view, le="+Inf")} {cumulative}')
+            lines.append(f'{name}_sum{_labels(view=view)} {_number(series[-1])}')
+            lines.append(f'{name}_count{_labels(view=view)} {cumulative}')
+
+    lines += [
+        '# HELP card_analytics_events_total Tap analytics events by outcome (see analytics/recorder.py)',
+        '# TYPE card_analytics_events_total counter',
+    ]
+    lines += [
+        f'card_analytics_events_total{_labels(outcome=outcome)} {count}' for outcome, count in analytics.items()
+    ]
+    lines += [
+        '# HELP card_analytics_flushes_total Analytics buffer flushes',
+        '# TYPE card_analytics_flushes_total counter',
+        f'card_analytics_flushes_total {flushes}',
+        '# HELP card_analytics_flush_seconds_total Time spent writing analytics events',
+        '# TYPE card_analytics_flush_seconds_total counter',
+        f'card_analytics_flush_seconds_total {_number(float(flush_seconds))}',
+        '# HELP card_analytics_buffered Analytics events waiting in worker buffers',
+        '# TYPE card_analytics_buffered gauge',
+        f'card_analytics_buffered {buffered}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def _allowed(request):
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and hmac.compare_digest(authorization, f'Bearer {token}'):
+        return True
+    # Behind a reverse proxy every client connects from the proxy's address,
+    # so proxied requests are never let in by address
+    proxied = 'HTTP_X_FORWARDED_FOR' in request.META or 'HTTP_X_REAL_IP' in request.META
+    if not proxied and request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated and user.is_staff
+
+
+def _collect():
+    registry.flush()
+    try:
+        _retire_exited_workers()
+    except OSError:
+        pass  # summed as they are, retired on a later scrape
+    return render_prometheus(_load_snapshots())
+
+
+async def metrics_view(request):
+    """Prometheus scrape endpoint, summed over every worker process."""
+    # request.user loads the session from the database
+    if not await sync_to_async(_allowed)(request):
+        return HttpResponseForbidden('Forbidden')
+    # File reads off the event loop under ASGI; no database access, so any thread will do
+    body = await sync_to_async(_collect, thread_sensitive=False)()
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
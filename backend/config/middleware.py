@@ -1,7 +1,107 @@
 """
-Custom middleware to handle CORS preflight requests before CommonMiddleware.
+Custom middleware: request timing, and CORS preflight requests before CommonMiddleware.
 """
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+from config import metrics
+
+
+class _Measurement:
+    """Wall time and metric phases of one request, while entered."""
+
+    def __enter__(self):
+        self.phases, self._token = metrics.start_request()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.total = time.perf_counter() - self.started
+        metrics.end_request(self._token)
+        self.queries = self.phases.get('db_queries', 0)
+        self.query_time = self.phases.get('db', 0.0)
+
+
+class PerformanceMiddleware:
+    """
+    Time each request: total wall time, the view (everything after URL
+    resolution and request middleware), SQL queries and their time, and
+    serializer/renderer time. The timings are recorded in config.metrics per
+    URL name, and returned in a Server-Timing header if SERVER_TIMING_ENABLED.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with _Measurement() as measurement:
+            response = self.get_response(request)
+        return self.finish(request, response, measurement)
+
+    async def __acall__(self, request):
+        with _Measurement() as measurement:
+            response = await self.get_response(request)
+        return self.finish(request, response, measurement)
+
+    def finish(self, request, response, measurement):
+        total = measurement.total
+        view = measurement.phases.get('view_started')
+        app = measurement.started + total - view if view is not None else 0.0
+        serialize = measurement.phases.get('serialize', 0.0)
+
+        if settings.SERVER_TIMING_ENABLED:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total * 1000:.1f}',
+                f'mw;dur={(total - app) * 1000:.1f};desc="middleware"',
+                f'app;dur={app * 1000:.1f};desc="view"',
+                f'db;dur={measurement.query_time * 1000:.1f};desc="{measurement.queries} queries"',
+                f'serialize;dur={serialize * 1000:.1f}',
+            ])
+
+        values = {
+            'card_http_request_duration_seconds': total,
+            'card_http_db_queries': measurement.queries,
+            'card_http_db_duration_seconds': measurement.query_time,
+            'card_http_serialize_duration_seconds': serialize,
+        }
+        size = self.response_size(response)
+        if size is not None:
+            values['card_http_response_bytes'] = size
+        metrics.registry.observe(self.view_label(request), request.method, response.status_code, values)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics.mark('view_started')
+
+    @staticmethod
+    def view_label(request):
+        """URL name of the request, also for responses returned before URL resolution."""
+        match = request.resolver_match
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return 'unmatched'
+        return match.view_name or match.route or 'unnamed'
+
+    @staticmethod
+    def response_size(response):
+        if response.has_header('Content-Length'):
+            return int(response['Content-Length'])
+        if response.streaming:
+            return None  # the size is only known once the body was sent
+        return len(response.content)
 
 
 class CorsPreflightMiddleware:
@@ -9,10 +109,25 @@ class CorsPreflightMiddleware:
     Middleware to handle OPTIONS requests for CORS preflight before CommonMiddleware.
     This prevents 301 redirects on OPTIONS requests.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.preflight_response(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.preflight_response(request) or await self.get_response(request)
+
+    @staticmethod
+    def preflight_response(request):
         # Handle OPTIONS requests immediately for API endpoints
         # This prevents CommonMiddleware from redirecting preflight requests
         if request.method == 'OPTIONS' and request.path.startswith('/api/'):
@@ -20,16 +135,14 @@ class CorsPreflightMiddleware:
             # Get allowed origins from request
             origin = request.META.get('HTTP_ORIGIN', '*')
             # Check if origin is in allowed list (for security)
-            from django.conf import settings
             allowed_origins = getattr(settings, 'CORS_ALLOWED_ORIGINS', [])
             if origin in allowed_origins or '*' in allowed_origins:
                 response['Access-Control-Allow-Origin'] = origin
             else:
                 response['Access-Control-Allow-Origin'] = '*'
             response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS, PATCH'
-            response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With, Accept'
+            response['Access-Control-Allow-Headers'] = 'Content-Type, Content-Range, Authorization, X-Requested-With, Accept'
             response['Access-Control-Allow-Credentials'] = 'true'
             response['Access-Control-Max-Age'] = '86400'
             return response
-        return self.get_response(request)
-
+        return None
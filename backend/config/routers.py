@@ -0,0 +1,117 @@
+"""
+Database routing for read replicas (settings.REPLICA_DATABASES, from DB_REPLICAS).
+
+Writes, and reads outside views marked with ``@reads_from_replica``, always
+use the primary ('default'). The marked views (public profile, vCard, link,
+card page and analytics reads) send their reads to a random replica, except:
+
+- while a username is pinned: every profile write pins the username to the
+  primary for DB_REPLICA_PIN_SECONDS (see profiles/cache.py), so its owner
+  reads their own update even if the replicas lag behind;
+- inside a transaction on the primary.
+
+The choice is made once per view call, on its first query, and counted in
+the ``card_db_read_routes_total`` metric. Without replicas the decorator is
+a no-op.
+"""
+import functools
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from config import metrics
+
+_scope = ContextVar('replica_scope', default=None)
+
+
+def _pin_key(username):
+    return f'db:pin:{username}'
+
+
+def pin_to_primary(usernames):
+    """Send replica reads for these usernames to the primary for a while."""
+    if settings.REPLICA_DATABASES and usernames:
+        caches[settings.DB_REPLICA_PIN_CACHE_ALIAS].set_many(
+            {_pin_key(username): 1 for username in usernames},
+            settings.DB_REPLICA_PIN_SECONDS,
+        )
+
+
+class _ReplicaScope:
+    def __init__(self, username):
+        self.username = username
+        self.alias = None
+
+    def resolve(self):
+        if self.alias is None:
+            if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+                self.alias, reason = DEFAULT_DB_ALIAS, 'transaction'
+            elif self.username and caches[settings.DB_REPLICA_PIN_CACHE_ALIAS].get(_pin_key(self.username)):
+                self.alias, reason = DEFAULT_DB_ALIAS, 'pinned'
+            else:
+                self.alias, reason = random.choice(settings.REPLICA_DATABASES), 'replica'
+            metrics.registry.increment('card_db_read_routes_total', database=self.alias, reason=reason)
+        return self.alias
+
+
+@contextmanager
+def replica_reads(username=None):
+    """Let reads in the block go to a replica, unless ``username`` is pinned to the primary."""
+    if not settings.REPLICA_DATABASES:
+        yield
+        return
+    token = _scope.set(_ReplicaScope(username))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def _pinned_username(request, authenticated=True):
+    """The username in the URL, else the user making the request."""
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and 'username' in match.kwargs:
+        return match.kwargs['username']
+    if not authenticated:
+        return None
+    user = getattr(request, 'user', None)  # DRF has authenticated the request by now
+    return user.username if user is not None and user.is_authenticated else None
+
+
+def reads_from_replica(view):
+    """View decorator routing the view's reads to a replica; sync or async views."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # request.user would query the database from the event loop
+            with replica_reads(_pinned_username(request, authenticated=False)):
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(_pinned_username(request)):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        scope = _scope.get()
+        return scope.resolve() if scope is not None else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication
+        return db == DEFAULT_DB_ALIAS
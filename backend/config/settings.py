@@ -5,6 +5,7 @@ Django settings for config project.
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 
@@ -39,9 +40,12 @@ INSTALLED_APPS = [
     'corsheaders',
     'users',
     'profiles',
+    'jobs',
+    'analytics',
 ]
 
 MIDDLEWARE = [
+    'config.middleware.PerformanceMiddleware',  # First, so it times every other middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'config.middleware.CorsPreflightMiddleware',  # Handle OPTIONS before CommonMiddleware
@@ -108,6 +112,66 @@ else:
         }
     }
 
+# Read replicas (see config/routers.py): comma-separated replica hosts (host or
+# host:port, same name and credentials) for PostgreSQL, or database files for SQLite
+REPLICA_DATABASES = []
+for index, replica in enumerate(filter(None, (entry.strip() for entry in os.getenv('DB_REPLICAS', '').split(','))), 1):
+    replica_config = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if DB_ENGINE == 'postgresql':
+        host, _, port = replica.partition(':')
+        replica_config.update(HOST=host, PORT=port or replica_config['PORT'])
+    else:
+        replica_config['NAME'] = BASE_DIR / replica
+    DATABASES[f'replica{index}'] = replica_config
+    REPLICA_DATABASES.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+# After a profile write, reads of that profile skip the replicas for this many
+# seconds; set it above the worst replication lag you expect
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '10'))
+DB_REPLICA_PIN_CACHE_ALIAS = 'default'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# locmem is per process: with several gunicorn workers use 'file', 'redis'
+# or 'memcached' so that profile invalidations reach every worker.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+        }
+    }
+elif CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379'),
+        }
+    }
+elif CACHE_BACKEND == 'memcached':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', '127.0.0.1:11211'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'lsofitocard',
+        }
+    }
+
+# Public profile response cache (see profiles/cache.py)
+PUBLIC_PROFILE_CACHE_ALIAS = os.getenv('PUBLIC_PROFILE_CACHE_ALIAS', 'default')
+PUBLIC_PROFILE_CACHE_TIMEOUT = int(os.getenv('PUBLIC_PROFILE_CACHE_TIMEOUT', '300'))  # seconds
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -149,13 +213,86 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Replaced media written or reused this recently is left for `gc_media`: a new
+# upload of the same bytes may be about to point to it (see profiles/tasks.py)
+MEDIA_DELETE_GRACE_SECONDS = int(os.getenv('MEDIA_DELETE_GRACE_SECONDS', '3600'))
+
+# Absolute base for media URLs in precomputed public profile snapshots
+PUBLIC_BASE_URL = os.getenv(
+    'PUBLIC_BASE_URL',
+    'http://localhost:8000' if DEBUG else 'https://api-card.lsofito.com'
+)
+
+# Public card pages, linked from exported vCards
+FRONTEND_URL = os.getenv(
+    'FRONTEND_URL',
+    'http://localhost:5173' if DEBUG else 'https://card.lsofito.com'
+)
+
+# Short card codes (see profiles/shortcodes.py): each worker polls for new and
+# renamed profiles every REFRESH_INTERVAL seconds and reloads all codes every
+# RELOAD_INTERVAL seconds; until the first load finishes, /c/<code> waits up to LOAD_TIMEOUT
+SHORT_CODE_REFRESH_INTERVAL = float(os.getenv('SHORT_CODE_REFRESH_INTERVAL', '5'))
+SHORT_CODE_RELOAD_INTERVAL = float(os.getenv('SHORT_CODE_RELOAD_INTERVAL', '3600'))
+SHORT_CODE_LOAD_TIMEOUT = float(os.getenv('SHORT_CODE_LOAD_TIMEOUT', '10'))
+
+# Background jobs (see jobs/queue.py)
+# Without a `manage.py run_workers` process, set JOBS_RUN_INLINE=True to run jobs in the request
+JOBS_RUN_INLINE = os.getenv('JOBS_RUN_INLINE', str(DEBUG)) == 'True'
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', '5'))
+JOBS_RETRY_BACKOFF = int(os.getenv('JOBS_RETRY_BACKOFF', '10'))  # seconds, doubled per attempt
+JOBS_LEASE_SECONDS = int(os.getenv('JOBS_LEASE_SECONDS', '600'))  # running jobs not renewed for this long are re-queued
+JOBS_HEARTBEAT_SECONDS = int(os.getenv('JOBS_HEARTBEAT_SECONDS', '60'))  # how often a running job renews its lease
+
+# Tap analytics (see analytics/recorder.py): events are buffered per worker process
+# and written in batches once FLUSH_SIZE events or FLUSH_INTERVAL seconds accumulate
+ANALYTICS_ENABLED = os.getenv('ANALYTICS_ENABLED', 'True') == 'True'
+ANALYTICS_FLUSH_SIZE = int(os.getenv('ANALYTICS_FLUSH_SIZE', '500'))
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv('ANALYTICS_FLUSH_INTERVAL', '5'))
+# Past half of this many buffered events new ones are sampled; at the limit they are dropped
+ANALYTICS_BUFFER_CAPACITY = int(os.getenv('ANALYTICS_BUFFER_CAPACITY', '20000'))
+# Raw events older than this are deleted by `manage.py aggregate_analytics` once rolled up
+ANALYTICS_RAW_RETENTION_DAYS = int(os.getenv('ANALYTICS_RAW_RETENTION_DAYS', '30'))
+# Addresses of the reverse proxies (e.g. 127.0.0.1 for a local nginx) whose
+# X-Real-IP / X-Forwarded-For headers name the visitor; anyone else could forge them
+TRUSTED_PROXIES = [ip.strip() for ip in os.getenv('TRUSTED_PROXIES', '').split(',') if ip.strip()]
 
 # File upload settings
 # Allow larger file uploads (10MB for images)
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
+# Multipart files above this are spooled to a temp file instead of worker memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024  # 1 MB
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 1000
 
+# Chunked, resumable image uploads (see profiles/uploads.py)
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', os.path.join(BASE_DIR, 'uploads'))
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv('CHUNKED_UPLOAD_MAX_SIZE', str(10 * 1024 * 1024)))
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv('CHUNKED_UPLOAD_CHUNK_SIZE', str(1024 * 1024)))  # largest PUT body
+CHUNKED_UPLOAD_EXPIRY = int(os.getenv('CHUNKED_UPLOAD_EXPIRY', '86400'))  # seconds without a chunk
+
+# Bulk card imports uploaded in the admin (see profiles/provisioning.py). The CSVs
+# hold passwords, so they wait for their job outside MEDIA_ROOT
+CARD_IMPORT_DIR = os.getenv('CARD_IMPORT_DIR', os.path.join(BASE_DIR, 'imports'))
+CARD_IMPORT_WORKERS = int(os.getenv('CARD_IMPORT_WORKERS', str(os.cpu_count() or 1)))  # password hashing threads
+
+# 'wsgi' (gunicorn sync workers) or 'asgi' (uvicorn, see config/asgi.py). In ASGI
+# mode the public profile and vCard endpoints are served by async views
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+if SERVER_MODE not in ('wsgi', 'asgi'):
+    raise ImproperlyConfigured("SERVER_MODE must be 'wsgi' or 'asgi'")
+
+# Request metrics (see config/metrics.py): per-worker histograms summed over all
+# workers at /api/metrics/, and optionally Server-Timing headers on every response
+# (they reveal backend timings to any client, so they are off unless enabled)
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'False') == 'True'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(BASE_DIR, 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '10'))  # seconds between snapshot writes
+# Scrapers authenticate with `Authorization: Bearer <METRICS_TOKEN>`; staff users with
+# their admin session. Clients in METRICS_ALLOWED_IPS are let in without either, but
+# only when connecting directly: requests forwarded by a proxy never are
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+
 # Security settings for production
 if not DEBUG:
     SECURE_SSL_REDIRECT = os.getenv('SECURE_SSL_REDIRECT', 'True') == 'True'
@@ -179,11 +316,15 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': (
+        'config.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 # JWT Settings
@@ -194,8 +335,16 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    # Tokens carry a hash of the password hash: changing the password revokes
+    # them, and the claim doubles as the version of the cached user below
+    'CHECK_REVOKE_TOKEN': True,
 }
 
+# Seconds an authenticated user (and their profile ID) stays cached between
+# requests; saving the user clears it immediately, this bounds everything else
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', '60'))
+AUTH_USER_CACHE_ALIAS = 'default'
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     origin.strip() 
@@ -222,6 +371,7 @@ CORS_ALLOW_HEADERS = [
     'accept',
     'accept-encoding',
     'authorization',
+    'content-range',  # chunked uploads
     'content-type',
     'dnt',
     'origin',
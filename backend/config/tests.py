@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from config import metrics
+from config.routers import ReplicaRouter, reads_from_replica, replica_reads
+from profiles.cache import invalidate_profile
+from profiles.models import Profile
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class MetricsAccessTests(TestCase):
+    url = '/api/metrics/'
+
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_proxied_requests_are_not_admitted_by_address(self):
+        response = self.client.get(self.url, REMOTE_ADDR='127.0.0.1', HTTP_X_REAL_IP='203.0.113.9')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(self.url, REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=[])
+    def test_loopback_is_not_trusted_by_default(self):
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='127.0.0.1').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='s3cret', METRICS_ALLOWED_IPS=[])
+    def test_token_or_staff_session(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.client.force_login(User.objects.create_user('staff', 'staff@example.com', 'password123', is_staff=True))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_server_timing_is_opt_in(self):
+        self.assertNotIn('Server-Timing', self.client.get(self.url))
+        with override_settings(SERVER_TIMING_ENABLED=True):
+            self.assertIn('Server-Timing', self.client.get(self.url))
+
+
+class MetricsFileTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        directory = override_settings(METRICS_DIR=self.directory)
+        directory.enable()
+        self.addCleanup(directory.disable)
+
+    def write(self, name, count):
+        snapshot = {'pid': 0, 'updated_at': 0, 'requests': [['public-profile', 'GET', '200', count]]}
+        with open(os.path.join(self.directory, name), 'w') as f:
+            json.dump(snapshot, f)
+
+    def total(self):
+        body = metrics.render_prometheus(metrics._load_snapshots())
+        line = next(line for line in body.splitlines() if line.startswith(metrics.REQUESTS_TOTAL + '{'))
+        return int(line.rsplit(' ', 1)[1])
+
+    def test_exited_workers_are_folded_into_the_retired_file(self):
+        exited_pid = 2 ** 22 + 1  # above the default pid_max, so never alive
+        self.write(f'{exited_pid}-aaaa.json', 3)
+        self.write(f'{exited_pid}-bbbb.json', 4)
+        self.write(f'{os.getpid()}-cccc.json', 5)
+
+        metrics._retire_exited_workers()
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ['.lock', f'{os.getpid()}-cccc.json', metrics.RETIRED_FILE],
+        )
+        self.assertEqual(self.total(), 12)
+
+        self.write(f'{exited_pid}-dddd.json', 1)
+        metrics._retire_exited_workers()
+        self.assertEqual(self.total(), 13)
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def setUp(self):
+        cache.clear()
+
+    def read_alias(self, username=None):
+        with replica_reads(username):
+            return self.router.db_for_read(Profile)
+
+    def test_reads_go_to_the_primary_outside_marked_views(self):
+        self.assertEqual(self.router.db_for_read(Profile), 'default')
+        self.assertEqual(self.router.db_for_write(Profile), 'default')
+
+    def test_marked_reads_go_to_a_replica(self):
+        self.assertEqual(self.read_alias('alice'), 'replica1')
+        self.assertEqual(self.router.db_for_write(Profile), 'default')
+
+    def test_written_profiles_are_read_from_the_primary(self):
+        invalidate_profile('alice', timezone.now())
+        self.assertEqual(self.read_alias('alice'), 'default')
+        self.assertEqual(self.read_alias('bob'), 'replica1')
+        with override_settings(DB_REPLICA_PIN_SECONDS=0):
+            invalidate_profile('carol', timezone.now())
+        self.assertEqual(self.read_alias('carol'), 'replica1')
+
+    def test_reads_inside_a_transaction_use_the_primary(self):
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertEqual(self.read_alias('alice'), 'default')
+
+    def test_view_decorator_pins_the_username_in_the_url(self):
+        @reads_from_replica
+        def view(request, username):
+            return self.router.db_for_read(Profile)
+
+        request = RequestFactory().get('/api/profile/alice/')
+        request.user = AnonymousUser()
+        request.resolver_match = mock.Mock(kwargs={'username': 'alice'})
+        self.assertEqual(view(request, 'alice'), 'replica1')
+        invalidate_profile('alice', timezone.now())
+        self.assertEqual(view(request, 'alice'), 'default')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        self.assertEqual(self.read_alias('alice'), 'default')
@@ -3,28 +3,53 @@ URL configuration for config project.
 
 API Endpoints:
 - GET    /api/profile/<username>/     - Public profile view
+- GET    /api/profile/<username>/vcard/ - Download profile as vCard (.vcf)
+- GET    /api/profile/<username>/links/<label>/ - Redirect to a profile link, counting the click
 - GET    /api/my-profile/             - Get authenticated user's profile
 - PUT    /api/my-profile/              - Update authenticated user's profile
+- GET    /api/my-profile/card.<png|pdf> - Printable card of the authenticated user
+- GET    /api/my-profile/stats/        - Views, vCard downloads and link clicks (?days=&granularity=day|hour)
+- POST   /api/my-profile/uploads/      - Start a chunked image upload (profile photo or gallery)
+- GET    /api/my-profile/uploads/<id>/ - Offset of an upload, to resume it
+- PUT    /api/my-profile/uploads/<id>/ - Upload a chunk (Content-Range: bytes <first>-<last>/<size>)
+- DELETE /api/my-profile/uploads/<id>/ - Abort an upload
+- POST   /api/my-profile/uploads/<id>/complete/ - Attach a finished upload to the profile
 - POST   /api/register/               - User registration
 - POST   /api/login/                  - User login
 - POST   /api/token/refresh/          - Refresh JWT token
-- GET    /api/admin/users/             - Get all users (admin only)
+- GET    /api/admin/users/             - List users, paginated/filterable, ?export=csv|jsonl (admin only)
 - PUT    /api/admin/users/<id>/status/ - Update user status (admin only)
+- GET    /api/admin/users/<id>/card.<png|pdf> - Printable card of a user (admin only)
+- POST   /api/admin/users/status/      - Bulk status transition (admin only)
+- GET    /api/admin/users/<id>/stats/  - Card analytics of a user (admin only)
+- GET    /api/admin/stats/             - Analytics across all cards (admin only)
+- GET    /api/metrics/                 - Prometheus metrics of all workers (METRICS_TOKEN or METRICS_ALLOWED_IPS)
 
 Admin:
 - GET    /admin/                      - Django admin interface
+
+Card links:
+- GET    /c/<code>                    - Short code of an NFC tag, redirects to the card (no database access)
+- GET    /<username>                  - Open Graph preview for link scrapers, redirect for browsers
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenRefreshView
+from config.metrics import metrics_view
+from profiles.views import profile_card_page, resolve_short_code
+from users.validators import RESERVED_USERNAMES
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('profiles.urls')),
     path('api/', include('users.urls')),
+    path('api/', include('analytics.urls')),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/metrics/', metrics_view, name='metrics'),
 ]
 
 # Serve media files
@@ -39,3 +64,11 @@ else:
     # But we'll still add the URL pattern for Django to handle routing
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
+# Card links (short codes and usernames); last so they never shadow the routes above.
+# Reserved names (favicon.ico, robots.txt, admin without its slash...) aren't card
+# pages and get a 404
+_reserved = '|'.join(re.escape(name) for name in sorted(RESERVED_USERNAMES))
+urlpatterns += [
+    re_path(r'^c/(?P<code>[0-9A-Za-z]+)/?$', resolve_short_code, name='short-code'),
+    re_path(rf'^(?!(?i:{_reserved})/?$)(?P<username>[\w.@+-]+)/?$', profile_card_page, name='profile-card-page'),
+]
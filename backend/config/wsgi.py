@@ -15,4 +15,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
 
+# Load the short code index now rather than on the first NFC tap
+from profiles.shortcodes import index as short_codes
 
+short_codes.start()
@@ -0,0 +1,60 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.worker import run_in_process, run_in_thread
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers from a thread or process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Number of workers')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help='Run workers as threads (I/O bound work) or processes (CPU bound image work)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--drain', action='store_true', help='Exit once no due jobs are left')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        poll_interval = options['poll_interval']
+        drain = options['drain']
+
+        if options['pool'] == 'process':
+            context = multiprocessing.get_context('fork')
+            stop_event = context.Event()
+            # Forked children must not share the parent's DB connections
+            connections.close_all()
+            workers = [
+                context.Process(
+                    target=run_in_process,
+                    args=(f'worker-{i}', stop_event, poll_interval, drain),
+                    daemon=True,
+                )
+                for i in range(concurrency)
+            ]
+            for worker in workers:
+                worker.start()
+        else:
+            stop_event = threading.Event()
+            workers = [
+                run_in_thread(f'worker-{i}', stop_event, poll_interval, drain)
+                for i in range(concurrency)
+            ]
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping workers...')
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Started {concurrency} {options['pool']} worker(s)."
+        ))
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS('All workers stopped.'))
@@ -0,0 +1,172 @@
+"""
+Database-backed job queue.
+
+Tasks are plain functions registered with ``@task('app.name')`` in an app's
+``tasks.py``; ``enqueue('app.name', **payload)`` stores a Job row that a
+``manage.py run_workers`` process later claims and runs. Claiming is a
+conditional UPDATE, so it is safe with several workers on SQLite as well as
+PostgreSQL. Failed jobs are retried with exponential backoff.
+
+A running job renews its lease every JOBS_HEARTBEAT_SECONDS; one not renewed
+for JOBS_LEASE_SECONDS belongs to a worker that died and is claimed again.
+Each claim counts an attempt, and a run only records its outcome while the
+job is still at its attempt, so a stalled worker can't overwrite the result
+of the run that took over.
+
+With ``settings.JOBS_RUN_INLINE`` enabled (the default when DEBUG is on),
+enqueue() runs the task immediately instead, so development doesn't need a
+worker process.
+"""
+import hashlib
+import json
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name):
+    """Register a function as a job task under the given name."""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def enqueue(task_name, unique=False, delay=0, max_attempts=None, **payload):
+    """
+    Queue a task run. With unique=True nothing is added if an identical
+    run is already waiting. Returns the Job, or None for unique and inline
+    runs.
+    """
+    if task_name not in _registry:
+        raise KeyError(f'Unknown task: {task_name}')
+
+    if settings.JOBS_RUN_INLINE:
+        try:
+            _registry[task_name](**payload)
+        except Exception:
+            logger.exception('Inline job %s failed', task_name)
+        return None
+
+    job = Job(
+        task=task_name,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+    if not unique:
+        job.save()
+        return job
+    # One INSERT that the unique index on waiting runs turns into a no-op:
+    # checking for a waiting run first would let concurrent callers both insert
+    job.unique_key = _unique_key(task_name, payload)
+    Job.objects.bulk_create([job], ignore_conflicts=True)
+    return None
+
+
+def _unique_key(task_name, payload):
+    return hashlib.sha256(json.dumps([task_name, payload], sort_keys=True).encode()).hexdigest()
+
+
+def _due(now):
+    # Running jobs whose lease expired belong to a worker that died mid-run
+    lease_expired = now - timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+    return Q(status='queued', run_at__lte=now) | Q(status='running', updated_at__lt=lease_expired)
+
+
+def claim_next():
+    """Atomically take the next due job for this worker, or return None."""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(_due(now)).order_by('run_at').values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        # Clearing the key lets an identical run be queued while this one runs
+        claimed = Job.objects.filter(_due(now), pk=pk).update(
+            status='running', attempts=F('attempts') + 1, updated_at=now, unique_key=None
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def renew_lease(job):
+    """Push back the lease of a running job; False if it was reclaimed or finished meanwhile."""
+    return bool(
+        Job.objects.filter(pk=job.pk, status='running', attempts=job.attempts).update(updated_at=timezone.now())
+    )
+
+
+@contextmanager
+def _heartbeat(job):
+    """Renew the job's lease from a thread while the block runs."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOBS_HEARTBEAT_SECONDS):
+                try:
+                    if not renew_lease(job):
+                        break
+                except DatabaseError:
+                    # A busy database; the lease outlasts a few missed beats
+                    logger.warning('Could not renew the lease of job %s', job, exc_info=True)
+        finally:
+            # Connections are per thread: close this one's
+            connections.close_all()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _finish(job, **fields):
+    """Record the outcome of the job's current attempt, unless another worker took the job over."""
+    fields['updated_at'] = timezone.now()
+    recorded = Job.objects.filter(pk=job.pk, status='running', attempts=job.attempts).update(**fields)
+    if not recorded:
+        logger.warning('Job %s was reclaimed during attempt %s; its outcome is dropped', job, job.attempts)
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return bool(recorded)
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome. Returns True on success."""
+    try:
+        with _heartbeat(job):
+            get_task(job.task)(**job.payload)
+    except Exception:
+        now = timezone.now()
+        last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            backoff = settings.JOBS_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            _finish(job, status='queued', run_at=now + timedelta(seconds=backoff), last_error=last_error)
+        else:
+            _finish(job, status='failed', finished_at=now, last_error=last_error)
+        logger.warning('Job %s failed (attempt %s/%s)', job, job.attempts, job.max_attempts)
+        return False
+
+    _finish(job, status='succeeded', finished_at=timezone.now())
+    return True
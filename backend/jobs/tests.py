@@ -0,0 +1,130 @@
+import time
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim_next, enqueue, run_job, task
+
+calls = []
+
+
+@task('jobs.tests.record')
+def record(**payload):
+    calls.append(payload)
+
+
+@task('jobs.tests.fail')
+def fail(**payload):
+    raise RuntimeError('boom')
+
+
+@task('jobs.tests.outlive_lease')
+def outlive_lease():
+    time.sleep(0.5)
+    calls.append(claim_next())
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOBS_RETRY_BACKOFF=10, JOBS_LEASE_SECONDS=600)
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def expire_lease(self, job):
+        Job.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=601))
+
+    def test_claim_takes_each_due_job_once(self):
+        enqueue('jobs.tests.record', value=1)
+        enqueue('jobs.tests.record', delay=60, value=2)
+
+        job = claim_next()
+        self.assertEqual((job.payload, job.status, job.attempts), ({'value': 1}, 'running', 1))
+        self.assertIsNone(claim_next())
+
+        self.assertTrue(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(calls, [{'value': 1}])
+
+    def test_failures_are_retried_with_backoff_then_fail(self):
+        enqueue('jobs.tests.fail', max_attempts=2)
+        job = claim_next()
+        started = timezone.now()
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertAlmostEqual((job.run_at - started).total_seconds(), 10, delta=1)
+        self.assertIsNone(claim_next())  # backing off
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        job = claim_next()
+        self.assertEqual(job.attempts, 2)
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_expired_lease_is_reclaimed_and_the_stale_run_dropped(self):
+        enqueue('jobs.tests.record', value=1)
+        stale = claim_next()
+        self.assertIsNone(claim_next())  # leased
+
+        self.expire_lease(stale)
+        current = claim_next()
+        self.assertEqual((current.pk, current.attempts), (stale.pk, 2))
+
+        with self.assertLogs('jobs.queue', 'WARNING') as logs:
+            self.assertTrue(run_job(stale))  # the task ran, but the job belongs to the new run now
+        self.assertIn('reclaimed during attempt 1', logs.output[0])
+        job = Job.objects.get(pk=stale.pk)
+        self.assertEqual((job.status, job.attempts), ('running', 2))
+
+        run_job(current)
+        self.assertEqual(Job.objects.get(pk=stale.pk).status, 'succeeded')
+
+    def test_stale_failure_does_not_requeue(self):
+        enqueue('jobs.tests.fail')
+        stale = claim_next()
+        self.expire_lease(stale)
+        current = claim_next()
+        Job.objects.filter(pk=current.pk).update(status='succeeded')  # as if the new run had succeeded
+
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            run_job(stale)
+        self.assertEqual(Job.objects.get(pk=stale.pk).status, 'succeeded')
+
+    def test_unique_runs_are_queued_once(self):
+        def count(value):
+            return Job.objects.filter(task='jobs.tests.record', payload={'value': value}, status='queued').count()
+
+        enqueue('jobs.tests.record', unique=True, value=1)
+        enqueue('jobs.tests.record', unique=True, value=1)
+        enqueue('jobs.tests.record', unique=True, value=2)
+        self.assertEqual((count(1), count(2)), (1, 1))
+        enqueue('jobs.tests.record', value=1)  # not unique
+        self.assertEqual(count(1), 2)
+
+        # Once claimed, an identical run may be queued again (the data changed meanwhile)
+        while claim_next():
+            pass
+        enqueue('jobs.tests.record', unique=True, value=1)
+        self.assertEqual(count(1), 1)
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOBS_HEARTBEAT_SECONDS=0.05, JOBS_LEASE_SECONDS=0.2)
+class HeartbeatTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_long_running_job_is_not_reclaimed(self):
+        enqueue('jobs.tests.outlive_lease')
+        job = claim_next()
+        self.assertTrue(run_job(job))
+        self.assertEqual(calls, [None])  # another worker's claim during the run found nothing
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('succeeded', 1))
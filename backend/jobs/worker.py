@@ -0,0 +1,59 @@
+"""
+Worker loop used by `manage.py run_workers`.
+"""
+import logging
+import signal
+import threading
+
+from django.db import close_old_connections, connections
+
+from .queue import claim_next, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Claims and runs jobs until stop_event is set (or the queue is empty, with drain=True)."""
+
+    def __init__(self, name, stop_event, poll_interval=1.0, drain=False):
+        self.name = name
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        self.drain = drain
+        self.processed = 0
+
+    def run(self):
+        logger.info('Worker %s started', self.name)
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                job = claim_next()
+                if job is None:
+                    if self.drain:
+                        break
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                run_job(job)
+                self.processed += 1
+        finally:
+            connections.close_all()
+            logger.info('Worker %s stopped after %s job(s)', self.name, self.processed)
+        return self.processed
+
+
+def run_in_process(name, stop_event, poll_interval, drain):
+    """Entry point for process pool workers (the stop event is a multiprocessing.Event)."""
+    # The parent sets stop_event on SIGINT/SIGTERM; let the current job finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    return Worker(name, stop_event, poll_interval, drain).run()
+
+
+def run_in_thread(name, stop_event, poll_interval, drain):
+    thread = threading.Thread(
+        target=Worker(name, stop_event, poll_interval, drain).run,
+        name=name,
+        daemon=True,
+    )
+    thread.start()
+    return thread
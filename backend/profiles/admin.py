@@ -1,26 +1,42 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth import get_user_model
-from .models import Profile
+from django.utils.html import format_html, format_html_join
+from .models import CardImport, Profile, ProfileStatusChange
+from .provisioning import COLUMNS, queue_import
 
 User = get_user_model()
 
 
+class ProfileStatusChangeInline(admin.TabularInline):
+    model = ProfileStatusChange
+    fk_name = 'profile'
+    extra = 0
+    can_delete = False
+    fields = ('from_status', 'to_status', 'changed_by', 'changed_at')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
+    inlines = (ProfileStatusChangeInline,)
     list_display = ('name', 'username', 'email', 'phone', 'status', 'template', 'created_at')
     list_filter = ('status', 'template', 'created_at')
     search_fields = ('name', 'user__username', 'email')
-    readonly_fields = ('created_at', 'updated_at', 'username')
+    readonly_fields = ('created_at', 'updated_at', 'username', 'short_url')
     fieldsets = (
         ('User Information', {
-            'fields': ('user', 'username', 'name', 'designation', 'email', 'phone', 'whatsapp', 'about')
+            'fields': ('user', 'username', 'short_url', 'name', 'designation', 'email', 'phone', 'whatsapp', 'about')
         }),
         ('Social Links', {
             'fields': ('instagram', 'linkedin', 'youtube', 'website', 'others')
         }),
         ('Media', {
-            'fields': ('profile_image', 'gallery')
+            'fields': ('profile_image',)
         }),
         ('Settings', {
             'fields': ('status', 'template')
@@ -35,6 +51,72 @@ class ProfileAdmin(admin.ModelAdmin):
     username.short_description = 'Username'
 
 
+class CardImportForm(forms.ModelForm):
+    csv_file = forms.FileField(
+        label='CSV file',
+        help_text=f"Columns: {', '.join(COLUMNS)}. username and email are required.",
+    )
+
+    class Meta:
+        model = CardImport
+        fields = ('csv_file', 'default_status')
+
+
+@admin.register(CardImport)
+class CardImportAdmin(admin.ModelAdmin):
+    """Upload a corporate order's CSV; a background job creates the cards."""
+    list_display = ('filename', 'status', 'created_count', 'error_count', 'uploaded_by', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = (
+        'filename', 'default_status', 'status', 'uploaded_by', 'created_count', 'error_count',
+        'throughput', 'row_errors', 'created_at', 'finished_at',
+    )
+
+    def get_form(self, request, obj=None, **kwargs):
+        if obj is None:
+            kwargs['form'] = CardImportForm
+        return super().get_form(request, obj, **kwargs)
+
+    def get_fields(self, request, obj=None):
+        if obj is None:
+            return ('csv_file', 'default_status')
+        return self.readonly_fields
+
+    def get_readonly_fields(self, request, obj=None):
+        return self.readonly_fields if obj is not None else ()
+
+    def has_change_permission(self, request, obj=None):
+        # Reports are read-only; the change view only displays them
+        return False
+
+    def save_model(self, request, obj, form, change):
+        obj.uploaded_by = request.user
+        queue_import(obj, form.cleaned_data['csv_file'])
+
+    def throughput(self, obj):
+        report = obj.report
+        if 'error' in report:
+            return report['error']
+        if not report:
+            return '-'
+        return (
+            f"{report['created']} of {report['rows']} row(s) in {report['seconds']} s "
+            f"({report['rows_per_second']} rows/s; hashing {report['hash_seconds']} s, "
+            f"inserting {report['insert_seconds']} s)"
+        )
+
+    def row_errors(self, obj):
+        errors = obj.report.get('errors') or []
+        if not errors:
+            return '-'
+        return format_html(
+            '<table><tr><th>Line</th><th>Username</th><th>Error</th></tr>{}</table>',
+            format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td></tr>',
+                             ((error['line'], error['username'], error['error']) for error in errors)),
+        )
+    row_errors.short_description = 'Errors'
+
+
 # Customize User admin to show profile status
 class ProfileInline(admin.StackedInline):
     model = Profile
@@ -0,0 +1,124 @@
+"""
+Async versions of the public read endpoints, for SERVER_MODE=asgi.
+
+Under uvicorn a tap waiting on the cache or the database only suspends a
+coroutine instead of holding a worker, so one process serves thousands of
+concurrent taps. profiles/urls.py routes the public profile and vCard URLs
+here in ASGI mode; everything else (MyProfileView, uploads, admin) stays a
+sync DRF view, which Django runs in a thread under ASGI.
+
+The responses are the same as those of the sync views in profiles/views.py:
+same bodies, validators and analytics events.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+
+from .models import Profile
+from .cache import (
+    aget_cached_version, aremember_profile_version,
+    aget_cached_response, aset_cached_response, version_from_timestamp,
+)
+from .conditional import not_modified_response, PUBLIC_CACHE_CONTROL
+from .snapshots import refresh_snapshot
+from .vcard import build_vcard, VCARD_VERSIONS
+from .views import _json_profile_response, _vcard_response
+from analytics.recorder import track
+from config.routers import reads_from_replica
+
+User = get_user_model()
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def _json_error(data, status):
+    # Same compact encoding as DRF's JSONRenderer, so bodies match the sync views
+    return JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+
+
+def _method_not_allowed(request):
+    response = _json_error({'detail': f'Method "{request.method}" not allowed.'}, 405)
+    response['Allow'] = ', '.join(SAFE_METHODS)
+    return response
+
+
+@track('view')
+@reads_from_replica
+async def get_public_profile(request, username):
+    """Get public profile by username."""
+    if request.method not in SAFE_METHODS:
+        return _method_not_allowed(request)
+
+    version = await aget_cached_version(username)
+    if version is not None:
+        not_modified = not_modified_response(request, version, PUBLIC_CACHE_CONTROL)
+        if not_modified is not None:
+            return not_modified
+        body = await aget_cached_response(username, version)
+        if body is not None:
+            return _json_profile_response(body, version)
+
+    row = await (
+        Profile.objects.filter(user__username=username)
+        .values_list('pk', 'updated_at', 'public_snapshot')
+        .afirst()
+    )
+    if row is None:
+        if not await User.objects.filter(username=username).aexists():
+            return _json_error({'error': 'User not found'}, 404)
+        return _json_error({'error': 'Profile not found'}, 404)
+
+    profile_id, updated_at, body = row
+    version = version_from_timestamp(updated_at)
+    not_modified = not_modified_response(request, version, PUBLIC_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    if not body:
+        # Snapshot not materialized yet (new profile or mid-rebuild)
+        body = await sync_to_async(refresh_snapshot)(profile_id)
+        if body is None:
+            return _json_error({'error': 'Profile not found'}, 404)
+
+    # Only cache the body if no newer version was published meanwhile
+    if await aremember_profile_version(username, updated_at) == version:
+        await aset_cached_response(username, version, body)
+    return _json_profile_response(body, version)
+
+
+@track('vcard')
+@reads_from_replica
+async def get_profile_vcard(request, username):
+    """Download a profile as a vCard (?version=3.0|4.0, default 3.0)."""
+    if request.method not in SAFE_METHODS:
+        return _method_not_allowed(request)
+
+    vcard_version = request.GET.get('version', '3.0')
+    if vcard_version not in VCARD_VERSIONS:
+        return _json_error({'error': f"version must be one of {', '.join(VCARD_VERSIONS)}"}, 400)
+    variant = f'vcard:{vcard_version}'
+
+    version = await aget_cached_version(username)
+    if version is not None:
+        not_modified = not_modified_response(request, version, PUBLIC_CACHE_CONTROL)
+        if not_modified is not None:
+            return not_modified
+        body = await aget_cached_response(username, version, variant)
+        if body is not None:
+            return _vcard_response(body, username, version)
+
+    profile = await Profile.objects.select_related('user').filter(user__username=username).afirst()
+    if profile is None:
+        return _json_error({'error': 'Profile not found'}, 404)
+
+    version = version_from_timestamp(profile.updated_at)
+    not_modified = not_modified_response(request, version, PUBLIC_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    # Decodes and re-encodes the photo: keep it off the event loop
+    body = await sync_to_async(build_vcard)(profile, vcard_version)
+    if await aremember_profile_version(username, profile.updated_at) == version:
+        await aset_cached_response(username, version, body, variant)
+    return _vcard_response(body, username, version)
+
@@ -0,0 +1,348 @@
+"""
+Reproducible benchmarks of the card API hot paths (``manage.py benchmark``).
+
+Benchmark users (``bench_user_<n>``, each with a photo and a three image
+gallery) are seeded with bulk INSERTs into whatever database is configured,
+so the same run works on SQLite and PostgreSQL. Requests are built as WSGI
+environs and sent through ``WSGIHandler``, the full middleware stack
+included. Every request records its latency and the number and duration of
+its SQL queries (counted with a connection execute wrapper, so DEBUG doesn't
+matter). With several workers, each endpoint is driven by forked processes
+like Gunicorn workers, and throughput is measured over the wall time of the
+whole phase.
+
+Results are plain JSON. ``compare`` flags endpoints whose p95 latency or
+queries per request got worse than a baseline run.
+"""
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, RequestFactory, encode_multipart
+from django.utils import timezone
+from PIL import Image
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Profile, GalleryImage
+from .snapshots import rebuild_snapshots
+from .storage import content_addressed_name, content_addressed_storage, file_sha256
+
+User = get_user_model()
+
+USER_PREFIX = 'bench_user_'
+ADMIN_USERNAME = 'bench_admin'
+REGISTER_PREFIX = 'bench_new_'
+PASSWORD = 'bench-password-123'
+GALLERY_SIZE = 3
+
+# Endpoint name -> function(context, rng, sequence number) returning request kwargs
+ENDPOINTS = {}
+
+
+def endpoint(name):
+    def decorator(func):
+        ENDPOINTS[name] = func
+        return func
+    return decorator
+
+
+@endpoint('public_profile')
+def _public_profile(context, rng, n):
+    return {'method': 'GET', 'path': f"/api/profile/{rng.choice(context['usernames'])}/"}
+
+
+@endpoint('public_vcard')
+def _public_vcard(context, rng, n):
+    return {'method': 'GET', 'path': f"/api/profile/{rng.choice(context['usernames'])}/vcard/"}
+
+
+@endpoint('my_profile')
+def _my_profile(context, rng, n):
+    return {'method': 'GET', 'path': '/api/my-profile/', 'token': rng.choice(context['tokens'])}
+
+
+@endpoint('my_profile_update')
+def _my_profile_update(context, rng, n):
+    body = encode_multipart(BOUNDARY, {'designation': f'Engineer {n}', 'about': 'Benchmark run'})
+    return {
+        'method': 'PUT', 'path': '/api/my-profile/', 'token': rng.choice(context['tokens']),
+        'body': body, 'content_type': MULTIPART_CONTENT,
+    }
+
+
+@endpoint('admin_users')
+def _admin_users(context, rng, n):
+    return {'method': 'GET', 'path': '/api/admin/users/?limit=50', 'token': context['admin_token']}
+
+
+@endpoint('login')
+def _login(context, rng, n):
+    username = rng.choice(context['usernames'])
+    return {'method': 'POST', 'path': '/api/login/', 'json': {'username': username, 'password': PASSWORD}}
+
+
+@endpoint('register')
+def _register(context, rng, n):
+    username = f"{REGISTER_PREFIX}{context['run_id']}_{os.getpid()}_{rng.getrandbits(40):x}"
+    return {'method': 'POST', 'path': '/api/register/', 'json': {
+        'username': username, 'email': f'{username}@example.com',
+        'password': PASSWORD, 'password_confirm': PASSWORD,
+    }}
+
+
+def _image_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 640), color).save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def _store_image(prefix, color):
+    content = ContentFile(_image_bytes(color), name='bench.jpg')
+    digest = file_sha256(content)
+    return content_addressed_storage().save(content_addressed_name(prefix, digest, 'bench.jpg'), content), digest
+
+
+def seed(count, batch_size=1000):
+    """
+    Make sure ``count`` benchmark users exist, with profiles and galleries.
+    Images are shared between users (content-addressed), rows are bulk
+    inserted. Returns the number of users created.
+    """
+    existing = User.objects.filter(username__startswith=USER_PREFIX).count()
+    if not User.objects.filter(username=ADMIN_USERNAME).exists():
+        User.objects.create_superuser(ADMIN_USERNAME, 'bench-admin@example.com', PASSWORD)
+    if existing >= count:
+        return 0
+
+    password = make_password(PASSWORD)  # hashed once, PBKDF2 is slow on purpose
+    photo, _ = _store_image('profiles', (30, 58, 138))
+    gallery = [_store_image('gallery', (40 * i, 120, 200)) for i in range(GALLERY_SIZE)]
+    now = timezone.now()
+    created = 0
+    for start in range(existing, count, batch_size):
+        numbers = range(start, min(start + batch_size, count))
+        users = User.objects.bulk_create([
+            User(
+                username=f'{USER_PREFIX}{n}', email=f'{USER_PREFIX}{n}@example.com',
+                first_name='Bench', last_name=str(n), password=password, date_joined=now,
+            )
+            for n in numbers
+        ])
+        if connection.features.can_return_rows_from_bulk_insert:
+            user_ids = [user.pk for user in users]
+        else:
+            user_ids = list(
+                User.objects.filter(username__in=[user.username for user in users]).values_list('pk', flat=True)
+            )
+        profiles = Profile.objects.bulk_create([
+            Profile(
+                user_id=user_id, name=f'Bench User {n}', designation='Engineer',
+                email=f'{USER_PREFIX}{n}@example.com', phone='+1 555 0100', website='https://example.com',
+                about='Seeded by manage.py benchmark.', profile_image=photo,
+            )
+            for n, user_id in zip(numbers, user_ids)
+        ])
+        profile_ids = [profile.pk for profile in profiles] if profiles[0].pk else list(
+            Profile.objects.filter(user_id__in=user_ids).values_list('pk', flat=True)
+        )
+        GalleryImage.objects.bulk_create([
+            GalleryImage(profile_id=profile_id, image=name, content_hash=digest, position=position)
+            for profile_id in profile_ids
+            for position, (name, digest) in enumerate(gallery)
+        ])
+        rebuild_snapshots(Profile.objects.filter(pk__in=profile_ids), batch_size=batch_size)
+        created += len(user_ids)
+    return created
+
+
+def cleanup():
+    """Delete every benchmark user (and through them profiles, galleries and events)."""
+    deleted = 0
+    for prefix in (USER_PREFIX, REGISTER_PREFIX):
+        deleted += User.objects.filter(username__startswith=prefix).delete()[1].get(User._meta.label, 0)
+    deleted += User.objects.filter(username=ADMIN_USERNAME).delete()[1].get(User._meta.label, 0)
+    return deleted
+
+
+def build_context(sample_size=200, seed_value=0):
+    """Usernames and access tokens the request builders pick from."""
+    rng = random.Random(seed_value)
+    users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by('pk'))
+    if not users:
+        raise ValueError('No benchmark users; run with --users N first')
+    sample = rng.sample(users, min(sample_size, len(users)))
+    return {
+        'usernames': [user.username for user in users],
+        'tokens': [str(RefreshToken.for_user(user).access_token) for user in sample],
+        'admin_token': str(RefreshToken.for_user(User.objects.get(username=ADMIN_USERNAME)).access_token),
+        'run_id': int(time.time()),
+    }
+
+
+def _host():
+    return next(
+        (host for host in settings.ALLOWED_HOSTS if host and host != '*' and not host.startswith('.')),
+        'localhost',
+    )
+
+
+def _environ(factory, spec):
+    extra = {'HTTP_HOST': _host(), 'secure': not settings.DEBUG}
+    if spec.get('token'):
+        extra['HTTP_AUTHORIZATION'] = f"Bearer {spec['token']}"
+    if 'json' in spec:
+        request = factory.generic(spec['method'], spec['path'], json.dumps(spec['json']), 'application/json', **extra)
+    elif 'body' in spec:
+        request = factory.generic(spec['method'], spec['path'], spec['body'], spec['content_type'], **extra)
+    else:
+        request = factory.generic(spec['method'], spec['path'], **extra)
+    return request.environ
+
+
+class _QueryCounter:
+    """Execute wrapper counting queries and their time on this thread's connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def run_requests(name, context, count, seed_value):
+    """
+    Send ``count`` requests for an endpoint through a fresh WSGIHandler.
+    Returns one (status, seconds, queries, sql seconds, bytes) tuple per request.
+    """
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    rng = random.Random(seed_value)
+    build = ENDPOINTS[name]
+    results = []
+    for n in range(count):
+        environ = _environ(factory, build(context, rng, n))
+        counter = _QueryCounter()
+        status = []
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = handler(environ, lambda code, headers, exc_info=None: status.append(int(code[:3])))
+            try:
+                size = sum(len(chunk) for chunk in response)
+            finally:
+                response.close()  # request_finished: the same connection handling as under Gunicorn
+        results.append((status[0], time.perf_counter() - started, counter.count, counter.seconds, size))
+    return results
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values)))) - 1
+    return sorted_values[index]
+
+
+def summarize(results, wall_seconds):
+    latencies = sorted(result[1] for result in results)
+    count = len(results)
+    return {
+        'requests': count,
+        'errors': sum(1 for result in results if result[0] >= 400),
+        'status_codes': {str(code): sum(1 for r in results if r[0] == code) for code in sorted({r[0] for r in results})},
+        'throughput_rps': round(count / wall_seconds, 2) if wall_seconds else 0.0,
+        'mean_ms': round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        'queries_per_request': round(sum(r[2] for r in results) / count, 2) if count else 0.0,
+        'sql_ms_per_request': round(sum(r[3] for r in results) / count * 1000, 3) if count else 0.0,
+        'bytes_per_request': round(sum(r[4] for r in results) / count) if count else 0,
+    }
+
+
+def benchmark_endpoint(name, context, requests, workers=1, warmup=5, seed_value=0):
+    """Warm up, then measure one endpoint with ``workers`` processes."""
+    if warmup:
+        run_requests(name, context, warmup, seed_value - 1)
+    shares = [requests // workers + (1 if i < requests % workers else 0) for i in range(workers)]
+    shares = [share for share in shares if share]
+    started = time.perf_counter()
+    if len(shares) == 1:
+        results = run_requests(name, context, shares[0], seed_value)
+    else:
+        # Forked children must not share the parent's DB connections
+        connections.close_all()
+        with ProcessPoolExecutor(len(shares), mp_context=multiprocessing.get_context('fork')) as pool:
+            futures = [pool.submit(run_requests, name, context, share, seed_value + i) for i, share in enumerate(shares)]
+            results = list(itertools.chain.from_iterable(future.result() for future in futures))
+    return summarize(results, time.perf_counter() - started)
+
+
+def metadata(users, requests, workers):
+    return {
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'django': django.get_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cache_backend': settings.CACHES['default']['BACKEND'],
+        'debug': settings.DEBUG,
+        'users': users,
+        'requests_per_endpoint': requests,
+        'workers': workers,
+    }
+
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Regressions of ``current`` against ``baseline`` results: p95 latency or
+    throughput worse by more than ``threshold``, clearly more queries per
+    request, or new errors. Returns a list of human readable lines.
+    """
+    regressions = []
+    for name, now in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        if before['p95_ms'] and now['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} ms -> {now['p95_ms']:.1f} ms")
+        if before['throughput_rps'] and now['throughput_rps'] < before['throughput_rps'] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {before['throughput_rps']:.1f} -> {now['throughput_rps']:.1f} req/s"
+            )
+        # Averages vary a little with cache hits; an N+1 query shows up far above this
+        if now['queries_per_request'] > before['queries_per_request'] * (1 + threshold) + 0.5:
+            regressions.append(
+                f"{name}: queries/request {before['queries_per_request']} -> {now['queries_per_request']}"
+            )
+        if now['errors'] > before['errors']:
+            regressions.append(f"{name}: errors {before['errors']} -> {now['errors']}")
+    return regressions
+
+
+def setup_differences(baseline, current):
+    """Run settings that differ between two results, which makes them hard to compare."""
+    keys = ('database', 'cache_backend', 'debug', 'users', 'requests_per_endpoint', 'workers')
+    before, now = baseline.get('meta', {}), current['meta']
+    return [f'{key}: {before.get(key)} -> {now.get(key)}' for key in keys if before.get(key) != now.get(key)]
@@ -0,0 +1,139 @@
+"""
+Versioned response cache for public profile reads.
+
+Every cached entry is keyed by username plus the profile version, where the
+version is the profile's ``updated_at`` timestamp in microseconds. The current
+version of each username is itself cached, so a repeat tap resolves both keys
+from the cache without touching the database.
+
+Writes never delete cached responses: they publish a new version (see
+``invalidate_profile``), which makes every entry stored under the old version
+unreachable until it expires on its own.
+
+Publishing a version also pins the username's reads to the primary database
+for a few seconds (see config/routers.py), so a replica that lags behind
+can't serve or re-cache the previous version.
+
+The ``a``-prefixed functions are the async counterparts used by
+profiles/async_views.py.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from config.routers import pin_to_primary
+from .models import Profile
+
+
+def _cache():
+    return caches[settings.PUBLIC_PROFILE_CACHE_ALIAS]
+
+
+def _version_key(username):
+    return f'profile:version:{username}'
+
+
+def _response_key(username, version, variant):
+    return f'profile:response:{username}:{version}:{variant}'
+
+
+def version_from_timestamp(value):
+    """Convert a datetime into a profile version (microseconds since epoch)."""
+    return int(value.timestamp() * 1_000_000)
+
+
+def get_cached_version(username):
+    """Return the cached version of a username's profile without querying."""
+    return _cache().get(_version_key(username))
+
+
+async def aget_cached_version(username):
+    return await _cache().aget(_version_key(username))
+
+
+def remember_profile_version(username, updated_at):
+    """
+    Cache the version read from the database alongside a profile and return
+    the version that is current in the cache.
+    """
+    cache = _cache()
+    version = version_from_timestamp(updated_at)
+    # add() so a concurrent invalidation is never overwritten by a stale read
+    cache.add(_version_key(username), version, settings.PUBLIC_PROFILE_CACHE_TIMEOUT)
+    return cache.get(_version_key(username), version)
+
+
+async def aremember_profile_version(username, updated_at):
+    cache = _cache()
+    version = version_from_timestamp(updated_at)
+    await cache.aadd(_version_key(username), version, settings.PUBLIC_PROFILE_CACHE_TIMEOUT)
+    return await cache.aget(_version_key(username), version)
+
+
+def get_profile_version(username):
+    """
+    Return the current version of a username's profile, or None if the user
+    has no profile. Only a cache miss queries the database.
+    """
+    version = get_cached_version(username)
+    if version is not None:
+        return version
+
+    updated_at = (
+        Profile.objects.filter(user__username=username)
+        .values_list('updated_at', flat=True)
+        .first()
+    )
+    if updated_at is None:
+        return None
+    return remember_profile_version(username, updated_at)
+
+
+def get_cached_response(username, version, variant=''):
+    return _cache().get(_response_key(username, version, variant))
+
+
+def set_cached_response(username, version, data, variant=''):
+    _cache().set(
+        _response_key(username, version, variant),
+        data,
+        settings.PUBLIC_PROFILE_CACHE_TIMEOUT,
+    )
+
+
+async def aget_cached_response(username, version, variant=''):
+    return await _cache().aget(_response_key(username, version, variant))
+
+
+async def aset_cached_response(username, version, data, variant=''):
+    await _cache().aset(
+        _response_key(username, version, variant),
+        data,
+        settings.PUBLIC_PROFILE_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_profile(username, updated_at):
+    """Publish a new version for a username so cached responses go stale."""
+    _cache().set(
+        _version_key(username),
+        version_from_timestamp(updated_at),
+        settings.PUBLIC_PROFILE_CACHE_TIMEOUT,
+    )
+    pin_to_primary([username])
+
+
+def invalidate_profiles(versions):
+    """Publish new versions for many usernames at once ({username: updated_at})."""
+    _cache().set_many(
+        {
+            _version_key(username): version_from_timestamp(updated_at)
+            for username, updated_at in versions.items()
+        },
+        settings.PUBLIC_PROFILE_CACHE_TIMEOUT,
+    )
+    pin_to_primary(list(versions))
+
+
+def forget_profile(username):
+    """Drop the version entry for a username that no longer exists."""
+    _cache().delete(_version_key(username))
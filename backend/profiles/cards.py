@@ -0,0 +1,344 @@
+"""
+Printable business cards rendered with Pillow.
+
+Each of the four profile templates has a layout drawn at 3.5 x 2 inches and
+300 dpi, coloured from the profile's ``background_color``, ``card_color``
+and ``button_color`` (gradients are drawn from their colour stops). Rendered
+files are stored under ``cards/<profile id>/<version>.<ext>``, so a profile
+is only re-rendered after it changes and every device gets the same file.
+"""
+import functools
+import io
+import logging
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageColor, ImageDraw, ImageFont, ImageOps
+
+from .cache import version_from_timestamp
+from .images import load_profile_photo
+from .models import Profile
+from .storage import ContentAddressedStorage
+
+logger = logging.getLogger(__name__)
+
+CARD_DPI = 300
+CARD_SIZE = (1050, 600)  # 3.5 x 2 in
+
+# Format -> (Pillow format, file extension, content type)
+CARD_FORMATS = {
+    'png': ('PNG', 'png', 'image/png'),
+    'pdf': ('PDF', 'pdf', 'application/pdf'),
+}
+
+DEFAULT_COLORS = {
+    'background_color': '#E6E0F2',
+    'card_color': '#FFFFFF',
+    'button_color': '#1E3A8A',
+}
+
+FONT_FILES = {
+    False: ('DejaVuSans.ttf', 'Arial.ttf'),
+    True: ('DejaVuSans-Bold.ttf', 'Arial Bold.ttf'),
+}
+
+COLOR_PATTERN = re.compile(r'#(?:[0-9a-fA-F]{8}|[0-9a-fA-F]{6}|[0-9a-fA-F]{3,4})\b|rgba?\([^)]*\)')
+
+# Versioned names never change content, so the never-rename storage fits
+card_storage = ContentAddressedStorage()
+
+
+def parse_colors(value, default):
+    """
+    Colour stops of a CSS colour or gradient as RGB tuples,
+    e.g. 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)' -> two stops.
+    """
+    stops = []
+    for match in COLOR_PATTERN.findall(value or ''):
+        try:
+            stops.append(ImageColor.getrgb(match)[:3])
+        except ValueError:
+            continue
+    return stops or [ImageColor.getrgb(default)[:3]]
+
+
+def _text_color(rgb):
+    """Dark text on light fills, white on dark ones."""
+    luminance = 0.299 * rgb[0] + 0.587 * rgb[1] + 0.114 * rgb[2]
+    return (31, 41, 55) if luminance > 150 else (255, 255, 255)
+
+
+def _average(colors):
+    return tuple(sum(channel) // len(colors) for channel in zip(*colors))
+
+
+@functools.lru_cache(maxsize=64)
+def _font(size, bold=False):
+    for name in FONT_FILES[bold]:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def _fill(colors, size, vertical=False):
+    """A solid or multi-stop linear gradient image of ``size``."""
+    width, height = size
+    if len(colors) == 1:
+        return Image.new('RGB', size, colors[0])
+    steps = height if vertical else width
+    strip = Image.new('RGB', (1, steps) if vertical else (steps, 1))
+    segments = len(colors) - 1
+    for i in range(steps):
+        position = i / max(steps - 1, 1) * segments
+        index = min(int(position), segments - 1)
+        t = position - index
+        start, end = colors[index], colors[index + 1]
+        color = tuple(round(a + (b - a) * t) for a, b in zip(start, end))
+        strip.putpixel((0, i) if vertical else (i, 0), color)
+    return strip.resize(size)
+
+
+def _paint(image, box, colors, radius=0, corners=None, vertical=False):
+    """Paint a (rounded) rectangle with a solid colour or gradient."""
+    left, top, right, bottom = box
+    size = (right - left, bottom - top)
+    mask = Image.new('L', size, 0)
+    ImageDraw.Draw(mask).rounded_rectangle(
+        (0, 0, size[0] - 1, size[1] - 1), radius=radius, fill=255, corners=corners
+    )
+    image.paste(_fill(colors, size, vertical), (left, top), mask)
+
+
+def _fit(draw, text, max_width, size, bold=False, min_size=18):
+    """Largest font (down to min_size) that fits, truncating with an ellipsis if none does."""
+    while size > min_size and draw.textlength(text, font=_font(size, bold)) > max_width:
+        size -= 2
+    font = _font(size, bold)
+    if draw.textlength(text, font=font) > max_width:
+        while text and draw.textlength(text + '…', font=font) > max_width:
+            text = text[:-1]
+        text = text.rstrip() + '…'
+    return text, font
+
+
+def _text(draw, xy, text, max_width, size, fill, bold=False, anchor='la'):
+    if not text:
+        return 0
+    text, font = _fit(draw, text, max_width, size, bold)
+    draw.text(xy, text, font=font, fill=fill, anchor=anchor)
+    return font.size
+
+
+def _initials(profile):
+    names = (profile.name or profile.user.username).split()
+    if len(names) >= 2:
+        return (names[0][0] + names[1][0]).upper()
+    return (profile.name or profile.user.username)[:2].upper()
+
+
+def _avatar(image, profile, center, diameter, ring, fill):
+    """Circular photo (or initials on ``fill``) with a ring border."""
+    x, y = center
+    border = max(diameter // 40, 4)
+    box = (x - diameter // 2, y - diameter // 2, x + diameter // 2, y + diameter // 2)
+    ImageDraw.Draw(image).ellipse(box, fill=ring)
+
+    inner = diameter - 2 * border
+    mask = Image.new('L', (inner, inner), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, inner - 1, inner - 1), fill=255)
+    photo = load_profile_photo(profile, inner * 2)
+    if photo is not None:
+        tile = ImageOps.fit(photo.convert('RGB'), (inner, inner), Image.LANCZOS)
+    else:
+        tile = Image.new('RGB', (inner, inner), fill)
+        ImageDraw.Draw(tile).text(
+            (inner // 2, inner // 2), _initials(profile),
+            font=_font(inner // 3, True), fill=_text_color(fill), anchor='mm',
+        )
+    image.paste(tile, (box[0] + border, box[1] + border), mask)
+
+
+def _contact_lines(profile):
+    card_url = f"{settings.FRONTEND_URL.rstrip('/')}/{profile.user.username}"
+    lines = [profile.email, profile.phone, card_url.split('://', 1)[-1]]
+    return [line for line in lines if line]
+
+
+def _draw_classic(image, profile, colors):
+    """template1: accent panel on the left with the photo, details on the right."""
+    width, height = image.size
+    draw = ImageDraw.Draw(image)
+    card = _average(colors['card_color'])
+    accent = _average(colors['button_color'])
+    ink = _text_color(card)
+
+    _paint(image, (0, 0, width, height), colors['card_color'])
+    _paint(image, (0, 0, 380, height), colors['button_color'], vertical=True)
+    _avatar(image, profile, (190, height // 2), 250, (255, 255, 255), card)
+
+    left, max_width = 430, width - 430 - 50
+    _text(draw, (left, 130), profile.name or profile.user.username, max_width, 58, ink, bold=True)
+    _text(draw, (left, 215), profile.designation, max_width, 32, accent)
+    draw.line((left, 275, left + 120, 275), fill=accent, width=5)
+    y = 320
+    for line in _contact_lines(profile):
+        _text(draw, (left, y), line, max_width, 28, ink)
+        y += 52
+
+
+def _draw_modern(image, profile, colors):
+    """template2: coloured header band, photo overlapping it, details below."""
+    width, height = image.size
+    draw = ImageDraw.Draw(image)
+    card = _average(colors['card_color'])
+    header = _average(colors['button_color'])
+    ink = _text_color(card)
+
+    _paint(image, (0, 0, width, height), colors['card_color'])
+    _paint(image, (0, 0, width, 230), colors['button_color'])
+    _avatar(image, profile, (170, 230), 230, (255, 255, 255), card)
+
+    left, max_width = 320, width - 320 - 50
+    _text(draw, (left, 150), profile.name or profile.user.username, max_width, 56, _text_color(header), bold=True, anchor='ls')
+    _text(draw, (left, 205), profile.designation, max_width, 30, _text_color(header), anchor='ls')
+    y = 280
+    for line in _contact_lines(profile):
+        _text(draw, (left, y), line, max_width, 28, ink)
+        y += 52
+
+
+def _draw_minimal(image, profile, colors):
+    """template3: centred and sparse, a thin rule between name and title."""
+    width, height = image.size
+    draw = ImageDraw.Draw(image)
+    card = _average(colors['card_color'])
+    ink = _text_color(card)
+    muted = tuple((a + b) // 2 for a, b in zip(ink, card))
+
+    _paint(image, (0, 0, width, height), colors['card_color'])
+    _avatar(image, profile, (width // 2, 120), 150, muted, card)
+
+    center, max_width = width // 2, width - 120
+    _text(draw, (center, 260), profile.name or profile.user.username, max_width, 52, ink, anchor='mt')
+    draw.line((center - 60, 340, center + 60, 340), fill=muted, width=2)
+    _text(draw, (center, 362), profile.designation, max_width, 28, muted, anchor='mt')
+    _text(draw, (center, 470), '  ·  '.join(_contact_lines(profile)), max_width, 24, ink, anchor='mt')
+
+
+def _draw_elegant(image, profile, colors):
+    """template4: card inset on the page colour, accent bar, photo on the right."""
+    width, height = image.size
+    draw = ImageDraw.Draw(image)
+    card = _average(colors['card_color'])
+    accent = _average(colors['button_color'])
+    ink = _text_color(card)
+
+    _paint(image, (0, 0, width, height), colors['background_color'])
+    _paint(image, (30, 30, width - 30, height - 30), colors['button_color'], radius=36)
+    _paint(image, (30, 60, width - 30, height - 30), colors['card_color'], radius=36,
+           corners=(False, False, True, True))
+    _avatar(image, profile, (width - 220, height // 2 + 15), 260, accent, card)
+
+    left, max_width = 90, width - 220 - 130 - 90 - 40
+    _text(draw, (left, 140), profile.name or profile.user.username, max_width, 54, ink, bold=True)
+    draw.line((left, 220, left + max_width, 220), fill=accent, width=3)
+    _text(draw, (left, 240), profile.designation, max_width, 30, accent)
+    y = 330
+    for line in _contact_lines(profile):
+        _text(draw, (left, y), line, max_width, 26, ink)
+        y += 48
+
+
+LAYOUTS = {
+    'template1': _draw_classic,
+    'template2': _draw_modern,
+    'template3': _draw_minimal,
+    'template4': _draw_elegant,
+}
+
+
+def render_card_image(profile):
+    """Draw the card for a profile loaded with its user."""
+    colors = {
+        field: parse_colors(getattr(profile, field), default)
+        for field, default in DEFAULT_COLORS.items()
+    }
+    image = Image.new('RGB', CARD_SIZE, (255, 255, 255))
+    LAYOUTS.get(profile.template, _draw_classic)(image, profile, colors)
+    return image
+
+
+def encode_card(image, file_format):
+    pil_format = CARD_FORMATS[file_format][0]
+    buffer = io.BytesIO()
+    if pil_format == 'PDF':
+        # Page size follows from the resolution: 3.5 x 2 in
+        image.save(buffer, 'PDF', resolution=CARD_DPI)
+    else:
+        image.save(buffer, 'PNG', dpi=(CARD_DPI, CARD_DPI), optimize=True)
+    return buffer.getvalue()
+
+
+def card_directory(profile_id):
+    return f'cards/{profile_id}'
+
+
+def card_name(profile, file_format):
+    """'cards/12/1718000000123456.pdf' for the profile's current version."""
+    version = version_from_timestamp(profile.updated_at)
+    return f'{card_directory(profile.pk)}/{version}.{CARD_FORMATS[file_format][1]}'
+
+
+def card_files(profile_id):
+    directory = card_directory(profile_id)
+    try:
+        files = card_storage.listdir(directory)[1]
+    except FileNotFoundError:
+        return []
+    return [posixpath.join(directory, name) for name in files]
+
+
+def get_cards(profile, formats):
+    """
+    Storage names ({format: name}) of the cards for the profile's current
+    version, drawing the card once for all missing formats. Cards of older
+    versions are deleted.
+    """
+    names = {file_format: card_name(profile, file_format) for file_format in formats}
+    missing = [file_format for file_format, name in names.items() if not card_storage.exists(name)]
+    if not missing:
+        return names
+
+    image = render_card_image(profile)
+    for file_format in missing:
+        card_storage.save(names[file_format], ContentFile(encode_card(image, file_format)))
+
+    current = {card_name(profile, file_format) for file_format in CARD_FORMATS}
+    for stale in card_files(profile.pk):
+        if stale not in current and not stale.endswith('.tmp'):
+            card_storage.delete(stale)
+    return names
+
+
+def get_card(profile, file_format):
+    return get_cards(profile, [file_format])[file_format]
+
+
+def render_card_batch(profile_ids, formats):
+    """
+    Render the cards of a batch of profiles; the unit of work of the
+    ``render_cards`` process pool. Returns (rendered, failed profile IDs).
+    """
+    rendered, failed = 0, []
+    for profile in Profile.objects.select_related('user').filter(pk__in=profile_ids):
+        try:
+            get_cards(profile, formats)
+            rendered += 1
+        except Exception:
+            logger.exception('Could not render card for profile %s', profile.pk)
+            failed.append(profile.pk)
+    return rendered, failed
@@ -0,0 +1,39 @@
+"""
+Conditional GET support for profile endpoints.
+
+The profile version (``updated_at`` in microseconds, see profiles/cache.py)
+doubles as a strong ETag and as Last-Modified, so a request can be answered
+with 304 Not Modified before any profile data is loaded or serialized.
+Gallery changes bump ``updated_at`` as well, so they change the ETag too.
+"""
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# Cache-Control for the public card (shared caches may store it but must
+# revalidate) and for the owner's dashboard view (browser only)
+PUBLIC_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+
+
+def etag_for(version):
+    return f'"{version}"'
+
+
+def not_modified_response(request, version, cache_control):
+    """Return a 304 response if the client's copy is current, else None."""
+    response = get_conditional_response(
+        request,
+        etag=etag_for(version),
+        last_modified=version // 1_000_000,
+    )
+    if response is not None and response.status_code == 304:
+        add_validators(response, version, cache_control)
+    return response
+
+
+def add_validators(response, version, cache_control):
+    """Attach ETag, Last-Modified and Cache-Control to a full response."""
+    response['ETag'] = etag_for(version)
+    response['Last-Modified'] = http_date(version // 1_000_000)
+    response['Cache-Control'] = cache_control
+    return response
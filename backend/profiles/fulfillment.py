@@ -0,0 +1,63 @@
+"""
+Bulk card status transitions for fulfillment batches.
+
+A batch is applied in one transaction as a single UPDATE plus one bulk
+INSERT into the status history, instead of a save() and a full profile
+serialization per card.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Profile, ProfileStatusChange
+from .cache import invalidate_profiles
+
+MAX_BULK_PROFILES = 5000
+
+
+def bulk_transition(profile_ids, target, changed_by=None):
+    """
+    Move the given profiles to ``target`` where Profile.STATUS_TRANSITIONS
+    allows it. Returns a summary dict with the number updated and the
+    profiles skipped, grouped by reason.
+    """
+    sources = [
+        source for source, targets in Profile.STATUS_TRANSITIONS.items()
+        if target in targets
+    ]
+    requested = set(profile_ids)
+
+    with transaction.atomic():
+        rows = list(
+            Profile.objects.select_for_update(of=('self',))
+            .filter(id__in=requested)
+            .values_list('id', 'status', 'user__username')
+        )
+        allowed = [(pk, status, username) for pk, status, username in rows if status in sources]
+
+        now = timezone.now()
+        updated = Profile.objects.filter(
+            id__in=[pk for pk, _, _ in allowed], status__in=sources
+        ).update(status=target, updated_at=now, public_snapshot='')
+
+        ProfileStatusChange.objects.bulk_create([
+            ProfileStatusChange(
+                profile_id=pk, from_status=status, to_status=target,
+                changed_by=changed_by, changed_at=now,
+            )
+            for pk, status, _ in allowed
+        ])
+
+        # Snapshots are rebuilt lazily by the next public read
+        usernames = {username: now for _, _, username in allowed}
+        transaction.on_commit(lambda: invalidate_profiles(usernames))
+
+    found = {pk for pk, _, _ in rows}
+    skipped = {}
+    for pk, status, _ in rows:
+        if status not in sources:
+            skipped.setdefault(f'not_allowed_from_{status}', []).append(pk)
+    not_found = sorted(requested - found)
+    if not_found:
+        skipped['not_found'] = not_found
+
+    return {'status': target, 'updated': updated, 'skipped': skipped}
@@ -0,0 +1,78 @@
+"""
+Incremental gallery updates.
+
+The gallery is described as an ordered list of slots, each either the ID of
+an existing GalleryImage (kept, possibly moved) or a newly uploaded file.
+Only the difference to the current rows is written: removed slots are
+deleted, moved slots get a new position, and an upload whose bytes match an
+image already in the gallery reuses that row instead of storing a copy.
+"""
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import GalleryImage
+from .storage import file_sha256
+
+MAX_GALLERY_IMAGES = 3
+
+
+def plan_gallery(profile, slots):
+    """
+    Validate ``slots`` (ints for existing image IDs, file objects for
+    uploads) against the profile's gallery and work out what to write.
+    Raises ValidationError without touching the database.
+    """
+    if len(slots) > MAX_GALLERY_IMAGES:
+        raise serializers.ValidationError({'gallery': [f'Maximum {MAX_GALLERY_IMAGES} gallery images allowed']})
+
+    existing = {image.pk: image for image in profile.gallery_images.all()}
+    by_hash = {image.content_hash: image for image in existing.values() if image.content_hash}
+
+    placements = []  # (position, existing image or None, upload or None, hash)
+    claimed = set()
+    for position, slot in enumerate(slots):
+        if isinstance(slot, int):
+            image = existing.get(slot)
+            if image is None or image.pk in claimed:
+                raise serializers.ValidationError({'gallery': [f'Unknown gallery image id: {slot}']})
+            claimed.add(image.pk)
+            placements.append((position, image, None, None))
+        else:
+            digest = file_sha256(slot)
+            image = by_hash.get(digest)
+            if image is not None and image.pk not in claimed:
+                # Same bytes as an image already in this gallery
+                claimed.add(image.pk)
+                placements.append((position, image, None, None))
+            else:
+                placements.append((position, None, slot, digest))
+
+    removed = [image for image in existing.values() if image.pk not in claimed]
+    return removed, placements
+
+
+def apply_gallery_plan(profile, plan):
+    """Write a plan from plan_gallery(). Returns the number of rows written or deleted."""
+    removed, placements = plan
+    writes = 0
+    with transaction.atomic():
+        for image in removed:
+            image.delete()
+            writes += 1
+        for position, image, upload, digest in placements:
+            if image is not None:
+                if image.position != position:
+                    image.position = position
+                    image.save(update_fields=['position'])
+                    writes += 1
+            else:
+                GalleryImage.objects.create(
+                    profile=profile, image=upload, content_hash=digest, position=position
+                )
+                writes += 1
+    return writes
+
+
+def sync_gallery(profile, slots):
+    """Make the profile's gallery match ``slots``; see plan_gallery()."""
+    return apply_gallery_plan(profile, plan_gallery(profile, slots))
@@ -0,0 +1,152 @@
+"""
+Responsive image derivatives for profile and gallery uploads.
+
+Each uploaded image is re-encoded into a few widths, in WebP and in JPEG as
+a fallback. Re-encoding drops the EXIF block (phone GPS data included) and
+``exif_transpose`` bakes the camera orientation into the pixels first, so
+the variants display upright without metadata.
+"""
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .storage import ContentAddressedStorage
+
+logger = logging.getLogger(__name__)
+
+# Variants are named after their source, which is named after its bytes: an
+# existing variant file already holds what would be written, so it is reused
+# (never deleted and rewritten under concurrent readers) and new files are
+# renamed into place whole
+variant_storage = ContentAddressedStorage()
+
+# Variant name -> maximum width in pixels (images are never upscaled)
+VARIANT_WIDTHS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1280,
+}
+
+# Output format -> (Pillow format, file extension, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_path(source_name, variant, extension):
+    """'profiles/me.jpg' -> 'variants/profiles/me_card.webp'"""
+    stem = posixpath.splitext(source_name)[0]
+    return f'variants/{stem}_{variant}.{extension}'
+
+
+def variant_source_stem(path):
+    """'variants/profiles/me_card.webp' -> 'profiles/me'; None for other paths."""
+    if not path.startswith('variants/'):
+        return None
+    stem = posixpath.splitext(path[len('variants/'):])[0]
+    return stem.rpartition('_')[0] or None
+
+
+def derived_variant_files(source_name):
+    """Every variant path generate_variants() would write for a source file."""
+    return [
+        variant_path(source_name, variant, extension)
+        for variant in VARIANT_WIDTHS
+        for pil_format, extension, options in VARIANT_FORMATS.values()
+    ]
+
+
+def _encode(image, pil_format, options):
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha channel: flatten onto white
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode in ('RGBA', 'LA'):
+            background.paste(image, mask=image.getchannel('A'))
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(field_file, storage=variant_storage):
+    """
+    Write every size/format variant of an image field file to storage.
+
+    Returns the map stored on the model, e.g.
+    ``{'source': 'profiles/me.jpg', 'card': {'width': 480, 'webp': '...', 'jpeg': '...'}}``,
+    an empty dict for an empty field, or just the source if the image can't
+    be decoded (so it isn't retried on every save).
+    """
+    if not field_file:
+        return {}
+
+    try:
+        with field_file.open('rb') as f:
+            original = Image.open(f)
+            original = ImageOps.exif_transpose(original)
+            original.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning('Could not decode image %s for variants', field_file.name, exc_info=True)
+        return {'source': field_file.name}
+
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+
+    variants = {'source': field_file.name}
+    for variant, max_width in VARIANT_WIDTHS.items():
+        resized = original.copy()
+        resized.thumbnail((max_width, max_width * 4), Image.LANCZOS)
+        entry = {'width': resized.width}
+        for key, (pil_format, extension, options) in VARIANT_FORMATS.items():
+            path = variant_path(field_file.name, variant, extension)
+            entry[key] = storage.save(path, ContentFile(_encode(resized, pil_format, options)))
+        variants[variant] = entry
+    return variants
+
+
+def variants_are_current(variants, field_file):
+    """True if a stored variant map was generated from the file now in the field."""
+    if not field_file:
+        return not variants
+    return bool(variants) and variants.get('source') == field_file.name
+
+
+def load_profile_photo(profile, max_size):
+    """
+    Decode the profile photo, upright and fitted within ``max_size`` pixels.
+    Reads the 480px JPEG variant when it is current, which is far cheaper
+    than the original upload. Returns None if there is no usable photo.
+    """
+    if not profile.profile_image:
+        return None
+    variants = profile.profile_image_variants
+    try:
+        if variants_are_current(variants, profile.profile_image) and variants.get('card'):
+            source = default_storage.open(variants['card']['jpeg'], 'rb')
+        else:
+            source = profile.profile_image.open('rb')
+        with source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image.thumbnail((max_size, max_size), Image.LANCZOS)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning('Could not decode photo of profile %s', profile.pk, exc_info=True)
+        return None
+    return image
+
+
+def variant_files(variants):
+    """Every file path recorded in a variant map, the source included."""
+    paths = [variants['source']] if variants.get('source') else []
+    for name in VARIANT_WIDTHS:
+        entry = variants.get(name)
+        if entry:
+            paths.extend(entry[key] for key in VARIANT_FORMATS)
+    return paths
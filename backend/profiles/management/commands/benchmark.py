@@ -0,0 +1,81 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.benchmark import (
+    ENDPOINTS, benchmark_endpoint, build_context, cleanup, compare, metadata, seed, setup_differences,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the card API hot paths through the WSGI app: seeds benchmark users, then reports '
+        'throughput, p50/p95/p99 latency and SQL queries per endpoint, optionally as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Benchmark users to seed (default: 1000)')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint first')
+        parser.add_argument('--workers', type=int, default=1, help='Concurrent worker processes per endpoint')
+        parser.add_argument('--endpoint', dest='endpoints', action='append', choices=list(ENDPOINTS),
+                            help='Endpoint to run (repeatable, default: all)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for picking users')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Baseline JSON file; exits with an error on regressions')
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help='Allowed relative p95/throughput change against the baseline (default: 0.10)')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark users and exit')
+        parser.add_argument('--allow-production', action='store_true',
+                            help='Run even though DEBUG is off (seeds users into this database)')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_production']:
+            raise CommandError('Refusing to seed benchmark users with DEBUG off; pass --allow-production')
+        if options['cleanup']:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {cleanup()} benchmark user(s).'))
+            return
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        created = seed(options['users'])
+        if created:
+            self.stdout.write(f'Seeded {created} benchmark user(s).')
+        context = build_context(seed_value=options['seed'])
+        workers = max(1, options['workers'])
+
+        results = {
+            'meta': metadata(len(context['usernames']), options['requests'], workers),
+            'endpoints': {},
+        }
+        self.stdout.write(
+            f"{'endpoint':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'errors':>8}"
+        )
+        for name in options['endpoints'] or list(ENDPOINTS):
+            summary = benchmark_endpoint(
+                name, context, max(1, options['requests']), workers, max(0, options['warmup']), options['seed']
+            )
+            results['endpoints'][name] = summary
+            self.stdout.write(
+                f"{name:<20}{summary['throughput_rps']:>10.1f}{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}"
+                f"{summary['p99_ms']:>10.2f}{summary['queries_per_request']:>9.1f}{summary['errors']:>8}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}.")
+
+        if baseline is not None:
+            for line in setup_differences(baseline, results):
+                self.stderr.write(self.style.WARNING(f'Baseline was run differently: {line}'))
+            regressions = compare(baseline, results, options['threshold'])
+            if regressions:
+                for line in regressions:
+                    self.stderr.write(self.style.ERROR(line))
+                raise CommandError(f'{len(regressions)} regression(s) against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
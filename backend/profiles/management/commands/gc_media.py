@@ -0,0 +1,51 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.media_gc import SWEEP_PREFIXES, collect
+
+
+class Command(BaseCommand):
+    help = 'Delete (or quarantine) media files that no profile or gallery image references.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be reclaimed')
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Keep unreferenced files younger than this (default: 24)')
+        parser.add_argument('--quarantine', help='Move files into this directory instead of deleting them')
+        parser.add_argument('--prefix', dest='prefixes', action='append', choices=SWEEP_PREFIXES,
+                            help='Media directory to sweep (repeatable, default: all)')
+        parser.add_argument('--workers', type=int, default=8, help='Threads listing directories')
+
+    def handle(self, *args, **options):
+        if options['grace_hours'] < 1:
+            # Uploads are written before the row that points to them
+            raise CommandError('--grace-hours must be at least 1')
+        quarantine = options['quarantine']
+        if quarantine:
+            quarantine = os.path.abspath(quarantine)
+            if quarantine.startswith(os.path.abspath(settings.MEDIA_ROOT) + os.sep):
+                raise CommandError('--quarantine must be outside MEDIA_ROOT')
+
+        stats = collect(
+            grace_seconds=options['grace_hours'] * 3600,
+            dry_run=options['dry_run'],
+            quarantine=quarantine,
+            prefixes=options['prefixes'] or SWEEP_PREFIXES,
+            workers=options['workers'],
+        )
+        mb = 1024 * 1024
+        self.stdout.write(
+            f"Scanned {stats['scanned']} file(s) ({stats['scanned_bytes'] / mb:.1f} MB) "
+            f"against {stats['referenced']} referenced path(s)."
+        )
+        if options['dry_run']:
+            self.stdout.write(
+                f"Would reclaim {stats['orphan_bytes'] / mb:.1f} MB from {stats['orphans']} unreferenced file(s)."
+            )
+        else:
+            action = f'Moved to {quarantine}' if quarantine else 'Deleted'
+            self.stdout.write(self.style.SUCCESS(
+                f"{action}: {stats['removed']} unreferenced file(s), {stats['orphan_bytes'] / mb:.1f} MB."
+            ))
@@ -0,0 +1,47 @@
+import csv
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.models import Profile
+from profiles.provisioning import import_cards
+
+
+class Command(BaseCommand):
+    help = 'Create users and cards from a CSV (columns: username, email, password, name, ...) without per-row signals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path of the CSV file (UTF-8, header row first)')
+        parser.add_argument('--status', default='payment_received', choices=[value for value, label in Profile.STATUS_CHOICES],
+                            help='Status of rows without a status column (default: payment_received)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of password hashing workers')
+        parser.add_argument('--pool', choices=('process', 'thread'), default='process',
+                            help='Hash passwords in worker processes or threads')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows per INSERT transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the rows')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], 'rb') as file:
+                report = import_cards(
+                    file, workers=options['workers'], pool=options['pool'], chunk_size=options['chunk_size'],
+                    default_status=options['status'], dry_run=options['dry_run'],
+                )
+        except OSError as error:
+            raise CommandError(f"Could not read {options['csv_file']}: {error}")
+        except (ValidationError, UnicodeDecodeError, csv.Error) as error:
+            raise CommandError(f"Invalid CSV: {'; '.join(getattr(error, 'messages', [str(error)]))}")
+
+        if report['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"{report['valid']} of {report['rows']} row(s) valid (dry run, nothing created)."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Created {report['created']} of {report['rows']} card(s) in {report['seconds']} s "
+                f"({report['rows_per_second']} rows/s; validating {report['validate_seconds']} s, "
+                f"hashing {report['hash_seconds']} s, inserting {report['insert_seconds']} s)."
+            ))
+        for error in report['errors']:
+            self.stderr.write(self.style.ERROR(f"Line {error['line']} ({error['username']}): {error['error']}"))
@@ -0,0 +1,118 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from profiles.models import Profile, GalleryImage
+from profiles.snapshots import rebuild_snapshots
+from profiles.storage import is_content_addressed, relocate_file
+from profiles.tasks import delete_media
+
+# (model, image field, directory prefix)
+TARGETS = (
+    (Profile, 'profile_image', 'profiles'),
+    (GalleryImage, 'image', 'gallery'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move profile and gallery images into the hash-sharded layout and rewrite their paths. '
+        'Progress is kept in the database, so an interrupted run can simply be started again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=min(32, (os.cpu_count() or 1) * 4),
+                            help='Threads hashing and linking files')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per UPDATE batch')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the files that would move')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        with ThreadPoolExecutor(max(1, options['workers'])) as pool:
+            for model, field, prefix in TARGETS:
+                moved, missing, size = self._migrate(model, field, prefix, pool, batch_size, options['dry_run'])
+                label = str(model._meta.verbose_name_plural).lower()
+                if options['dry_run']:
+                    self.stdout.write(f'{moved} {label} to move ({size / 1024 / 1024:.1f} MB), {missing} missing file(s).')
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'Moved {moved} {label}, {missing} missing file(s) skipped.'))
+
+    def _pending(self, model, field, prefix):
+        return (
+            model.objects.exclude(**{f'{field}__isnull': True})
+            .exclude(**{field: ''})
+            .exclude(**{f'{field}__regex': rf'^{prefix}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}'})
+        )
+
+    def _migrate(self, model, field, prefix, pool, batch_size, dry_run):
+        storage = model._meta.get_field(field).storage
+        has_hash = field == 'image'  # GalleryImage keeps content_hash
+        variants_field = 'variants' if has_hash else 'profile_image_variants'
+        fields = ['pk', field, variants_field, *(['content_hash', 'profile_id'] if has_hash else [])]
+
+        moved = missing = size = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                self._pending(model, field, prefix).filter(pk__gt=last_pk).order_by('pk').only(*fields)[:batch_size]
+            )
+            if not rows:
+                return moved, missing, size
+            last_pk = rows[-1].pk
+            rows = [row for row in rows if not is_content_addressed(getattr(row, field).name, prefix)]
+
+            if dry_run:
+                for row in rows:
+                    try:
+                        size += storage.size(getattr(row, field).name)
+                        moved += 1
+                    except FileNotFoundError:
+                        missing += 1
+                continue
+
+            def relocate(row):
+                name = getattr(row, field).name
+                try:
+                    return relocate_file(storage, name, prefix, (row.content_hash if has_hash else None) or None)
+                except FileNotFoundError:
+                    return None
+
+            old_names = {}
+            for row, result in zip(rows, pool.map(relocate, rows)):
+                if result is None:
+                    missing += 1
+                    self.stderr.write(f'Missing file for {model.__name__} {row.pk}: {getattr(row, field).name}')
+                    continue
+                old_names[row.pk] = (getattr(row, field).name, *result)
+            moved += self._write(model, field, variants_field, has_hash, old_names)
+
+    def _write(self, model, field, variants_field, has_hash, old_names):
+        """Point the rows at their new names in batched UPDATEs, then drop the old files."""
+        if not old_names:
+            return 0
+        with transaction.atomic():
+            # Re-read under lock and skip rows whose image changed meanwhile
+            rows = [
+                row for row in model.objects.select_for_update().filter(pk__in=old_names).only(
+                    'pk', field, variants_field, *(['content_hash', 'profile_id'] if has_hash else [])
+                )
+                if getattr(row, field).name == old_names[row.pk][0]
+            ]
+            for row in rows:
+                old_name, new_name, digest = old_names[row.pk]
+                setattr(row, field, new_name)
+                variants = getattr(row, variants_field)
+                if variants and variants.get('source') == old_name:
+                    variants['source'] = new_name  # the variant files themselves stay valid
+                if has_hash:
+                    row.content_hash = digest
+            update_fields = [field, variants_field, *(['content_hash'] if has_hash else [])]
+            model.objects.bulk_update(rows, update_fields)
+
+        # Snapshots hold media URLs: rebuild them, which also publishes new cache versions
+        profile_ids = {row.profile_id if has_hash else row.pk for row in rows}
+        rebuild_snapshots(Profile.objects.filter(pk__in=profile_ids))
+        delete_media(sorted({old_names[row.pk][0] for row in rows}))
+        return len(rows)
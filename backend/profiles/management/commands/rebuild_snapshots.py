@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from profiles.models import Profile
+from profiles.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored public JSON snapshot of every profile (run after template or serializer changes).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Profiles per UPDATE batch')
+        parser.add_argument('--username', action='append', default=[], help='Only rebuild these usernames (repeatable)')
+
+    def handle(self, *args, **options):
+        queryset = Profile.objects.all()
+        if options['username']:
+            queryset = queryset.filter(user__username__in=options['username'])
+
+        count = rebuild_snapshots(queryset, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} profile snapshot(s).'))
@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from profiles.cards import render_card_batch, CARD_FORMATS
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Pre-render printable cards (PNG/PDF) for profiles awaiting printing, across a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', default='printing', choices=[value for value, label in Profile.STATUS_CHOICES],
+                            help='Render cards for profiles in this status (default: printing)')
+        parser.add_argument('--username', action='append', default=[], help='Only render these usernames (repeatable)')
+        parser.add_argument('--format', dest='formats', action='append', choices=list(CARD_FORMATS),
+                            help='Card format to render (repeatable, default: all)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=50, help='Profiles per worker task')
+
+    def handle(self, *args, **options):
+        queryset = Profile.objects.filter(status=options['status'])
+        if options['username']:
+            queryset = queryset.filter(user__username__in=options['username'])
+        profile_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        formats = options['formats'] or list(CARD_FORMATS)
+        if not profile_ids:
+            self.stdout.write('No profiles to render.')
+            return
+
+        batch_size = max(1, options['batch_size'])
+        batches = [profile_ids[i:i + batch_size] for i in range(0, len(profile_ids), batch_size)]
+        workers = max(1, min(options['workers'], len(batches)))
+
+        rendered, failed = 0, []
+        if workers == 1:
+            for batch in batches:
+                count, errors = render_card_batch(batch, formats)
+                rendered += count
+                failed.extend(errors)
+        else:
+            # Forked children must not share the parent's DB connections
+            connections.close_all()
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                futures = [pool.submit(render_card_batch, batch, formats) for batch in batches]
+                for future in as_completed(futures):
+                    count, errors = future.result()
+                    rendered += count
+                    failed.extend(errors)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered cards for {rendered} profile(s) ({', '.join(formats)}) with {workers} worker(s)."
+        ))
+        if failed:
+            self.stderr.write(self.style.ERROR(
+                f"Failed for {len(failed)} profile(s): {', '.join(map(str, sorted(failed)))}"
+            ))
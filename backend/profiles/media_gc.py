@@ -0,0 +1,134 @@
+"""
+Mark-and-sweep collection of media files that nothing references.
+
+Mark: every referenced path (profile photos, gallery images and their
+variants) is streamed out of the database in chunks and kept as an 8-byte
+hash, so millions of paths fit in a few tens of MB. A hash collision can
+only keep an orphan, never delete a referenced file.
+
+Sweep: the media directories are walked by a pool of ``os.scandir``
+workers. Unreferenced files older than the grace period are deleted or moved
+to a quarantine directory. The grace period covers files written just before
+the row pointing to them is committed (reused content-addressed files get a
+fresh mtime, see ContentAddressedStorage).
+"""
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from django.conf import settings
+
+from .images import variant_files
+from .models import Profile, GalleryImage
+
+# Directories under MEDIA_ROOT holding uploads and their variants
+# (printable cards are pruned by profiles/cards.py itself)
+SWEEP_PREFIXES = ('profiles', 'gallery', 'variants')
+RECHECK_CHUNK_SIZE = 500
+
+
+def _key(path):
+    return hashlib.blake2b(path.encode(), digest_size=8).digest()
+
+
+def referenced_keys(chunk_size=2000):
+    """Hashes of every media path stored in the database."""
+    keys = set()
+    sources = (
+        Profile.objects.values_list('profile_image', 'profile_image_variants'),
+        GalleryImage.objects.values_list('image', 'variants'),
+    )
+    for queryset in sources:
+        for name, variants in queryset.iterator(chunk_size=chunk_size):
+            if name:
+                keys.add(_key(name))
+            if variants:
+                keys.update(_key(path) for path in variant_files(variants))
+    return keys
+
+
+def _list_dir(path):
+    """(subdirectories, [(path, size, mtime)]) of one directory."""
+    dirs, files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append((entry.path, stat.st_size, stat.st_mtime))
+    except FileNotFoundError:
+        pass
+    return dirs, files
+
+
+def scan(root, prefixes=SWEEP_PREFIXES, workers=8):
+    """Yield (path, size, mtime) of every file below root/<prefix>, listing directories in parallel."""
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        pending = {pool.submit(_list_dir, os.path.join(root, prefix)) for prefix in prefixes}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dirs, files = future.result()
+                pending.update(pool.submit(_list_dir, path) for path in dirs)
+                yield from files
+
+
+def _still_unreferenced(names):
+    """Drop names a row started pointing to after the mark phase."""
+    referenced = set(
+        Profile.objects.filter(profile_image__in=names).values_list('profile_image', flat=True)
+    ) | set(
+        GalleryImage.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+    return [name for name in names if name not in referenced]
+
+
+def collect(grace_seconds, dry_run=False, quarantine=None, prefixes=SWEEP_PREFIXES, workers=8, root=None):
+    """
+    Find unreferenced media files older than ``grace_seconds`` and delete
+    them, or move them below ``quarantine``. Returns counters for a report.
+    """
+    root = root or settings.MEDIA_ROOT
+    keys = referenced_keys()
+    cutoff = time.time() - grace_seconds
+    stats = {
+        'referenced': len(keys),
+        'scanned': 0,
+        'scanned_bytes': 0,
+        'orphans': 0,
+        'orphan_bytes': 0,
+        'removed': 0,
+    }
+
+    candidates = []
+    for path, size, mtime in scan(root, prefixes, workers):
+        stats['scanned'] += 1
+        stats['scanned_bytes'] += size
+        name = os.path.relpath(path, root).replace(os.sep, '/')
+        if mtime < cutoff and _key(name) not in keys:
+            candidates.append((name, size))
+    del keys
+
+    for i in range(0, len(candidates), RECHECK_CHUNK_SIZE):
+        chunk = dict(candidates[i:i + RECHECK_CHUNK_SIZE])
+        for name in _still_unreferenced(list(chunk)):
+            stats['orphans'] += 1
+            stats['orphan_bytes'] += chunk[name]
+            if dry_run:
+                continue
+            source = os.path.join(root, name)
+            try:
+                if quarantine:
+                    target = os.path.join(quarantine, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(source, target)
+                else:
+                    os.remove(source)
+                stats['removed'] += 1
+            except FileNotFoundError:
+                pass
+    return stats
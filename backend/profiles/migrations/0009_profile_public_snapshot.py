@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0008_profile_figma_profile_twitter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='public_snapshot',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:44
+
+from django.db import migrations, models
+import profiles.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0010_galleryimage_variants_profile_profile_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='galleryimage',
+            options={'ordering': ['position', 'created_at'], 'verbose_name': 'Gallery Image', 'verbose_name_plural': 'Gallery Images'},
+        ),
+        migrations.AddField(
+            model_name='galleryimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='galleryimage',
+            name='position',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='galleryimage',
+            name='image',
+            field=models.ImageField(max_length=255, storage=profiles.storage.content_addressed_storage, upload_to=profiles.storage.gallery_upload_to),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0011_alter_galleryimage_options_galleryimage_content_hash_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['status'], name='profiles_pr_status_2735dc_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('profiles', '0012_profile_profiles_pr_status_2735dc_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('payment_received', 'Payment Received'), ('printing', 'Printing'), ('shipped', 'Shipped'), ('delivered', 'Delivered')], max_length=20)),
+                ('to_status', models.CharField(choices=[('payment_received', 'Payment Received'), ('printing', 'Printing'), ('shipped', 'Shipped'), ('delivered', 'Delivered')], max_length=20)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='profiles.profile')),
+            ],
+            options={
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['profile', 'changed_at'], name='profiles_pr_profile_0cff1a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:06
+
+from django.db import migrations, models
+import profiles.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0014_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='profile_image',
+            field=models.ImageField(blank=True, max_length=255, null=True, storage=profiles.storage.content_addressed_storage, upload_to=profiles.storage.profile_image_upload_to),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:25
+
+from django.db import migrations, models
+import profiles.shortcodes
+
+
+def assign_short_codes(apps, schema_editor):
+    """Give existing profiles a code; the snapshot is cleared to rebuild with it."""
+    Profile = apps.get_model('profiles', 'Profile')
+    used = set()
+    rows = list(Profile.objects.filter(short_code__isnull=True).only('pk'))
+    for profile in rows:
+        code = profiles.shortcodes.new_short_code()
+        while code in used:
+            code = profiles.shortcodes.new_short_code()
+        used.add(code)
+        profile.short_code = code
+        profile.public_snapshot = ''
+    Profile.objects.bulk_update(rows, ['short_code', 'public_snapshot'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0015_alter_profile_profile_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='short_code',
+            field=models.CharField(editable=False, max_length=8, null=True),
+        ),
+        migrations.RunPython(assign_short_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='profile',
+            name='short_code',
+            field=models.CharField(default=profiles.shortcodes.new_short_code, editable=False, max_length=8, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['updated_at'], name='profiles_pr_updated_d17d1b_idx'),
+        ),
+    ]
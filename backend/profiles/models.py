@@ -1,6 +1,12 @@
+import copy
+import uuid
+
 from django.db import models
+from django.db.models.fields.files import FieldFile
 from django.contrib.auth import get_user_model
 from django.core.validators import URLValidator
+from .storage import gallery_upload_to, profile_image_upload_to, content_addressed_storage
+from .shortcodes import new_short_code, short_url
 
 User = get_user_model()
 
@@ -8,11 +14,19 @@ User = get_user_model()
 class GalleryImage(models.Model):
     """Gallery images for user profiles."""
     profile = models.ForeignKey('Profile', on_delete=models.CASCADE, related_name='gallery_images')
-    image = models.ImageField(upload_to='gallery/', blank=False, null=False)
+    # Stored under the SHA-256 of its bytes, so identical uploads share one file
+    image = models.ImageField(
+        upload_to=gallery_upload_to, storage=content_addressed_storage,
+        blank=False, null=False, max_length=255
+    )
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
+    position = models.PositiveSmallIntegerField(default=0)
+    # Resized WebP/JPEG renditions of image (see profiles/images.py)
+    variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        ordering = ['created_at']
+        ordering = ['position', 'created_at']
         verbose_name = 'Gallery Image'
         verbose_name_plural = 'Gallery Images'
     
@@ -20,6 +34,31 @@ class GalleryImage(models.Model):
         return f"Gallery image for {self.profile.username}"
 
 
+class ProfileQuerySet(models.QuerySet):
+    def for_public(self):
+        """
+        Load profiles with their user and gallery in exactly two queries:
+        one joined SELECT for profile + user, one for the gallery images.
+        """
+        return self.select_related('user').prefetch_related(
+            models.Prefetch(
+                'gallery_images',
+                queryset=GalleryImage.objects.order_by('position', 'created_at'),
+            )
+        )
+
+    def ensure_for_user(self, user):
+        """The user's profile, created with their name and email if missing."""
+        profile, created = self.get_or_create(
+            user=user,
+            defaults={
+                'name': user.get_full_name() or user.email or user.username,
+                'email': user.email,
+            },
+        )
+        return profile
+
+
 class Profile(models.Model):
     STATUS_CHOICES = [
         ('payment_received', 'Payment Received'),
@@ -28,6 +67,14 @@ class Profile(models.Model):
         ('delivered', 'Delivered'),
     ]
     
+    # Allowed moves for bulk fulfillment updates (one step forward at a time)
+    STATUS_TRANSITIONS = {
+        'payment_received': ('printing',),
+        'printing': ('shipped',),
+        'shipped': ('delivered',),
+        'delivered': (),
+    }
+    
     TEMPLATE_CHOICES = [
         ('template1', 'Template 1 - Classic'),
         ('template2', 'Template 2 - Modern'),
@@ -36,7 +83,15 @@ class Profile(models.Model):
     ]
     
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
-    profile_image = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # Immutable code for NFC tag URLs, independent of the username (see profiles/shortcodes.py)
+    short_code = models.CharField(max_length=8, unique=True, default=new_short_code, editable=False)
+    # Stored under the SHA-256 of its bytes, like gallery images
+    profile_image = models.ImageField(
+        upload_to=profile_image_upload_to, storage=content_addressed_storage,
+        blank=True, null=True, max_length=255
+    )
+    # Resized WebP/JPEG renditions of profile_image (see profiles/images.py)
+    profile_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     name = models.CharField(max_length=255, blank=True, default='')
     designation = models.CharField(max_length=255, blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
@@ -63,13 +118,168 @@ class Profile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Rendered public JSON, regenerated after every write (see profiles/snapshots.py)
+    public_snapshot = models.TextField(blank=True, default='', editable=False)
+
+    objects = ProfileQuerySet.as_manager()
+
+    # Not compared for dirty tracking: save() writes these itself
+    UNTRACKED_FIELDS = ('id', 'created_at', 'updated_at', 'public_snapshot')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded()
+        return instance
+
+    @staticmethod
+    def _comparable(value):
+        if isinstance(value, FieldFile):
+            return value.name
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
+
+    def _tracked_fields(self):
+        return [
+            field for field in self._meta.concrete_fields
+            if field.name not in self.UNTRACKED_FIELDS and field.attname in self.__dict__
+        ]
+
+    def _remember_loaded(self, field_names=None):
+        """Store the current values as the ones in the database (only ``field_names``, if given)."""
+        fields = self._tracked_fields()
+        if field_names is None:
+            self._loaded_values = {}
+        else:
+            fields = [field for field in fields if field.name in field_names or field.attname in field_names]
+            if getattr(self, '_loaded_values', None) is None:
+                self._loaded_values = {}
+        self._loaded_values.update(
+            (field.attname, self._comparable(self.__dict__[field.attname])) for field in fields
+        )
+
+    def dirty_fields(self):
+        """
+        Names of the fields changed since the profile was loaded or saved,
+        or None for a profile that didn't come from the database.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        dirty = set()
+        for field in self._tracked_fields():
+            value = self.__dict__[field.attname]
+            if isinstance(value, FieldFile) and not value._committed:
+                dirty.add(field.name)  # new upload, even under the old name
+            elif field.attname not in loaded or self._comparable(value) != loaded[field.attname]:
+                dirty.add(field.name)
+        return dirty
+
     @property
     def username(self):
         return self.user.username
 
+    @property
+    def short_url(self):
+        return short_url(self.short_code)
+
+    def save(self, *args, **kwargs):
+        # Without explicit update_fields only the changed columns are
+        # written, and nothing at all (no signals either) if none changed.
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            dirty = self.dirty_fields()
+            if dirty is not None:
+                if not dirty:
+                    return
+                update_fields = dirty
+        # Clear the snapshot in the same UPDATE that changes the profile so a
+        # concurrent reader never pairs the new version with the old snapshot.
+        self.public_snapshot = ''
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'public_snapshot', 'updated_at'}
+        super().save(*args, **kwargs)
+        # Fields changed in memory but left out of update_fields stay dirty
+        self._remember_loaded(kwargs.get('update_fields'))
+
     def __str__(self):
         return f"{self.name} ({self.username})"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status']),
+            models.Index(fields=['updated_at']),  # short code index refreshes
+        ]
+
 
+
+class ProfileStatusChange(models.Model):
+    """Audit trail of card status changes."""
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=20, choices=Profile.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Profile.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['profile', 'changed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.profile_id}: {self.from_status} -> {self.to_status}"
+
+
+class ChunkedUpload(models.Model):
+    """A resumable image upload in progress (see profiles/uploads.py)."""
+    TARGET_CHOICES = [
+        ('profile_image', 'Profile image'),
+        ('gallery', 'Gallery image'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='uploads')
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()  # declared total bytes
+    received = models.PositiveIntegerField(default=0)  # bytes stored so far, from the start
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.target} upload {self.pk} ({self.received}/{self.size})"
+
+
+class CardImport(models.Model):
+    """A CSV of cards uploaded in the admin and imported by a job (see profiles/provisioning.py)."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    filename = models.CharField(max_length=255)
+    default_status = models.CharField(max_length=20, choices=Profile.STATUS_CHOICES, default='payment_received',
+                                      help_text='Status of rows without a status column')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    report = models.JSONField(default=dict, blank=True)  # import_cards() result, or {'error': ...}
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
@@ -0,0 +1,69 @@
+"""
+Open Graph previews of card links.
+
+Link scrapers (WhatsApp, LinkedIn, Slack, ...) don't run JavaScript, so the
+SPA shell gives them no profile metadata. The card URL is routed to Django
+for those user agents and answered with a small HTML page carrying the
+og: tags, cached per profile version like the JSON response.
+"""
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+
+from .images import variants_are_current
+
+# Matched case-insensitively against the User-Agent header
+CRAWLER_PATTERN = re.compile(
+    r'facebookexternalhit|facebot|whatsapp|linkedinbot|twitterbot|slackbot|'
+    r'telegrambot|discordbot|skypeuripreview|pinterest|redditbot|embedly|'
+    r'googlebot|bingbot|applebot|duckduckbot|yandex|baiduspider|'
+    r'vkshare|w3c_validator|iframely|quora link preview|outbrain',
+    re.IGNORECASE,
+)
+
+DESCRIPTION_LENGTH = 200
+
+
+def is_crawler(user_agent):
+    return bool(user_agent) and CRAWLER_PATTERN.search(user_agent) is not None
+
+
+def card_url(username):
+    return f"{settings.FRONTEND_URL.rstrip('/')}/{username}"
+
+
+def _absolute(name):
+    return f"{settings.PUBLIC_BASE_URL.rstrip('/')}{default_storage.url(name)}"
+
+
+def _image(profile):
+    """(url, width) of the preview image; the 480px JPEG variant when available."""
+    if not profile.profile_image:
+        return None, None
+    variants = profile.profile_image_variants
+    if variants_are_current(variants, profile.profile_image) and variants.get('card'):
+        return _absolute(variants['card']['jpeg']), variants['card']['width']
+    return _absolute(profile.profile_image.name), None
+
+
+def _description(profile):
+    description = ' - '.join(part for part in (profile.designation, profile.about) if part)
+    description = ' '.join(description.split())
+    if len(description) > DESCRIPTION_LENGTH:
+        description = description[:DESCRIPTION_LENGTH - 1].rstrip() + '…'
+    return description or f"{profile.name or profile.user.username}'s digital business card"
+
+
+def build_preview_html(profile):
+    """Render the preview page for a profile loaded with its user."""
+    image_url, image_width = _image(profile)
+    return render_to_string('profiles/card_preview.html', {
+        'title': f'{profile.name or profile.user.username} - LSofito Card',
+        'description': _description(profile),
+        'image_url': image_url,
+        'image_width': image_width,
+        'url': card_url(profile.user.username),
+        'username': profile.user.username,
+    })
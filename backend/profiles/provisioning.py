@@ -0,0 +1,287 @@
+"""
+Bulk card provisioning from a CSV of employees (corporate orders).
+
+``import_cards`` validates every row first, hashes the passwords across a
+pool, then inserts users and their profiles with bulk_create in one
+transaction per chunk. The post_save receivers in profiles/signals.py don't
+run: the profile is created here instead of by ``create_user_profile``, a
+new user has no cached version or auth entry to invalidate, and the public
+snapshot is built on the first read (or by ``manage.py rebuild_snapshots``).
+The short code index picks the new profiles up through ``updated_at``.
+
+Columns: ``username`` and ``email`` are required; ``password``,
+``first_name``, ``last_name``, ``status`` and the profile fields in
+PROFILE_COLUMNS are optional. Rows without a password get an unusable one.
+A row that fails validation or insertion is reported with its line number
+and doesn't stop the others.
+
+Files uploaded in the admin (CardImport) are kept under CARD_IMPORT_DIR, out
+of MEDIA_ROOT since they hold passwords, until the ``profiles.import_cards``
+job has imported them.
+"""
+import csv
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from users.validators import validate_username_not_reserved
+from .models import CardImport, Profile
+from .serializers import ProfileUpdateSerializer
+
+User = get_user_model()
+
+USER_COLUMNS = ('username', 'email', 'password', 'first_name', 'last_name')
+PROFILE_COLUMNS = (
+    'name', 'designation', 'phone', 'whatsapp', 'instagram', 'linkedin', 'youtube',
+    'website', 'twitter', 'figma', 'about', 'template',
+)
+REQUIRED_COLUMNS = ('username', 'email')
+COLUMNS = (*USER_COLUMNS, 'status', *PROFILE_COLUMNS)
+MIN_PASSWORD_LENGTH = 8  # same as registration (users/serializers.py)
+HASH_BATCH_SIZE = 20  # passwords per pool task
+
+
+def _column(header):
+    return (header or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def _messages(error):
+    if isinstance(error, ValidationError):
+        return '; '.join(error.messages)
+    # DRF serializer errors: {field: [messages]}
+    return '; '.join(f"{field}: {' '.join(map(str, messages))}" for field, messages in error.items())
+
+
+def read_rows(file):
+    """(line, row) pairs of a CSV file opened in binary mode, keyed by normalized column names."""
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    columns = [_column(header) for header in reader.fieldnames or []]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValidationError(f"Missing column(s): {', '.join(missing)}")
+    unknown = [column for column in columns if column and column not in COLUMNS]
+    if unknown:
+        raise ValidationError(f"Unknown column(s): {', '.join(unknown)}")
+    reader.fieldnames = columns
+    for row in reader:
+        values = {column: (value or '').strip() for column, value in row.items() if column in COLUMNS}
+        if any(values.values()):
+            yield reader.line_num, values
+
+
+def validate_row(row, default_status):
+    """The user and profile fields of a row; raises ValidationError."""
+    username, email, password = row['username'], row['email'], row.get('password', '')
+    User._meta.get_field('username').clean(username, None)
+    validate_username_not_reserved(username)
+    if not email:
+        raise ValidationError('email is required')
+    validate_email(email)
+    if password and len(password) < MIN_PASSWORD_LENGTH:
+        raise ValidationError(f'password must be at least {MIN_PASSWORD_LENGTH} characters')
+
+    status = row.get('status') or default_status
+    if status not in dict(Profile.STATUS_CHOICES):
+        raise ValidationError(f'unknown status {status!r}')
+
+    user_fields = {
+        'username': username,
+        'email': email,
+        'first_name': row.get('first_name', ''),
+        'last_name': row.get('last_name', ''),
+    }
+    full_name = f"{user_fields['first_name']} {user_fields['last_name']}".strip()
+    # Same defaults as a profile created at registration (Profile.objects.ensure_for_user)
+    data = {'name': full_name or email or username, 'email': email}
+    data.update((column, row[column]) for column in PROFILE_COLUMNS if row.get(column))
+    serializer = ProfileUpdateSerializer(data=data, partial=True)
+    if not serializer.is_valid():
+        raise ValidationError(_messages(serializer.errors))
+    return user_fields, {**serializer.validated_data, 'status': status}, password
+
+
+def validate_rows(rows, default_status):
+    """Split rows into (valid, errors); valid rows are (line, user fields, profile fields, password)."""
+    valid, errors, seen = [], [], {}
+    for line, row in rows:
+        username = row['username']
+        try:
+            if username in seen:
+                raise ValidationError(f'duplicate of line {seen[username]}')
+            user_fields, profile_fields, password = validate_row(row, default_status)
+        except ValidationError as error:
+            errors.append({'line': line, 'username': username, 'error': _messages(error)})
+            continue
+        seen[username] = line
+        valid.append((line, user_fields, profile_fields, password))
+
+    existing = set()
+    usernames = list(seen)
+    for i in range(0, len(usernames), 500):
+        existing.update(User.objects.filter(username__in=usernames[i:i + 500]).values_list('username', flat=True))
+    if existing:
+        errors.extend(
+            {'line': line, 'username': user_fields['username'], 'error': 'username already exists'}
+            for line, user_fields, profile_fields, password in valid if user_fields['username'] in existing
+        )
+        valid = [row for row in valid if row[1]['username'] not in existing]
+    return valid, errors
+
+
+def _hash_batch(passwords):
+    return [make_password(password or None) for password in passwords]
+
+
+def hash_passwords(passwords, workers, pool='process'):
+    """make_password() of each password (unusable for blanks), in order, across a pool."""
+    batches = [passwords[i:i + HASH_BATCH_SIZE] for i in range(0, len(passwords), HASH_BATCH_SIZE)]
+    workers = max(1, min(workers, len(batches)))
+    if workers == 1:
+        return [hashed for batch in batches for hashed in _hash_batch(batch)]
+
+    if pool == 'process':
+        # Forked children must not share the parent's DB connections
+        connections.close_all()
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+    else:
+        # PBKDF2 runs in OpenSSL without the GIL, so threads scale too
+        executor = ThreadPoolExecutor(workers)
+    hashed = [None] * len(batches)
+    with executor:
+        futures = {executor.submit(_hash_batch, batch): position for position, batch in enumerate(batches)}
+        for future in as_completed(futures):
+            hashed[futures[future]] = future.result()
+    return [password for batch in hashed for password in batch]
+
+
+def _insert(rows):
+    users = User.objects.bulk_create([
+        User(password=password, **user_fields) for line, user_fields, profile_fields, password in rows
+    ])
+    Profile.objects.bulk_create([
+        Profile(user=user, **profile_fields) for user, (line, user_fields, profile_fields, password) in zip(users, rows)
+    ])
+
+
+def insert_rows(rows, chunk_size):
+    """Insert (line, user fields, profile fields, password hash) rows; returns (created, errors)."""
+    created, errors = 0, []
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        try:
+            with transaction.atomic():
+                _insert(chunk)
+            created += len(chunk)
+            continue
+        except IntegrityError:
+            pass
+        # A username taken meanwhile: insert one at a time to find the rows at fault
+        for row in chunk:
+            try:
+                with transaction.atomic():
+                    _insert([row])
+                created += 1
+            except IntegrityError as error:
+                errors.append({'line': row[0], 'username': row[1]['username'], 'error': str(error)})
+    return created, errors
+
+
+def import_cards(file, workers=None, pool='process', chunk_size=500, default_status='payment_received', dry_run=False):
+    """
+    Create a user and profile per CSV row. Returns a report: row count,
+    created count, per-row errors sorted by line, and timings.
+    """
+    started = time.monotonic()
+    valid, errors = validate_rows(read_rows(file), default_status)
+    validated = time.monotonic()
+    row_count = len(valid) + len(errors)
+
+    created = 0
+    if valid and not dry_run:
+        hashes = hash_passwords([row[3] for row in valid], workers or os.cpu_count() or 1, pool)
+        hashed = time.monotonic()
+        created, insert_errors = insert_rows(
+            [(line, user_fields, profile_fields, password)
+             for (line, user_fields, profile_fields, _), password in zip(valid, hashes)],
+            max(1, chunk_size),
+        )
+        errors.extend(insert_errors)
+    else:
+        hashed = validated
+    finished = time.monotonic()
+
+    seconds = finished - started
+    return {
+        'rows': row_count,
+        'valid': len(valid),
+        'created': created,
+        'errors': sorted(errors, key=lambda error: error['line']),
+        'dry_run': dry_run,
+        'seconds': round(seconds, 3),
+        'validate_seconds': round(validated - started, 3),
+        'hash_seconds': round(hashed - validated, 3),
+        'insert_seconds': round(finished - hashed, 3),
+        'rows_per_second': round(created / seconds, 1) if seconds and created else 0.0,
+    }
+
+
+def import_path(card_import):
+    return os.path.join(settings.CARD_IMPORT_DIR, f'{card_import.pk}.csv')
+
+
+def queue_import(card_import, uploaded_file):
+    """Save a new CardImport with its uploaded CSV and queue the import once the transaction commits."""
+    card_import.filename = uploaded_file.name[-255:]
+    card_import.save()
+    os.makedirs(settings.CARD_IMPORT_DIR, exist_ok=True)
+    with open(import_path(card_import), 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+    # A single attempt: a retry would report every created row as a duplicate
+    transaction.on_commit(lambda: enqueue('profiles.import_cards', max_attempts=1, card_import_id=card_import.pk))
+    return card_import
+
+
+def run_import(card_import_id):
+    """Import a queued CardImport, store its report and delete the file."""
+    # Claim it, so a job re-run after an expired lease doesn't import twice
+    if not CardImport.objects.filter(pk=card_import_id, status='queued').update(status='running'):
+        return
+    card_import = CardImport.objects.get(pk=card_import_id)
+    path = import_path(card_import)
+    try:
+        with open(path, 'rb') as file:
+            # Threads: forking a job worker would copy its claimed job and connections
+            report = import_cards(
+                file, workers=settings.CARD_IMPORT_WORKERS, pool='thread',
+                default_status=card_import.default_status,
+            )
+    except (ValidationError, UnicodeDecodeError, csv.Error, OSError) as error:
+        message = _messages(error) if isinstance(error, ValidationError) else str(error)
+        card_import.status, card_import.report = 'failed', {'error': message}
+    except Exception as error:
+        # Unexpected (a database error, a bug): never leave the import 'running';
+        # the job keeps the traceback
+        CardImport.objects.filter(pk=card_import_id).update(
+            status='failed', report={'error': f'{type(error).__name__}: {error}'}, finished_at=timezone.now(),
+        )
+        raise
+    else:
+        card_import.status, card_import.report = 'done', report
+        card_import.created_count, card_import.error_count = report['created'], len(report['errors'])
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    card_import.finished_at = timezone.now()
+    card_import.save()
@@ -1,17 +1,48 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from config.metrics import TimedSerializerMixin
 from .models import Profile, GalleryImage
+from .images import VARIANT_FORMATS, VARIANT_WIDTHS, variants_are_current
 
 User = get_user_model()
 
 
+def variant_urls(serializer, variants):
+    """
+    Turn a stored variant map into absolute URLs plus srcset strings, e.g.
+    ``{'card': {'width': 480, 'webp': url, 'jpeg': url}, 'srcset': {'webp': 'url 160w, ...'}}``.
+    Returns None until variants have been generated.
+    """
+    request = serializer.context.get('request')
+    result = {}
+    srcset = {key: [] for key in VARIANT_FORMATS}
+    for name in VARIANT_WIDTHS:
+        entry = variants.get(name)
+        if not entry:
+            continue
+        urls = {'width': entry['width']}
+        for key in VARIANT_FORMATS:
+            url = default_storage.url(entry[key])
+            if request:
+                url = request.build_absolute_uri(url)
+            urls[key] = url
+            srcset[key].append(f"{url} {entry['width']}w")
+        result[name] = urls
+    if not result:
+        return None
+    result['srcset'] = {key: ', '.join(parts) for key, parts in srcset.items()}
+    return result
+
+
 class GalleryImageSerializer(serializers.ModelSerializer):
     """Serializer for gallery images."""
     image_url = serializers.SerializerMethodField()
+    variants = serializers.SerializerMethodField()
     
     class Meta:
         model = GalleryImage
-        fields = ('id', 'image', 'image_url', 'created_at')
+        fields = ('id', 'image', 'image_url', 'variants', 'created_at')
         read_only_fields = ('id', 'created_at')
     
     def get_image_url(self, obj):
@@ -22,19 +53,28 @@ class GalleryImageSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    def get_variants(self, obj):
+        if variants_are_current(obj.variants, obj.image):
+            return variant_urls(self, obj.variants)
+        return None
+
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     profile_image_url = serializers.SerializerMethodField()
+    profile_image_variants = serializers.SerializerMethodField()
     gallery_urls = serializers.SerializerMethodField()
+    gallery_ids = serializers.SerializerMethodField()
+    gallery_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
         fields = (
-            'username', 'profile_image', 'profile_image_url', 'name',
+            'username', 'profile_image', 'profile_image_url', 'profile_image_variants', 'name',
             'designation', 'email', 'phone', 'whatsapp', 'instagram',
             'linkedin', 'youtube', 'website', 'twitter', 'figma', 'others', 'about',
-            'status', 'template', 'gallery_urls', 'background_color', 'card_color', 'button_color'
+            'status', 'template', 'gallery_urls', 'gallery_ids', 'gallery_variants',
+            'background_color', 'card_color', 'button_color', 'short_code', 'short_url'
         )
         read_only_fields = ('username', 'status')  # Status is admin-only
 
@@ -59,6 +99,28 @@ class ProfileSerializer(serializers.ModelSerializer):
                     urls.append(gallery_image.image.url)
         return urls
 
+    def get_gallery_ids(self, obj):
+        """IDs for each entry of gallery_urls, used to keep or reorder slots on update."""
+        return [
+            gallery_image.id
+            for gallery_image in obj.gallery_images.all()[:3]
+            if gallery_image.image
+        ]
+
+    def get_profile_image_variants(self, obj):
+        if obj.profile_image and variants_are_current(obj.profile_image_variants, obj.profile_image):
+            return variant_urls(self, obj.profile_image_variants)
+        return None
+
+    def get_gallery_variants(self, obj):
+        """Variant URLs for each entry of gallery_urls, in the same order."""
+        return [
+            variant_urls(self, gallery_image.variants)
+            if variants_are_current(gallery_image.variants, gallery_image.image) else None
+            for gallery_image in obj.gallery_images.all()[:3]
+            if gallery_image.image
+        ]
+
 
 class ProfileUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -94,15 +156,16 @@ class ProfileUpdateSerializer(serializers.ModelSerializer):
         return cleaned_value
 
 
-class UserListSerializer(serializers.ModelSerializer):
+class UserListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for admin user list with profile status."""
     status = serializers.SerializerMethodField()
     status_value = serializers.SerializerMethodField()
     profile_id = serializers.SerializerMethodField()
+    short_url = serializers.SerializerMethodField()
     
     class Meta:
         model = User
-        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'is_staff', 'status', 'status_value', 'profile_id')
+        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'is_staff', 'status', 'status_value', 'profile_id', 'short_url')
     
     def get_status(self, obj):
         if hasattr(obj, 'profile'):
@@ -118,3 +181,8 @@ class UserListSerializer(serializers.ModelSerializer):
         if hasattr(obj, 'profile'):
             return obj.profile.id
         return None
+
+    def get_short_url(self, obj):
+        if hasattr(obj, 'profile'):
+            return obj.profile.short_url
+        return None
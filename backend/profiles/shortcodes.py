@@ -0,0 +1,190 @@
+"""
+Short card codes for NFC tag URLs (/c/<code>).
+
+Every profile gets an immutable 8-character base62 code at creation, so a
+tag stays valid when its owner changes username. Resolving a code doesn't
+touch the database: each worker keeps code -> username for all profiles in
+``index``, a sorted array of code numbers plus one bytes blob of usernames
+(about 20 bytes per profile instead of ~200 for a dict of strings).
+
+A background thread per worker loads the index at startup, then every
+SHORT_CODE_REFRESH_INTERVAL seconds reads the profiles updated since its
+last read (new profiles and renames both bump ``updated_at``) into a small
+overlay, and reloads everything every SHORT_CODE_RELOAD_INTERVAL seconds,
+which also drops deleted profiles.
+
+Until the first load has succeeded, codes are looked up in the database
+(by the unique short_code index). Requests wait for that load at most
+once, for up to SHORT_CODE_LOAD_TIMEOUT seconds, and not at all once it
+has failed.
+"""
+import logging
+import os
+import secrets
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from config.routers import replica_reads
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+SHORT_CODE_LENGTH = 8  # 62**8 codes: collisions stay unlikely at millions of cards
+
+_DIGITS = {char: value for value, char in enumerate(ALPHABET)}
+# Rows committed out of updated_at order (or late on a replica) are re-read
+REFRESH_OVERLAP = timedelta(seconds=60)
+# Changes kept in the overlay before they are merged into the arrays
+MAX_OVERLAY = 10000
+
+
+def new_short_code():
+    return ''.join(secrets.choice(ALPHABET) for _ in range(SHORT_CODE_LENGTH))
+
+
+def code_number(code):
+    """'0000000A' -> 10; None if ``code`` isn't a short code."""
+    if len(code) != SHORT_CODE_LENGTH:
+        return None
+    number = 0
+    for char in code:
+        digit = _DIGITS.get(char)
+        if digit is None:
+            return None
+        number = number * 62 + digit
+    return number
+
+
+def short_url(code):
+    return f"{settings.PUBLIC_BASE_URL.rstrip('/')}/c/{code}"
+
+
+class ShortCodeIndex:
+    """code -> username of every profile, kept current by a background thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        # Set once the first load succeeded, failed or was waited for long enough
+        self._settled = threading.Event()
+        # (sorted code numbers, username offsets, usernames blob, overlay);
+        # replaced as a whole so readers never see half an update
+        self._table = (array('q'), array('I', [0]), b'', {})
+        self._watermark = None
+        self._reloaded_at = None
+        self._pid = None
+        self._thread = None
+
+    def start(self):
+        """Start loading in the background (again after a fork)."""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='short-code-index', daemon=True)
+            self._thread.start()
+
+    def resolve(self, code):
+        """Username of the profile with this short code, or None."""
+        number = code_number(code)
+        if number is None:
+            return None
+        if self._pid != os.getpid():
+            self.start()
+        if not self._loaded.is_set():
+            self._settled.wait(timeout=settings.SHORT_CODE_LOAD_TIMEOUT)
+            self._settled.set()
+            if not self._loaded.is_set():
+                return self._lookup(code)
+        codes, offsets, names, overlay = self._table
+        if number in overlay:
+            return overlay[number]
+        position = bisect_left(codes, number)
+        if position < len(codes) and codes[position] == number:
+            return names[offsets[position]:offsets[position + 1]].decode()
+        return None
+
+    @staticmethod
+    def _lookup(code):
+        """Username for a code from the database, while the index isn't loaded."""
+        from .models import Profile
+
+        with replica_reads():
+            return Profile.objects.filter(short_code=code).values_list('user__username', flat=True).first()
+
+    def _run(self):
+        while True:
+            try:
+                due = self._reloaded_at is None or (
+                    time.monotonic() - self._reloaded_at >= settings.SHORT_CODE_RELOAD_INTERVAL
+                )
+                if due:
+                    self.reload()
+                else:
+                    self.refresh()
+            except Exception:
+                logger.exception('Could not update the short code index')
+                self._settled.set()  # serve from the database until a load succeeds
+            finally:
+                close_old_connections()
+            time.sleep(settings.SHORT_CODE_REFRESH_INTERVAL)
+
+    def reload(self):
+        """Load every profile's code."""
+        from .models import Profile
+
+        started = time.monotonic()
+        with replica_reads():
+            rows = Profile.objects.order_by().values_list('short_code', 'user__username', 'updated_at')
+            entries, watermark = [], None
+            for code, username, updated_at in rows.iterator(chunk_size=10000):
+                entries.append((code_number(code), username.encode()))
+                watermark = updated_at if watermark is None else max(watermark, updated_at)
+        self._table = self._build(entries, {})
+        self._watermark = watermark
+        self._reloaded_at = time.monotonic()
+        self._loaded.set()
+        self._settled.set()
+        logger.info('Loaded %d short codes in %.1f s', len(entries), time.monotonic() - started)
+
+    def refresh(self):
+        """Apply the profiles updated since the last read (new ones and renames)."""
+        from .models import Profile
+
+        rows = Profile.objects.order_by().values_list('short_code', 'user__username', 'updated_at')
+        if self._watermark is not None:
+            rows = rows.filter(updated_at__gte=self._watermark - REFRESH_OVERLAP)
+        codes, offsets, names, overlay = self._table
+        for code, username, updated_at in rows:
+            overlay[code_number(code)] = username
+            self._watermark = updated_at if self._watermark is None else max(self._watermark, updated_at)
+        if len(overlay) > MAX_OVERLAY:
+            self._table = self._build(self._entries(), {})
+
+    def _entries(self):
+        codes, offsets, names, overlay = self._table
+        merged = {
+            number: names[offsets[position]:offsets[position + 1]]
+            for position, number in enumerate(codes)
+        }
+        for number, username in overlay.items():
+            merged[number] = username.encode()
+        return merged.items()
+
+    @staticmethod
+    def _build(entries, overlay):
+        codes, offsets, names = array('q'), array('I', [0]), bytearray()
+        for number, username in sorted(entries):
+            codes.append(number)
+            names += username
+            offsets.append(len(names))
+        return codes, offsets, bytes(names), overlay
+
+
+index = ShortCodeIndex()
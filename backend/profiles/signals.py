@@ -1,7 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Profile
+from .models import Profile, GalleryImage
+from .cache import invalidate_profile, forget_profile
+from .snapshots import touch_profile
+from .images import variants_are_current, variant_files
+from jobs.queue import enqueue
+from users.authentication import forget_user
 
 User = get_user_model()
 
@@ -10,16 +15,85 @@ User = get_user_model()
 def create_user_profile(sender, instance, created, **kwargs):
     """Create a profile when a new user is created."""
     if created:
-        name = instance.get_full_name() or instance.email or instance.username
-        Profile.objects.get_or_create(
-            user=instance,
-            defaults={'name': name, 'email': instance.email}
-        )
+        Profile.objects.ensure_for_user(instance)
 
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    """Save profile when user is saved."""
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
+    """Save the profile loaded through this user, if it has unsaved changes."""
+    related = User.profile.related
+    # A profile that was never loaded here can't have changes; don't fetch it
+    profile = related.get_cached_value(instance) if related.is_cached(instance) else None
+    if profile is not None:
+        profile.save()
 
+
+@receiver(post_save, sender=User)
+def forget_renamed_username(sender, instance, **kwargs):
+    """
+    Stop serving cached profiles under a username that was changed, and bump
+    the profile so its snapshot and the short code index pick up the new name.
+    """
+    old_username = getattr(instance, '_loaded_username', None)
+    if old_username and old_username != instance.username:
+        forget_profile(old_username)
+        profile_id = Profile.objects.filter(user=instance).values_list('pk', flat=True).first()
+        if profile_id is not None and touch_profile(profile_id):
+            enqueue('profiles.rebuild_snapshot', unique=True, profile_id=profile_id)
+    instance._loaded_username = instance.username
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    forget_profile(instance.username)
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_saved_profile(sender, instance, created, **kwargs):
+    """
+    Publish a new cache version on every save and queue the snapshot
+    rebuild, plus variant generation if the photo changed.
+    """
+    invalidate_profile(instance.user.username, instance.updated_at)
+    if created:
+        # The cached authentication entry holds the profile ID
+        forget_user(instance.user_id, instance.user.password)
+    if not variants_are_current(instance.profile_image_variants, instance.profile_image):
+        enqueue('profiles.process_profile_image', unique=True, profile_id=instance.pk)
+    enqueue('profiles.rebuild_snapshot', unique=True, profile_id=instance.pk)
+
+
+@receiver(post_delete, sender=Profile)
+def invalidate_deleted_profile(sender, instance, **kwargs):
+    """Forget the cached version and queue removal of the photo and card files."""
+    if instance.profile_image:
+        paths = {instance.profile_image.name, *variant_files(instance.profile_image_variants)}
+        enqueue('profiles.delete_media', paths=sorted(paths))
+    enqueue('profiles.delete_cards', profile_id=instance.pk)
+    try:
+        forget_profile(instance.user.username)
+        forget_user(instance.user_id, instance.user.password)
+    except User.DoesNotExist:
+        pass
+
+
+@receiver(post_save, sender=GalleryImage)
+def touch_saved_gallery_image(sender, instance, **kwargs):
+    """
+    Bump the owning profile's updated_at so gallery changes produce a new
+    profile version, and queue variant generation and the snapshot rebuild.
+    """
+    if not touch_profile(instance.profile_id):
+        return
+    if not variants_are_current(instance.variants, instance.image):
+        enqueue('profiles.process_gallery_image', unique=True, gallery_image_id=instance.pk)
+    enqueue('profiles.rebuild_snapshot', unique=True, profile_id=instance.profile_id)
+
+
+@receiver(post_delete, sender=GalleryImage)
+def touch_deleted_gallery_image(sender, instance, **kwargs):
+    """Bump the owning profile's version and queue removal of the image files."""
+    paths = {instance.image.name, *variant_files(instance.variants)}
+    enqueue('profiles.delete_media', paths=sorted(paths))
+    if touch_profile(instance.profile_id):
+        enqueue('profiles.rebuild_snapshot', unique=True, profile_id=instance.profile_id)
@@ -0,0 +1,101 @@
+"""
+Precomputed public profile snapshots.
+
+A snapshot is the exact JSON body served by the public profile endpoint,
+rendered once after each write and stored on ``Profile.public_snapshot``.
+Media URLs are made absolute against ``settings.PUBLIC_BASE_URL`` instead of
+the incoming request, so the stored bytes can be sent as-is to every visitor.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import Profile
+from .serializers import ProfileSerializer
+from .cache import invalidate_profile
+
+
+class SnapshotRequest:
+    """Stand-in request that resolves URLs against PUBLIC_BASE_URL."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def build_absolute_uri(self, location):
+        if '://' in location:
+            return location
+        return f'{self.base_url}{location}'
+
+
+def build_snapshot(profile):
+    """Render the public JSON for a profile loaded with ``for_public()``."""
+    request = SnapshotRequest(settings.PUBLIC_BASE_URL)
+    data = ProfileSerializer(profile, context={'request': request}).data
+    return JSONRenderer().render(data).decode('utf-8')
+
+
+def refresh_snapshot(profile_id):
+    """
+    Rebuild and store the snapshot of one profile. The write is skipped if
+    the profile changed again meanwhile; that later write rebuilds its own.
+    """
+    profile = Profile.objects.for_public().filter(pk=profile_id).first()
+    if profile is None:
+        return None
+    snapshot = build_snapshot(profile)
+    Profile.objects.filter(pk=profile.pk, updated_at=profile.updated_at).update(
+        public_snapshot=snapshot
+    )
+    return snapshot
+
+
+def touch_profile(profile_id, **changes):
+    """
+    Write ``changes`` with a new updated_at and an empty snapshot, then
+    publish the new cache version. Used for writes that bypass Profile.save().
+    Returns False if the profile doesn't exist.
+    """
+    now = timezone.now()
+    if not Profile.objects.filter(pk=profile_id).update(
+        updated_at=now, public_snapshot='', **changes
+    ):
+        return False
+    username = (
+        Profile.objects.filter(pk=profile_id)
+        .values_list('user__username', flat=True)
+        .first()
+    )
+    if username:
+        invalidate_profile(username, now)
+    return True
+
+
+def rebuild_snapshots(queryset=None, batch_size=500):
+    """
+    Rebuild the snapshots of many profiles with batched UPDATEs and publish a
+    new version for each, so cached responses built from older snapshots are
+    dropped. Returns the number of profiles rebuilt.
+    """
+    if queryset is None:
+        queryset = Profile.objects.all()
+    queryset = queryset.for_public().order_by('pk')
+
+    count = 0
+    batch = []
+    for profile in queryset.iterator(chunk_size=batch_size):
+        profile.public_snapshot = build_snapshot(profile)
+        profile.updated_at = timezone.now()
+        batch.append(profile)
+        if len(batch) >= batch_size:
+            count += _write_batch(batch, batch_size)
+            batch = []
+    if batch:
+        count += _write_batch(batch, batch_size)
+    return count
+
+
+def _write_batch(profiles, batch_size):
+    Profile.objects.bulk_update(profiles, ['public_snapshot', 'updated_at'], batch_size=batch_size)
+    for profile in profiles:
+        invalidate_profile(profile.user.username, profile.updated_at)
+    return len(profiles)
@@ -0,0 +1,127 @@
+"""
+Content-addressed media storage.
+
+Files are named after the SHA-256 of their bytes, so uploading an image that
+is already stored resolves to the existing file instead of writing a copy.
+Names are sharded into nested hash-prefix directories; files stored under
+the older flat layout are moved with ``manage.py migrate_media_layout``.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_ADDRESSED_PATTERN = re.compile(
+    r'^[\w-]+/(?P<a>[0-9a-f]{2})/(?P<b>[0-9a-f]{2})/(?P=a)(?P=b)[0-9a-f]{60}(\.\w+)?$'
+)
+
+
+def file_sha256(file_obj):
+    """Hash an uploaded or stored file in chunks and rewind it."""
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def content_addressed_name(prefix, digest, filename):
+    """
+    'gallery', 'ab12cd...', 'IMG_1.JPG' -> 'gallery/ab/12/ab12cd....jpg'
+
+    Two levels of hash-prefix directories keep every directory small (65536
+    leaves, so a few hundred files each at ten million images).
+    """
+    extension = posixpath.splitext(filename)[1].lower() or '.bin'
+    return f'{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def is_content_addressed(name, prefix):
+    """Whether a stored name already follows content_addressed_name()."""
+    return CONTENT_ADDRESSED_PATTERN.match(name or '') is not None and name.startswith(f'{prefix}/')
+
+
+def relocate_file(storage, name, prefix, digest=None):
+    """
+    Make the stored file ``name`` also available under its content-addressed
+    name; returns (new name, digest). The original is left in place, since
+    other rows may still point to it. Raises FileNotFoundError if missing.
+    """
+    if digest is None:
+        with storage.open(name, 'rb') as f:
+            digest = file_sha256(f)
+    new_name = content_addressed_name(prefix, digest, name)
+    target = storage.path(new_name)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f'{target}.{uuid.uuid4().hex}.tmp'
+        try:
+            os.link(storage.path(name), temp_path)  # no copy on the same filesystem
+        except OSError:
+            if not os.path.exists(storage.path(name)):
+                raise FileNotFoundError(name)
+            shutil.copyfile(storage.path(name), temp_path)
+        os.replace(temp_path, target)
+    return new_name, digest
+
+
+def gallery_upload_to(instance, filename):
+    """
+    ``upload_to`` for GalleryImage.image. The hash is kept on the instance's
+    ``content_hash`` field (computed here if the caller hasn't set it).
+    """
+    if not instance.content_hash:
+        instance.content_hash = file_sha256(instance.image.file)
+    return content_addressed_name('gallery', instance.content_hash, filename)
+
+
+def profile_image_upload_to(instance, filename):
+    """``upload_to`` for Profile.profile_image."""
+    return content_addressed_name('profiles', file_sha256(instance.profile_image.file), filename)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that never renames: an existing file with the same
+    name already holds the same bytes, so it is reused as-is.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            # Refresh the mtime so `gc_media` treats the reused file as new
+            os.utime(full_path)
+            return name
+
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write to a private temp file and rename: concurrent uploads of the
+        # same bytes race harmlessly since both renames install identical content
+        temp_path = f'{full_path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'wb') as f:
+            for chunk in content.chunks():
+                f.write(chunk)
+        if self.file_permissions_mode is not None:
+            os.chmod(temp_path, self.file_permissions_mode)
+        os.replace(temp_path, full_path)
+        return name
+
+
+def content_addressed_storage():
+    return ContentAddressedStorage()
@@ -0,0 +1,114 @@
+"""
+Background tasks for profiles (run by `manage.py run_workers`, see jobs/queue.py).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+
+from jobs.queue import task, enqueue
+from .models import Profile, GalleryImage
+from .images import (
+    generate_variants, variants_are_current, variant_files, variant_source_stem, derived_variant_files,
+)
+from .snapshots import refresh_snapshot, touch_profile
+from .cards import card_files, card_storage
+from . import uploads, provisioning
+
+
+@task('profiles.rebuild_snapshot')
+def rebuild_snapshot(profile_id):
+    refresh_snapshot(profile_id)
+
+
+@task('profiles.process_profile_image')
+def process_profile_image(profile_id):
+    """Generate variants for a new profile photo and clean up the previous ones."""
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None or variants_are_current(profile.profile_image_variants, profile.profile_image):
+        return
+    previous = profile.profile_image_variants
+    variants = generate_variants(profile.profile_image)
+    if touch_profile(profile_id, profile_image_variants=variants):
+        refresh_snapshot(profile_id)
+    if previous:
+        enqueue('profiles.delete_media', paths=variant_files(previous))
+
+
+@task('profiles.process_gallery_image')
+def process_gallery_image(gallery_image_id):
+    gallery_image = GalleryImage.objects.filter(pk=gallery_image_id).first()
+    if gallery_image is None or variants_are_current(gallery_image.variants, gallery_image.image):
+        return
+    # Content-addressed images share a file; reuse the variants of any row
+    # that already processed the same bytes
+    variants = next(
+        (
+            other.variants
+            for other in GalleryImage.objects.filter(image=gallery_image.image.name)
+            .exclude(pk=gallery_image_id)
+            .only('image', 'variants')
+            if variants_are_current(other.variants, other.image)
+        ),
+        None,
+    )
+    if variants is None:
+        variants = generate_variants(gallery_image.image)
+    GalleryImage.objects.filter(pk=gallery_image_id).update(variants=variants)
+    if touch_profile(gallery_image.profile_id):
+        refresh_snapshot(gallery_image.profile_id)
+
+
+@task('profiles.delete_media')
+def delete_media(paths):
+    """Delete media files that no profile or gallery image points to and no upload just reused."""
+    # Identical uploads share one content-addressed file, and so its variants
+    # (named after the source): keep a variant while any row still uses its
+    # source or records it in a variant map
+    stems = {stem for stem in map(variant_source_stem, paths) if stem}
+    profile_filter, gallery_filter = Q(profile_image__in=paths), Q(image__in=paths)
+    for stem in stems:
+        profile_filter |= Q(profile_image__startswith=f'{stem}.')
+        gallery_filter |= Q(image__startswith=f'{stem}.')
+    rows = [
+        *Profile.objects.filter(profile_filter).values_list('profile_image', 'profile_image_variants'),
+        *GalleryImage.objects.filter(gallery_filter).values_list('image', 'variants'),
+    ]
+    referenced = set()
+    for name, variants in rows:
+        referenced.add(name)
+        referenced.update(derived_variant_files(name))
+        referenced.update(variant_files(variants or {}))
+    # An upload of the same bytes reuses the file and refreshes its mtime
+    # before its row is committed: leave recent files for gc_media
+    cutoff = timezone.now() - timedelta(seconds=settings.MEDIA_DELETE_GRACE_SECONDS)
+    for path in paths:
+        if path in referenced:
+            continue
+        try:
+            if default_storage.get_modified_time(path) >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        default_storage.delete(path)
+
+
+@task('profiles.delete_cards')
+def delete_cards(profile_id):
+    """Delete the rendered printable cards of a deleted profile."""
+    for path in card_files(profile_id):
+        card_storage.delete(path)
+
+
+@task('profiles.expire_uploads')
+def expire_uploads():
+    """Remove chunked uploads that were abandoned (see profiles/uploads.py)."""
+    uploads.expire_uploads()
+
+
+@task('profiles.import_cards')
+def import_cards(card_import_id):
+    """Create the cards of a CSV uploaded in the admin (see profiles/provisioning.py)."""
+    provisioning.run_import(card_import_id)
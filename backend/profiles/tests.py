@@ -0,0 +1,663 @@
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import async_views, media_gc
+from .cards import CARD_SIZE, card_storage, get_card, render_card_image
+from .images import derived_variant_files, generate_variants, variant_files, variant_storage
+from .models import CardImport, ChunkedUpload, GalleryImage, Profile, ProfileStatusChange
+from .provisioning import import_path, queue_import, run_import
+from .serializers import ProfileSerializer
+from .shortcodes import ShortCodeIndex
+from .snapshots import refresh_snapshot
+from .storage import content_addressed_storage, is_content_addressed
+from .tasks import delete_media
+from .uploads import MAX_ACTIVE_UPLOADS, expire_uploads, part_path
+from .vcard import VCARD_VERSIONS, build_vcard
+
+User = get_user_model()
+
+
+def png_bytes(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (600, 400), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(JOBS_RUN_INLINE=True)
+class MediaTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        cache.clear()
+
+    def create_profile(self, username):
+        user = User.objects.create_user(username, f'{username}@example.com', 'password123')
+        return Profile.objects.get(user=user)
+
+    def upload_photo(self, profile, content):
+        profile.profile_image = SimpleUploadedFile('photo.png', content, content_type='image/png')
+        profile.save()
+        profile.refresh_from_db()
+        return profile
+
+
+@override_settings(MEDIA_DELETE_GRACE_SECONDS=0)
+class SharedMediaTests(MediaTestCase):
+    def test_replacing_a_shared_photo_keeps_the_other_profiles_variants(self):
+        content = png_bytes()
+        first = self.upload_photo(self.create_profile('first'), content)
+        second = self.upload_photo(self.create_profile('second'), content)
+        self.assertEqual(first.profile_image.name, second.profile_image.name)
+        shared = variant_files(second.profile_image_variants)
+        self.assertGreater(len(shared), 1)
+
+        self.upload_photo(first, png_bytes('blue'))
+
+        for path in shared:
+            self.assertTrue(default_storage.exists(path), path)
+
+    def test_deleting_a_profile_keeps_shared_photo_and_variants(self):
+        content = png_bytes()
+        first = self.upload_photo(self.create_profile('first'), content)
+        second = self.upload_photo(self.create_profile('second'), content)
+
+        first.user.delete()
+
+        for path in variant_files(second.profile_image_variants):
+            self.assertTrue(default_storage.exists(path), path)
+
+    def test_unshared_variants_are_deleted(self):
+        profile = self.upload_photo(self.create_profile('only'), png_bytes())
+        previous = variant_files(profile.profile_image_variants)
+
+        self.upload_photo(profile, png_bytes('blue'))
+
+        for path in previous:
+            self.assertFalse(default_storage.exists(path), path)
+
+    def test_regenerating_variants_reuses_the_files_in_place(self):
+        profile = self.upload_photo(self.create_profile('only'), png_bytes())
+        paths = derived_variant_files(profile.profile_image.name)
+        two_hours_ago = time.time() - 7200
+        inodes = {}
+        for path in paths:
+            os.utime(default_storage.path(path), (two_hours_ago, two_hours_ago))
+            inodes[path] = os.stat(default_storage.path(path)).st_ino
+
+        with mock.patch.object(variant_storage, 'delete', side_effect=AssertionError('deleted')):
+            variants = generate_variants(profile.profile_image)
+
+        self.assertEqual(variants, profile.profile_image_variants)
+        for path in paths:
+            stat = os.stat(default_storage.path(path))
+            self.assertEqual(stat.st_ino, inodes[path], path)
+            self.assertGreater(stat.st_mtime, two_hours_ago, path)  # fresh for the delete grace period
+
+    @override_settings(MEDIA_DELETE_GRACE_SECONDS=3600)
+    def test_files_reused_within_the_grace_period_are_kept(self):
+        profile = self.upload_photo(self.create_profile('only'), png_bytes())
+        name = profile.profile_image.name
+        two_hours_ago = time.time() - 7200
+        os.utime(default_storage.path(name), (two_hours_ago, two_hours_ago))
+        Profile.objects.filter(pk=profile.pk).update(profile_image='')
+
+        # An upload of the same bytes reuses the file before its row is committed
+        content_addressed_storage().save(name, ContentFile(png_bytes()))
+        delete_media([name])
+        self.assertTrue(default_storage.exists(name))
+
+        os.utime(default_storage.path(name), (two_hours_ago, two_hours_ago))
+        delete_media([name])
+        self.assertFalse(default_storage.exists(name))
+
+
+class AsyncVCardTests(MediaTestCase):
+    def test_photo_is_encoded_off_the_event_loop(self):
+        self.upload_photo(self.create_profile('alice'), png_bytes())
+        loops = []
+
+        def build(profile, version):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return build_vcard(profile, version)
+
+        request = RequestFactory().get('/api/profile/alice/vcard/')
+        with mock.patch.object(async_views, 'build_vcard', build):
+            response = async_to_sync(async_views.get_profile_vcard)(request, 'alice')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'PHOTO', response.content)
+        self.assertEqual(loops, [None])
+
+
+class MediaGCTests(MediaTestCase):
+    def write(self, name, age=7200):
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'orphan')
+        self.backdate(name, age)
+        return name
+
+    def backdate(self, name, age=7200):
+        then = time.time() - age
+        os.utime(default_storage.path(name), (then, then))
+
+    def gc(self, *args):
+        call_command('gc_media', '--grace-hours', '1', *args, stdout=io.StringIO())
+
+    def test_only_old_unreferenced_files_are_removed(self):
+        profile = self.upload_photo(self.create_profile('alice'), png_bytes())
+        referenced = variant_files(profile.profile_image_variants)
+        self.assertGreater(len(referenced), 1)  # the photo and its variants
+        for name in referenced:
+            self.backdate(name)
+        orphans = [self.write(f'profiles/aa/bb/aabb{"0" * 60}.png'), self.write('variants/profiles/gone_card.webp')]
+        fresh = self.write(f'gallery/cc/dd/ccdd{"0" * 60}.png', age=60)
+
+        self.gc()
+
+        for name in [*referenced, fresh]:
+            self.assertTrue(default_storage.exists(name), name)
+        for name in orphans:
+            self.assertFalse(default_storage.exists(name), name)
+
+    def test_dry_run_and_quarantine(self):
+        orphan = self.write(f'profiles/aa/bb/aabb{"0" * 60}.png')
+        self.gc('--dry-run')
+        self.assertTrue(default_storage.exists(orphan))
+
+        quarantine = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, quarantine, ignore_errors=True)
+        self.gc('--quarantine', quarantine)
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(os.path.exists(os.path.join(quarantine, orphan)))
+
+    def test_rows_saved_during_the_sweep_keep_their_files(self):
+        orphan = self.write(f'profiles/aa/bb/aabb{"0" * 60}.png')
+        profile = self.create_profile('alice')
+        referenced_keys = media_gc.referenced_keys
+
+        def mark():
+            keys = referenced_keys()
+            # A row starts pointing to the file after the mark phase
+            Profile.objects.filter(pk=profile.pk).update(profile_image=orphan)
+            return keys
+
+        with mock.patch.object(media_gc, 'referenced_keys', mark):
+            self.gc()
+        self.assertTrue(default_storage.exists(orphan))
+
+
+class MediaLayoutMigrationTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = png_bytes()
+        self.profile = self.create_profile('alice')
+        self.flat = 'profiles/me.png'
+        path = default_storage.path(self.flat)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(self.content)
+        two_hours_ago = time.time() - 7200
+        os.utime(path, (two_hours_ago, two_hours_ago))
+        variants = {'source': self.flat, 'card': {
+            'width': 480, 'webp': 'variants/profiles/me_card.webp', 'jpeg': 'variants/profiles/me_card.jpg',
+        }}
+        Profile.objects.filter(pk=self.profile.pk).update(profile_image=self.flat, profile_image_variants=variants)
+
+    def migrate(self):
+        call_command('migrate_media_layout', '--workers', '1', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_rows_are_rewritten_before_the_flat_files_go(self):
+        deleted = []
+
+        def delete(paths):
+            # The rows must already point to the new files
+            self.assertFalse(Profile.objects.filter(profile_image__in=paths).exists())
+            deleted.extend(paths)
+            delete_media(paths)
+
+        with mock.patch('profiles.management.commands.migrate_media_layout.delete_media', delete):
+            self.migrate()
+
+        self.profile.refresh_from_db()
+        name = self.profile.profile_image.name
+        self.assertTrue(is_content_addressed(name, 'profiles'), name)
+        self.assertEqual(self.profile.profile_image_variants['source'], name)
+        with default_storage.open(name, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(deleted, [self.flat])
+        self.assertFalse(default_storage.exists(self.flat))
+
+        self.migrate()  # nothing left to move
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.profile_image.name, name)
+
+    def test_failed_update_keeps_the_flat_file(self):
+        with mock.patch.object(Profile.objects, 'bulk_update', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                self.migrate()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.profile_image.name, self.flat)
+        self.assertTrue(default_storage.exists(self.flat))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ChunkedUploadTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        uploads_dir = override_settings(CHUNKED_UPLOAD_DIR=directory)
+        uploads_dir.enable()
+        self.addCleanup(uploads_dir.disable)
+        self.profile = self.create_profile('alice')
+        self.client = APIClient()
+        self.client.force_authenticate(self.profile.user)
+        self.content = png_bytes()
+
+    def start(self, size=None):
+        response = self.client.post('/api/my-profile/uploads/', {
+            'target': 'profile_image', 'filename': 'me.png', 'size': size or len(self.content),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return f"/api/my-profile/uploads/{response.data['id']}/"
+
+    def put(self, url, start, end, data=None):
+        data = self.content[start:end] if data is None else data
+        return self.client.put(
+            url, data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{len(self.content)}',
+        )
+
+    def test_resent_chunk_is_harmless_and_the_upload_completes(self):
+        url = self.start()
+        middle = len(self.content) // 2
+        self.assertEqual(self.put(url, 0, middle).data['offset'], middle)
+        response = self.put(url, 0, middle)  # the response was lost: resent
+        self.assertEqual((response.status_code, response.data['offset']), (200, middle))
+        self.assertEqual(self.client.get(url).data['offset'], middle)
+        self.assertEqual(self.put(url, middle, len(self.content)).data['offset'], len(self.content))
+
+        response = self.client.post(url + 'complete/', format='json')
+        self.assertEqual(response.status_code, 200)
+        self.profile.refresh_from_db()
+        with self.profile.profile_image.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertEqual(os.listdir(settings.CHUNKED_UPLOAD_DIR), [])
+
+    def test_chunk_after_a_gap_is_a_conflict(self):
+        url = self.start()
+        self.put(url, 0, 100)
+        response = self.put(url, 200, 300)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 100)
+        self.assertEqual(self.client.get(url).data['offset'], 100)
+
+    def test_first_chunk_must_be_an_image(self):
+        url = self.start()
+        response = self.put(url, 0, 100, data=b'<?php echo 1; ?>'.ljust(100, b' '))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(os.listdir(settings.CHUNKED_UPLOAD_DIR), [])
+
+    def test_incomplete_upload_cannot_be_completed(self):
+        url = self.start()
+        self.put(url, 0, 100)
+        response = self.client.post(url + 'complete/', format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Incomplete', str(response.data['upload']))
+        self.assertEqual(self.client.get(url).data['offset'], 100)  # kept, to be resumed
+
+    def test_active_uploads_are_limited(self):
+        for _ in range(MAX_ACTIVE_UPLOADS):
+            self.start()
+        response = self.client.post('/api/my-profile/uploads/', {
+            'target': 'profile_image', 'filename': 'me.png', 'size': 100,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('upload', response.data)
+
+    def test_abandoned_uploads_and_stray_files_expire(self):
+        stale_url, fresh_url = self.start(), self.start()
+        stale = ChunkedUpload.objects.get(pk=stale_url.rstrip('/').rsplit('/', 1)[1])
+        expired = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY + 60)
+        ChunkedUpload.objects.filter(pk=stale.pk).update(updated_at=expired)
+        os.utime(part_path(stale), (expired.timestamp(), expired.timestamp()))
+        stray = os.path.join(settings.CHUNKED_UPLOAD_DIR, 'gone.part')
+        open(stray, 'wb').close()
+        os.utime(stray, (expired.timestamp(), expired.timestamp()))
+
+        self.assertEqual(expire_uploads(), 2)
+        self.assertEqual(self.client.get(stale_url).status_code, 404)
+        self.assertEqual(self.client.get(fresh_url).status_code, 200)
+        self.assertEqual(len(os.listdir(settings.CHUNKED_UPLOAD_DIR)), 1)
+
+
+@override_settings(JOBS_RUN_INLINE=False, SECURE_SSL_REDIRECT=False)
+class QueryCountTests(TestCase):
+    """Query budgets of the hot reads, so new serializer fields can't bring N+1 queries back."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'password123')
+        self.profile = self.user.profile
+        for position in range(3):
+            GalleryImage.objects.create(profile=self.profile, image=f'gallery/{position}.jpg', position=position)
+        self.client = APIClient()
+
+    def test_public_read_queryset_is_two_queries(self):
+        with self.assertNumQueries(2):
+            profile = Profile.objects.for_public().get(pk=self.profile.pk)
+            data = ProfileSerializer(profile).data
+        self.assertEqual(data['username'], 'alice')
+        self.assertEqual(len(data['gallery_urls']), 3)
+
+    def test_public_profile_cache_miss(self):
+        refresh_snapshot(self.profile.pk)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/profile/alice/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_public_profile_cache_miss_without_snapshot(self):
+        # The snapshot is rebuilt through the public read queryset
+        Profile.objects.filter(pk=self.profile.pk).update(public_snapshot='')
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/profile/alice/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_public_profile_cache_hit(self):
+        refresh_snapshot(self.profile.pk)
+        self.client.get('/api/profile/alice/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/profile/alice/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/profile/alice/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def authenticate(self):
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_my_profile_get(self):
+        self.authenticate()
+        cache.clear()
+        # Cold: user, profile ID and version lookups, then the read queryset
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/my-profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['gallery_urls']), 3)
+        # User, profile ID and version now come from the cache
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/my-profile/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_my_profile_patch(self):
+        self.authenticate()
+        self.client.get('/api/my-profile/')
+        # Read queryset, UPDATE of the changed column, check for the queued
+        # snapshot rebuild, read queryset again for the response
+        with self.assertNumQueries(6):
+            response = self.client.patch('/api/my-profile/', {'designation': 'CTO'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['designation'], 'CTO')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class UserListingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', 'admin@example.com', 'password123', is_staff=True))
+
+    def test_impossible_dates_are_rejected(self):
+        for params in ({'joined_after': '2024-13-01'}, {'joined_before': '2024-02-30T10:00:00'}):
+            response = self.client.get('/api/admin/users/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(response.data, {next(iter(params)): ['Invalid date']})
+
+    def test_valid_dates_filter(self):
+        response = self.client.get('/api/admin/users/', {'joined_after': '2000-01-01', 'joined_before': '2999-12-31'})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class StatusUpdateTests(TestCase):
+    def setUp(self):
+        self.profile = User.objects.create_user('alice', 'alice@example.com', 'password123').profile
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'password123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = f'/api/admin/users/{self.profile.pk}/status/'
+
+    def test_status_change_is_recorded(self):
+        response = self.client.put(self.url, {'status': 'printing'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'printing')
+        change = ProfileStatusChange.objects.get(profile=self.profile)
+        self.assertEqual(
+            (change.from_status, change.to_status, change.changed_by),
+            ('payment_received', 'printing', self.admin),
+        )
+
+    def test_status_and_history_commit_together(self):
+        with mock.patch.object(ProfileStatusChange.objects, 'create', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                self.client.put(self.url, {'status': 'printing'}, format='json')
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.status, 'payment_received')
+
+
+class DirtyFieldTests(TestCase):
+    def setUp(self):
+        self.profile = User.objects.create_user('alice', 'alice@example.com', 'password123').profile
+
+    def test_fields_left_out_of_update_fields_stay_dirty(self):
+        profile = Profile.objects.get(pk=self.profile.pk)
+        profile.designation = 'CTO'
+        profile.phone = '12345'
+        profile.save(update_fields=['phone'])
+        self.assertEqual(profile.dirty_fields(), {'designation'})
+
+        profile.save()
+        profile.refresh_from_db()
+        self.assertEqual((profile.designation, profile.phone), ('CTO', '12345'))
+        self.assertEqual(profile.dirty_fields(), set())
+
+
+class CardImportTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        imports = override_settings(CARD_IMPORT_DIR=directory, CARD_IMPORT_WORKERS=1)
+        imports.enable()
+        self.addCleanup(imports.disable)
+
+    def queue(self, content):
+        card_import = CardImport()
+        with self.captureOnCommitCallbacks():  # the job is only queued; run it below
+            queue_import(card_import, SimpleUploadedFile('order.csv', content))
+        return card_import
+
+    def test_import_creates_cards_and_reports_errors(self):
+        card_import = self.queue(b'username,email,password\nbob,bob@example.com,password123\nbad user,x@example.com,\n')
+        run_import(card_import.pk)
+        card_import.refresh_from_db()
+        self.assertEqual((card_import.status, card_import.created_count, card_import.error_count), ('done', 1, 1))
+        self.assertTrue(Profile.objects.filter(user__username='bob').exists())
+
+    def test_unexpected_errors_mark_the_import_failed(self):
+        card_import = self.queue(b'username,email\nbob,bob@example.com\n')
+        with mock.patch('profiles.provisioning.insert_rows', side_effect=DatabaseError('disk I/O error')):
+            with self.assertRaises(DatabaseError):
+                run_import(card_import.pk)
+        card_import.refresh_from_db()
+        self.assertEqual(card_import.status, 'failed')
+        self.assertIn('disk I/O error', card_import.report['error'])
+        self.assertIsNotNone(card_import.finished_at)
+        self.assertFalse(os.path.exists(import_path(card_import)))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CardLinkTests(TestCase):
+    def setUp(self):
+        self.profile = User.objects.create_user('alice', 'alice@example.com', 'password123').profile
+
+    def test_reserved_root_paths_are_not_card_pages(self):
+        self.assertEqual(self.client.get('/favicon.ico').status_code, 404)
+        self.assertEqual(self.client.get('/robots.txt').status_code, 404)
+        self.assertEqual(self.client.get('/admin').status_code, 404)
+        self.assertEqual(self.client.get('/alice').status_code, 302)
+
+    def test_reserved_usernames_cannot_register(self):
+        response = APIClient().post('/api/register/', {
+            'username': 'Favicon.ico', 'email': 'f@example.com',
+            'password': 'password123', 'password_confirm': 'password123',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('username', response.data)
+
+    @override_settings(SHORT_CODE_LOAD_TIMEOUT=0.2)
+    def test_unloaded_index_waits_once_then_reads_the_database(self):
+        index = ShortCodeIndex()
+        index._pid, index._thread = os.getpid(), mock.Mock()  # no background load
+        started = time.monotonic()
+        self.assertEqual(index.resolve(self.profile.short_code), 'alice')
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+        started = time.monotonic()
+        with self.assertNumQueries(1):
+            self.assertEqual(index.resolve(self.profile.short_code), 'alice')
+        self.assertLess(time.monotonic() - started, 0.2)
+        self.assertIsNone(index.resolve('00000000'))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CardRenderTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile = self.upload_photo(self.create_profile('alice'), png_bytes())
+        self.client = APIClient()
+        self.client.force_authenticate(self.profile.user)
+
+    def test_png_and_pdf_cards_download(self):
+        response = self.client.get('/api/my-profile/card.png')
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/png'))
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, CARD_SIZE)
+
+        response = self.client.get('/api/my-profile/card.pdf')
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'application/pdf'))
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+        self.assertEqual(self.client.get('/api/my-profile/card.svg').status_code, 404)
+
+    def test_every_template_renders(self):
+        self.profile.background_color = 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)'
+        self.profile.name, self.profile.designation = 'Alice Smith', 'Chief Technology Officer' * 4
+        for template, label in Profile.TEMPLATE_CHOICES:
+            self.profile.template = template
+            self.assertEqual(render_card_image(self.profile).size, CARD_SIZE, template)
+
+    def test_cards_are_rendered_once_per_profile_version(self):
+        first = get_card(self.profile, 'png')
+        with mock.patch('profiles.cards.render_card_image', side_effect=AssertionError('rendered again')):
+            self.assertEqual(get_card(self.profile, 'png'), first)
+
+        self.profile.designation = 'CTO'
+        self.profile.save()
+        second = get_card(self.profile, 'png')
+        self.assertNotEqual(second, first)
+        self.assertTrue(card_storage.exists(second))
+        self.assertFalse(card_storage.exists(first))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, FRONTEND_URL='https://card.example.com')
+class OpenGraphTests(TestCase):
+    crawler = 'WhatsApp/2.23.20.0 A'
+    browser = 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148'
+
+    def setUp(self):
+        cache.clear()
+        self.profile = User.objects.create_user('alice', 'alice@example.com', 'password123').profile
+        Profile.objects.filter(pk=self.profile.pk).update(name='Alice Smith', designation='CTO')
+
+    def test_browsers_are_redirected_to_the_app(self):
+        response = self.client.get('/alice', HTTP_USER_AGENT=self.browser)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://card.example.com/alice')
+        self.assertIn('User-Agent', response['Vary'])
+
+    def test_crawlers_get_the_preview_page(self):
+        for user_agent in (self.crawler, 'LinkedInBot/1.0', 'Slackbot-LinkExpanding 1.0', 'facebookexternalhit/1.1'):
+            response = self.client.get('/alice', HTTP_USER_AGENT=user_agent)
+            self.assertEqual(response.status_code, 200, user_agent)
+            self.assertTrue(response['Content-Type'].startswith('text/html'))
+            self.assertContains(response, '<meta property="og:title" content="Alice Smith - LSofito Card">')
+            self.assertContains(response, '<meta property="og:url" content="https://card.example.com/alice">')
+        self.assertEqual(self.client.get('/nobody', HTTP_USER_AGENT=self.crawler).status_code, 404)
+
+    def test_short_codes_send_crawlers_to_the_preview_page(self):
+        code = self.profile.short_code
+        response = self.client.get(f'/c/{code}', HTTP_USER_AGENT=self.crawler)
+        self.assertEqual((response.status_code, response['Location']), (302, '/alice'))
+        response = self.client.get(f'/c/{code}', HTTP_USER_AGENT=self.browser)
+        self.assertEqual((response.status_code, response['Location']), (302, 'https://card.example.com/alice'))
+
+    def test_user_fields_are_escaped(self):
+        Profile.objects.filter(pk=self.profile.pk).update(
+            name='<script>alert(1)</script>', designation='"><img src=x onerror=alert(1)>',
+        )
+        html = self.client.get('/alice', HTTP_USER_AGENT=self.crawler).content.decode()
+        self.assertNotIn('<script>', html)
+        self.assertNotIn('<img', html)
+        self.assertNotIn('"><', html)
+        self.assertIn('&lt;script&gt;alert(1)&lt;/script&gt; - LSofito Card', html)
+        self.assertIn('&quot;&gt;&lt;img src=x onerror=alert(1)&gt;', html)
+
+
+class VCardTests(TestCase):
+    def test_values_cannot_inject_properties(self):
+        profile = User.objects.create_user('alice', 'alice@example.com', 'password123').profile
+        profile.email = 'alice@example.com\r\nTEL:+100'
+        profile.website = 'https://example.com/\nNOTE:injected'
+        profile.others = {'Blog\r\nORG:Evil': 'https://blog.example.com\rORG:Evil'}
+        profile.save()
+        profile = Profile.objects.select_related('user').get(pk=profile.pk)
+
+        for version in VCARD_VERSIONS:
+            text = build_vcard(profile, version)
+            lines = text.replace('\r\n ', '').split('\r\n')  # unfold
+            properties = [line.split(':', 1)[0].split(';', 1)[0] for line in lines if line]
+            self.assertNotIn('TEL', properties)
+            self.assertNotIn('ORG', properties)
+            self.assertEqual(properties.count('NOTE'), 0)
+            self.assertNotIn('\r', text.replace('\r\n', ''))
+            self.assertNotIn('\n', text.replace('\r\n', ''))
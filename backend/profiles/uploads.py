@@ -0,0 +1,225 @@
+"""
+Chunked, resumable image uploads.
+
+A client starts an upload with the file's name and size, sends the bytes in
+order as PUTs of at most CHUNKED_UPLOAD_CHUNK_SIZE bytes, then finishes it to
+attach the file to the profile photo or a gallery slot. Chunks are streamed
+into a temp file under CHUNKED_UPLOAD_DIR, so a worker never holds more than
+one read buffer of an image in memory.
+
+The stored offset only advances once a chunk is completely written. After a
+dropped connection the client asks for the offset and resends from there;
+resending a chunk that was already stored is harmless.
+"""
+import fcntl
+import os
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from jobs.queue import enqueue
+from .gallery import plan_gallery, apply_gallery_plan
+from .models import ChunkedUpload
+
+READ_SIZE = 64 * 1024
+MAX_ACTIVE_UPLOADS = 4  # per profile
+SNIFF_BYTES = 12
+
+# Pillow format -> stored file extension
+IMAGE_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+}
+
+
+class OffsetMismatch(Exception):
+    """A chunk doesn't start where the stored bytes end."""
+
+    def __init__(self, offset):
+        super().__init__(f'Expected a chunk starting at byte {offset}')
+        self.offset = offset
+
+
+def sniff_image(header):
+    """Pillow format name from the first bytes of a file, or None if it isn't a supported image."""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'JPEG'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'PNG'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'GIF'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def part_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{upload.pk}.part')
+
+
+def start_upload(profile_id, target, filename, size):
+    """Validate the declared file and create the upload with an empty temp file."""
+    if target not in dict(ChunkedUpload.TARGET_CHOICES):
+        raise ValidationError({'target': ['Must be "profile_image" or "gallery"']})
+    filename = posixpath.basename(str(filename or '').replace('\\', '/')).strip()
+    if not filename:
+        raise ValidationError({'filename': ['This field is required']})
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise ValidationError({'size': ['Must be an integer']})
+    if not 0 < size <= settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise ValidationError({'size': [f'Must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes']})
+    if ChunkedUpload.objects.filter(profile_id=profile_id).count() >= MAX_ACTIVE_UPLOADS:
+        raise ValidationError({'upload': [f'At most {MAX_ACTIVE_UPLOADS} uploads can be in progress']})
+
+    upload = ChunkedUpload.objects.create(profile_id=profile_id, target=target, filename=filename[-100:], size=size)
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(part_path(upload), 'wb').close()
+    enqueue('profiles.expire_uploads', unique=True, delay=settings.CHUNKED_UPLOAD_EXPIRY)
+    return upload
+
+
+def _read(stream, size):
+    """Read up to ``size`` bytes, fewer only if the stream ends."""
+    data = b''
+    while len(data) < size:
+        piece = stream.read(size - len(data))
+        if not piece:
+            break
+        data += piece
+    return data
+
+
+def write_chunk(upload, start, length, stream):
+    """
+    Append ``length`` bytes from ``stream`` at byte ``start`` of the upload.
+    Returns the new offset. The first chunk must begin with an image
+    signature; otherwise the upload is discarded.
+    """
+    if length > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+        raise ValidationError({'chunk': [f'Chunks are limited to {settings.CHUNKED_UPLOAD_CHUNK_SIZE} bytes']})
+    if start < 0 or length <= 0 or start + length > upload.size:
+        raise ValidationError({'chunk': [f'Chunk outside of the declared {upload.size} bytes']})
+
+    try:
+        handle = open(part_path(upload), 'r+b')
+    except FileNotFoundError:
+        raise ChunkedUpload.DoesNotExist
+    with handle:
+        # Serialises PUTs of one upload across worker processes
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        received = ChunkedUpload.objects.filter(pk=upload.pk).values_list('received', flat=True).first()
+        if received is None:
+            raise ChunkedUpload.DoesNotExist
+        if start + length <= received:
+            return received  # a retry of a chunk that is already stored
+        if start != received:
+            raise OffsetMismatch(received)
+
+        written = 0
+        if start == 0:
+            header = _read(stream, min(SNIFF_BYTES, length))
+            if sniff_image(header) is None:
+                handle.close()
+                discard_upload(upload)
+                raise ValidationError({'chunk': ['Not a JPEG, PNG, GIF or WebP image']})
+            handle.write(header)
+            written = len(header)
+        handle.seek(start + written)
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            handle.write(data)
+            written += len(data)
+        if written < length:
+            # Connection dropped mid-chunk: keep the offset, the client resends it
+            raise ValidationError({'chunk': [f'Received {written} of {length} bytes']})
+        handle.flush()
+        os.fsync(handle.fileno())
+        ChunkedUpload.objects.filter(pk=upload.pk).update(received=start + length, updated_at=timezone.now())
+    upload.received = start + length
+    return upload.received
+
+
+def _verify_image(path):
+    """Pillow format of the complete file; raises ValidationError if it isn't a valid image."""
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise ValidationError({'upload': ['The uploaded file is not a valid image']})
+    if image_format not in IMAGE_EXTENSIONS:
+        raise ValidationError({'upload': ['Not a JPEG, PNG, GIF or WebP image']})
+    return image_format
+
+
+def finish_upload(upload, profile, position=None):
+    """
+    Attach a complete upload to ``profile`` (loaded with ``for_public()``):
+    as the profile photo, or into gallery slot ``position`` (appended when
+    omitted). The upload is kept if attaching fails validation.
+    """
+    if upload.received != upload.size:
+        raise ValidationError({'upload': [f'Incomplete: {upload.received} of {upload.size} bytes received']})
+    path = part_path(upload)
+    image_format = _verify_image(path)
+    name = posixpath.splitext(upload.filename)[0] + IMAGE_EXTENSIONS[image_format]
+
+    with open(path, 'rb') as handle:
+        file = File(handle, name=name)
+        if upload.target == 'profile_image':
+            profile.profile_image = file
+            profile.save()
+        else:
+            slots = [image.pk for image in profile.gallery_images.all()]
+            if position is None or position >= len(slots):
+                slots.append(file)
+            elif position < 0:
+                raise ValidationError({'position': ['Must not be negative']})
+            else:
+                slots[position] = file
+            apply_gallery_plan(profile, plan_gallery(profile, slots))
+    discard_upload(upload)
+
+
+def discard_upload(upload):
+    """Delete the upload and its temp file."""
+    ChunkedUpload.objects.filter(pk=upload.pk).delete()
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def expire_uploads():
+    """
+    Discard uploads that received no chunk for CHUNKED_UPLOAD_EXPIRY seconds,
+    and temp files left without an upload. Returns the number of files removed.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY)
+    ChunkedUpload.objects.filter(updated_at__lt=cutoff).delete()
+    active = {f'{pk}.part' for pk in ChunkedUpload.objects.values_list('pk', flat=True)}
+    removed = 0
+    try:
+        entries = list(os.scandir(settings.CHUNKED_UPLOAD_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if entry.name in active or entry.stat().st_mtime >= cutoff.timestamp():
+            continue
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
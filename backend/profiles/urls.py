@@ -1,11 +1,25 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.SERVER_MODE == 'asgi':
+    from . import async_views as public_views
+else:
+    public_views = views
+
 urlpatterns = [
-    path('profile/<str:username>/', views.get_public_profile, name='public-profile'),
+    path('profile/<str:username>/', public_views.get_public_profile, name='public-profile'),
+    path('profile/<str:username>/vcard/', public_views.get_profile_vcard, name='profile-vcard'),
+    path('profile/<str:username>/links/<str:label>/', views.follow_profile_link, name='profile-link'),
     path('my-profile/', views.MyProfileView.as_view(), name='my-profile'),
+    path('my-profile/card.<str:file_format>', views.get_my_card, name='my-card'),
+    path('my-profile/uploads/', views.start_my_upload, name='my-uploads'),
+    path('my-profile/uploads/<uuid:upload_id>/', views.my_upload, name='my-upload'),
+    path('my-profile/uploads/<uuid:upload_id>/complete/', views.complete_my_upload, name='my-upload-complete'),
     path('admin/users/', views.get_all_users, name='admin-users'),
     path('admin/users/<int:profile_id>/status/', views.update_user_status, name='admin-update-status'),
+    path('admin/users/<int:profile_id>/card.<str:file_format>', views.get_user_card, name='admin-user-card'),
+    path('admin/users/status/', views.bulk_update_status, name='admin-bulk-update-status'),
 ]
 
 
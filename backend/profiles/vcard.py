@@ -0,0 +1,125 @@
+"""
+vCard (.vcf) export of a profile.
+
+Builds a vCard 3.0 or 4.0 with the contact fields, social and custom links,
+and the profile photo downscaled and embedded as base64 JPEG. The result is
+cached per profile version by the view, so the photo is encoded once per
+change rather than once per tap.
+"""
+import base64
+import io
+
+from django.conf import settings
+
+from .images import load_profile_photo
+
+VCARD_VERSIONS = ('3.0', '4.0')
+PHOTO_SIZE = 256  # px, longest side
+
+SOCIAL_FIELDS = (
+    ('instagram', 'Instagram'),
+    ('linkedin', 'LinkedIn'),
+    ('youtube', 'YouTube'),
+    ('twitter', 'Twitter'),
+    ('figma', 'Figma'),
+    ('website', 'Website'),
+)
+
+
+def _escape(value):
+    """Escape a text value (RFC 6350 section 3.4)."""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace(',', '\\,')
+        .replace(';', '\\;')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+        .replace('\r', '\\n')
+    )
+
+
+def _param(value):
+    """Quote a parameter value if it contains characters that need it."""
+    # Parameters can't hold line breaks at all (RFC 6868 isn't widely supported)
+    value = ' '.join(str(value).replace('"', "'").splitlines())
+    if any(char in value for char in ',;:'):
+        return f'"{value}"'
+    return value
+
+
+def _fold(line):
+    """Fold a content line to 75 octets, continuation lines starting with a space."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte UTF-8 sequence
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74  # leading space takes one octet
+    return '\r\n '.join(parts)
+
+
+def _photo_base64(profile):
+    """Downscaled JPEG of the profile photo, base64-encoded, or None."""
+    image = load_profile_photo(profile, PHOTO_SIZE)
+    if image is None:
+        return None
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, 'JPEG', quality=80, optimize=True)
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def build_vcard(profile, version='3.0'):
+    """Return the vCard text for a profile loaded with its user."""
+    v4 = version == '4.0'
+    name = profile.name or profile.user.username
+    lines = [
+        'BEGIN:VCARD',
+        f'VERSION:{version}',
+        f'FN:{_escape(name)}',
+        f'N:;{_escape(name)};;;',
+    ]
+    if profile.designation:
+        lines.append(f'TITLE:{_escape(profile.designation)}')
+    if profile.email:
+        lines.append(f'EMAIL;TYPE={"work" if v4 else "INTERNET,WORK"}:{_escape(profile.email)}')
+    if profile.phone:
+        if v4:
+            lines.append(f'TEL;TYPE=cell;VALUE=uri:tel:{_escape(profile.phone.replace(" ", ""))}')
+        else:
+            lines.append(f'TEL;TYPE=CELL:{_escape(profile.phone)}')
+    if profile.whatsapp:
+        digits = ''.join(char for char in profile.whatsapp if char.isdigit())
+        if digits:
+            lines.append(f'URL;TYPE=WhatsApp:https://wa.me/{digits}')
+
+    for field, label in SOCIAL_FIELDS:
+        url = getattr(profile, field)
+        if url:
+            lines.append(f'URL;TYPE={label}:{_escape(url)}')
+    for label, url in (profile.others or {}).items():
+        if url:
+            lines.append(f'URL;TYPE={_param(label)}:{_escape(url)}')
+
+    card_url = f"{settings.FRONTEND_URL.rstrip('/')}/{profile.user.username}"
+    lines.append(f'URL;TYPE=Card:{_escape(card_url)}')
+    if profile.about:
+        lines.append(f'NOTE:{_escape(profile.about)}')
+
+    photo = _photo_base64(profile)
+    if photo:
+        if v4:
+            lines.append(f'PHOTO:data:image/jpeg;base64,{photo}')
+        else:
+            lines.append(f'PHOTO;ENCODING=b;TYPE=JPEG:{photo}')
+
+    lines.append(f'REV:{profile.updated_at.strftime("%Y%m%dT%H%M%SZ")}')
+    lines.append('END:VCARD')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
@@ -2,35 +2,245 @@ from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse, HttpResponseRedirect, Http404
+from django.utils.cache import patch_vary_headers
 import json
-from .models import Profile, GalleryImage
+import re
+from .models import Profile, ProfileStatusChange, ChunkedUpload
 from .serializers import ProfileSerializer, ProfileUpdateSerializer, UserListSerializer
+from .cache import (
+    get_cached_version, get_profile_version, remember_profile_version,
+    get_cached_response, set_cached_response, version_from_timestamp,
+)
+from .conditional import (
+    not_modified_response, add_validators,
+    PUBLIC_CACHE_CONTROL, PRIVATE_CACHE_CONTROL,
+)
+from .snapshots import refresh_snapshot
+from .gallery import plan_gallery, apply_gallery_plan
+from .listing import filter_users, paginate_users, export_rows, stream_csv, stream_jsonl
+from .fulfillment import bulk_transition, MAX_BULK_PROFILES
+from .vcard import build_vcard, VCARD_VERSIONS
+from .cards import get_card, card_storage, CARD_FORMATS
+from .opengraph import build_preview_html, is_crawler, card_url
+from .shortcodes import index as short_codes
+from .uploads import OffsetMismatch, start_upload, write_chunk, finish_upload, discard_upload
+from analytics.recorder import record, track
+from users.authentication import profile_id_for
+from config.routers import reads_from_replica
 
 User = get_user_model()
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@track('view')
+@reads_from_replica
 def get_public_profile(request, username):
     """Get public profile by username."""
-    try:
-        user = User.objects.get(username=username)
-        profile = Profile.objects.get(user=user)
-        serializer = ProfileSerializer(profile, context={'request': request})
-        return Response(serializer.data)
-    except User.DoesNotExist:
+    version = get_cached_version(username)
+    if version is not None:
+        not_modified = not_modified_response(request, version, PUBLIC_CACHE_CONTROL)
+        if not_modified is not None:
+            return not_modified
+        body = get_cached_response(username, version)
+        if body is not None:
+            return _json_profile_response(body, version)
+
+    row = (
+        Profile.objects.filter(user__username=username)
+        .values_list('pk', 'updated_at', 'public_snapshot')
+        .first()
+    )
+    if row is None:
+        if not User.objects.filter(username=username).exists():
+            return Response(
+                {'error': 'User not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         return Response(
-            {'error': 'User not found'},
+            {'error': 'Profile not found'},
             status=status.HTTP_404_NOT_FOUND
         )
-    except Profile.DoesNotExist:
+
+    profile_id, updated_at, body = row
+    version = version_from_timestamp(updated_at)
+    not_modified = not_modified_response(request, version, PUBLIC_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    if not body:
+        # Snapshot not materialized yet (new profile or mid-rebuild)
+        body = refresh_snapshot(profile_id)
+        if body is None:
+            return Response(
+                {'error': 'Profile not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+    # Only cache the body if no newer version was published meanwhile
+    if remember_profile_version(username, updated_at) == version:
+        set_cached_response(username, version, body)
+    return _json_profile_response(body, version)
+
+
+def _json_profile_response(body, version):
+    response = HttpResponse(body, content_type='application/json')
+    return add_validators(response, version, PUBLIC_CACHE_CONTROL)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@track('vcard')
+@reads_from_replica
+def get_profile_vcard(request, username):
+    """Download a profile as a vCard (?version=3.0|4.0, default 3.0)."""
+    vcard_version = request.query_params.get('version', '3.0')
+    if vcard_version not in VCARD_VERSIONS:
+        return Response(
+            {'error': f"version must be one of {', '.join(VCARD_VERSIONS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    variant = f'vcard:{vcard_version}'
+
+    version = get_cached_version(username)
+    if version is not None:
+        not_modified = not_modified_response(request, version, PUBLIC_CACHE_CONTROL)
+        if not_modified is not None:
+            return not_modified
+        body = get_cached_response(username, version, variant)
+        if body is not None:
+            return _vcard_response(body, username, version)
+
+    profile = Profile.objects.select_related('user').filter(user__username=username).first()
+    if profile is None:
         return Response(
             {'error': 'Profile not found'},
             status=status.HTTP_404_NOT_FOUND
         )
 
+    version = version_from_timestamp(profile.updated_at)
+    not_modified = not_modified_response(request, version, PUBLIC_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    body = build_vcard(profile, vcard_version)
+    if remember_profile_version(username, profile.updated_at) == version:
+        set_cached_response(username, version, body, variant)
+    return _vcard_response(body, username, version)
+
+
+def _vcard_response(body, username, version):
+    response = HttpResponse(body, content_type='text/vcard; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{username}.vcf"'
+    return add_validators(response, version, PUBLIC_CACHE_CONTROL)
+
+
+LINK_FIELDS = ('instagram', 'linkedin', 'youtube', 'website', 'twitter', 'figma')
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@reads_from_replica
+def follow_profile_link(request, username, label):
+    """Redirect to one of a profile's links (a social field or an 'others' label), counting the click."""
+    url = _profile_link(username, label)
+    if not url or not url.lower().startswith(('http://', 'https://')):
+        return Response(
+            {'error': 'Link not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    record('click', username, request, label=label)
+    return HttpResponseRedirect(url)
+
+
+def _profile_link(username, label):
+    """Look the link up in the cached public JSON, falling back to the database."""
+    data = None
+    version = get_cached_version(username)
+    if version is not None:
+        body = get_cached_response(username, version)
+        if body is not None:
+            data = json.loads(body)
+    if data is None:
+        data = (
+            Profile.objects.filter(user__username=username)
+            .values('whatsapp', 'others', *LINK_FIELDS)
+            .first()
+        )
+        if data is None:
+            return None
+    if label == 'whatsapp':
+        digits = ''.join(char for char in data.get('whatsapp') or '' if char.isdigit())
+        return f'https://wa.me/{digits}' if digits else None
+    if label in LINK_FIELDS:
+        return data.get(label)
+    return (data.get('others') or {}).get(label)
+
+
+@reads_from_replica
+def profile_card_page(request, username):
+    """
+    Card URL for link scrapers: a cached HTML page with Open Graph tags.
+    Browsers are redirected to the SPA.
+    """
+    if not is_crawler(request.META.get('HTTP_USER_AGENT')):
+        response = HttpResponseRedirect(card_url(username))
+        patch_vary_headers(response, ['User-Agent'])
+        return response
+
+    version = get_cached_version(username)
+    if version is not None:
+        not_modified = not_modified_response(request, version, PUBLIC_CACHE_CONTROL)
+        if not_modified is not None:
+            return not_modified
+        body = get_cached_response(username, version, 'og')
+        if body is not None:
+            return _preview_response(body, version)
+
+    profile = Profile.objects.select_related('user').filter(user__username=username).first()
+    if profile is None:
+        raise Http404('Profile not found')
+
+    version = version_from_timestamp(profile.updated_at)
+    not_modified = not_modified_response(request, version, PUBLIC_CACHE_CONTROL)
+    if not_modified is not None:
+        return not_modified
+
+    body = build_preview_html(profile)
+    if remember_profile_version(username, profile.updated_at) == version:
+        set_cached_response(username, version, body, 'og')
+    return _preview_response(body, version)
+
+
+def resolve_short_code(request, code):
+    """
+    NFC tag URL: redirect a card's short code to its profile, without a
+    database query once the index is loaded. Temporary redirect, since the
+    username may change.
+    """
+    username = short_codes.resolve(code)
+    if username is None:
+        raise Http404('Card not found')
+    if is_crawler(request.META.get('HTTP_USER_AGENT')):
+        response = HttpResponseRedirect(reverse('profile-card-page', args=[username]))
+    else:
+        response = HttpResponseRedirect(card_url(username))
+    patch_vary_headers(response, ['User-Agent'])
+    return response
+
+
+def _preview_response(body, version):
+    response = HttpResponse(body, content_type='text/html; charset=utf-8')
+    patch_vary_headers(response, ['User-Agent'])
+    return add_validators(response, version, PUBLIC_CACHE_CONTROL)
+
 
 class MyProfileView(generics.RetrieveUpdateAPIView):
     """Get and update authenticated user's profile."""
@@ -38,13 +248,24 @@ class MyProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = ProfileUpdateSerializer
 
     def get_object(self):
-        profile, created = Profile.objects.get_or_create(user=self.request.user)
-        return profile
+        # The profile ID comes with the cached user; creating a missing
+        # profile is the rare case (profiles are made at signup and login)
+        profile_id = profile_id_for(self.request.user)
+        if profile_id is None:
+            profile_id = Profile.objects.ensure_for_user(self.request.user).pk
+        return get_object_or_404(Profile.objects.for_public(), pk=profile_id)
 
     def get(self, request, *args, **kwargs):
+        version = get_profile_version(request.user.username)
+        if version is not None:
+            not_modified = not_modified_response(request, version, PRIVATE_CACHE_CONTROL)
+            if not_modified is not None:
+                return not_modified
+
         profile = self.get_object()
         serializer = ProfileSerializer(profile, context={'request': request})
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        return add_validators(response, version_from_timestamp(profile.updated_at), PRIVATE_CACHE_CONTROL)
 
     def update(self, request, *args, **kwargs):
         profile = self.get_object()
@@ -66,9 +287,8 @@ class MyProfileView(generics.RetrieveUpdateAPIView):
             # If 'others' is not in data, ensure it's set to empty dict
             data['others'] = {}
         
-        # Handle gallery images - remove old ones and add new ones
         # Gallery images are sent as separate files with keys like 'gallery_0', 'gallery_1', etc.
-        gallery_files = []
+        gallery_files = {}
         
         # Get gallery files from request.FILES (not request.data)
         for key in request.FILES.keys():
@@ -83,16 +303,24 @@ class MyProfileView(generics.RetrieveUpdateAPIView):
                     
                     # Ensure it's a single file object
                     if file_obj and hasattr(file_obj, 'read'):  # It's a file-like object
-                        gallery_files.append((index, file_obj))
+                        gallery_files[index] = file_obj
                 except (ValueError, AttributeError, IndexError):
                     pass
         
-        # Validate gallery count (max 3)
-        if len(gallery_files) > 3:
-            return Response(
-                {'gallery': ['Maximum 3 gallery images allowed']},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # 'gallery_order' lists the wanted slots: existing image IDs (kept or
+        # moved) and 'gallery_<n>' keys of new uploads. Without it, uploaded
+        # files replace the whole gallery (previous behaviour).
+        gallery_slots = None
+        if 'gallery_order' in data:
+            gallery_slots = self._parse_gallery_order(data.get('gallery_order'), gallery_files)
+            data.pop('gallery_order')
+        elif gallery_files:
+            gallery_slots = [gallery_files[index] for index in sorted(gallery_files)]
+        
+        # Validate gallery slots (max 3, known IDs) before writing anything
+        gallery_plan = None
+        if gallery_slots is not None:
+            gallery_plan = plan_gallery(profile, gallery_slots)
         
         # Update profile fields (remove gallery keys from data if they exist)
         for key in list(data.keys()):
@@ -104,47 +332,246 @@ class MyProfileView(generics.RetrieveUpdateAPIView):
         serializer.is_valid(raise_exception=True)
         serializer.save()
         
-        # Handle gallery images: delete old ones and add new ones
-        if gallery_files:
-            # Delete existing gallery images
-            profile.gallery_images.all().delete()
-            
-            # Add new gallery images (sorted by index)
-            for index, image_file in sorted(gallery_files, key=lambda x: x[0]):
-                if image_file and hasattr(image_file, 'read'):  # Ensure it's a valid file
-                    GalleryImage.objects.create(profile=profile, image=image_file)
+        # Apply only the gallery slots that changed
+        if gallery_plan is not None:
+            apply_gallery_plan(profile, gallery_plan)
         
-        # Return full profile data
+        # Return full profile data (reloaded so the gallery prefetch is fresh)
+        profile = Profile.objects.for_public().get(pk=profile.pk)
         full_serializer = ProfileSerializer(profile, context={'request': request})
         return Response(full_serializer.data)
 
+    @staticmethod
+    def _parse_gallery_order(raw, gallery_files):
+        """Turn the 'gallery_order' JSON list into image IDs and uploaded files."""
+        try:
+            entries = json.loads(raw) if isinstance(raw, str) else raw
+        except (json.JSONDecodeError, TypeError):
+            entries = None
+        if not isinstance(entries, list):
+            raise ValidationError({'gallery_order': ['Must be a JSON list']})
+
+        slots = []
+        for entry in entries:
+            if isinstance(entry, int):
+                slots.append(entry)
+            elif isinstance(entry, str) and entry.startswith('gallery_'):
+                try:
+                    slots.append(gallery_files[int(entry.replace('gallery_', ''))])
+                except (ValueError, KeyError):
+                    raise ValidationError({'gallery_order': [f'No uploaded file for {entry}']})
+            else:
+                raise ValidationError({'gallery_order': [f'Invalid entry: {entry!r}']})
+        return slots
+
+
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_my_upload(request):
+    """
+    Start a chunked image upload. Body: target ("profile_image" or
+    "gallery"), filename, size. Send the bytes with PUTs to the upload, then
+    POST to its complete/ URL.
+    """
+    profile_id = profile_id_for(request.user)
+    if profile_id is None:
+        return Response(
+            {'error': 'Profile not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    upload = start_upload(
+        profile_id, request.data.get('target'), request.data.get('filename'), request.data.get('size')
+    )
+    return Response(_upload_state(upload), status=status.HTTP_201_CREATED)
+
+
+def _upload_state(upload):
+    return {
+        'id': str(upload.pk),
+        'target': upload.target,
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.received,
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+    }
+
+
+def _my_upload(request, upload_id):
+    return ChunkedUpload.objects.filter(pk=upload_id, profile_id=profile_id_for(request.user)).first()
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def my_upload(request, upload_id):
+    """
+    GET: the upload's offset, to resume after a dropped connection.
+    PUT: raw bytes with a "Content-Range: bytes <first>-<last>/<size>"
+    header, starting at the offset. DELETE: abort the upload.
+    """
+    upload = _my_upload(request, upload_id)
+    if upload is None:
+        return Response(
+            {'error': 'Upload not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    if request.method == 'DELETE':
+        discard_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    if request.method == 'PUT':
+        match = CONTENT_RANGE_PATTERN.match(request.headers.get('Content-Range', ''))
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if match is None or int(match[3]) != upload.size or int(match[2]) - int(match[1]) + 1 != length:
+            return Response(
+                {'error': f'Content-Range must be "bytes <first>-<last>/{upload.size}" and match the body'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if length > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+            return Response(
+                {'error': f'Chunks are limited to {settings.CHUNKED_UPLOAD_CHUNK_SIZE} bytes'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        try:
+            write_chunk(upload, int(match[1]), length, request.stream)
+        except OffsetMismatch as mismatch:
+            return Response(
+                {'error': str(mismatch), 'offset': mismatch.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ChunkedUpload.DoesNotExist:
+            return Response(
+                {'error': 'Upload not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+    return Response(_upload_state(upload))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_my_upload(request, upload_id):
+    """
+    Attach a fully received upload as the profile photo or a gallery image.
+    Body (gallery only, optional): position, the slot to replace.
+    """
+    upload = _my_upload(request, upload_id)
+    if upload is None:
+        return Response(
+            {'error': 'Upload not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    position = request.data.get('position')
+    if position is not None:
+        try:
+            position = int(position)
+        except (TypeError, ValueError):
+            raise ValidationError({'position': ['Must be an integer']})
+
+    profile = Profile.objects.for_public().get(pk=upload.profile_id)
+    finish_upload(upload, profile, position)
+    profile = Profile.objects.for_public().get(pk=profile.pk)
+    serializer = ProfileSerializer(profile, context={'request': request})
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_my_card(request, file_format):
+    """Download the authenticated user's printable card (card.png or card.pdf)."""
+    profile = Profile.objects.select_related('user').filter(pk=profile_id_for(request.user)).first()
+    if profile is None:
+        return Response(
+            {'error': 'Profile not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return _card_response(request, profile, file_format, PRIVATE_CACHE_CONTROL)
+
+
+def _card_response(request, profile, file_format, cache_control):
+    if file_format not in CARD_FORMATS:
+        return Response(
+            {'error': f"Card format must be one of {', '.join(CARD_FORMATS)}"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    version = version_from_timestamp(profile.updated_at)
+    not_modified = not_modified_response(request, version, cache_control)
+    if not_modified is not None:
+        return not_modified
+
+    name = get_card(profile, file_format)
+    response = FileResponse(
+        card_storage.open(name, 'rb'),
+        as_attachment=True,
+        filename=f'{profile.user.username}-card.{CARD_FORMATS[file_format][1]}',
+        content_type=CARD_FORMATS[file_format][2],
+    )
+    return add_validators(response, version, cache_control)
+
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def get_all_users(request):
-    """Get all users with their profile status (admin only)."""
-    users = User.objects.all().select_related('profile')
-    serializer = UserListSerializer(users, many=True)
-    return Response(serializer.data)
+    """
+    Get users with their profile status (admin only), newest first.
+
+    Query params: status, template, joined_after, joined_before (filters),
+    limit and cursor (keyset pagination; pass back 'next_cursor'), or
+    export=csv|jsonl to stream every matching row instead of one page.
+    """
+    users = filter_users(request.query_params)
+
+    export = request.query_params.get('export')
+    if export:
+        if export not in ('csv', 'jsonl'):
+            return Response(
+                {'error': 'Invalid export format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rows = export_rows(users)
+        if export == 'csv':
+            response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
+        else:
+            response = StreamingHttpResponse(stream_jsonl(rows), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="users.{export}"'
+        return response
+
+    page, next_cursor = paginate_users(users, request.query_params)
+    serializer = UserListSerializer(page, many=True)
+    return Response({'results': serializer.data, 'next_cursor': next_cursor})
 
 
 @api_view(['PUT'])
 @permission_classes([IsAdminUser])
 def update_user_status(request, profile_id):
     """Update user profile status (admin only)."""
+    new_status = request.data.get('status')
+    if new_status not in dict(Profile.STATUS_CHOICES):
+        return Response(
+            {'error': 'Invalid status'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
     try:
-        profile = Profile.objects.get(id=profile_id)
-        new_status = request.data.get('status')
-        
-        if new_status not in dict(Profile.STATUS_CHOICES):
-            return Response(
-                {'error': 'Invalid status'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        profile.status = new_status
-        profile.save()
-        
+        # Like bulk_transition: the status and its history row commit together,
+        # and the row lock makes concurrent updates record the right previous status
+        with transaction.atomic():
+            profile = Profile.objects.for_public().select_for_update(of=('self',)).get(id=profile_id)
+            old_status = profile.status
+            if old_status != new_status:
+                profile.status = new_status
+                profile.save(update_fields=['status'])
+                ProfileStatusChange.objects.create(
+                    profile=profile, from_status=old_status, to_status=new_status,
+                    changed_by=request.user,
+                )
+
         serializer = ProfileSerializer(profile, context={'request': request})
         return Response(serializer.data)
     except Profile.DoesNotExist:
@@ -153,3 +580,41 @@ def update_user_status(request, profile_id):
             status=status.HTTP_404_NOT_FOUND
         )
 
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_update_status(request):
+    """Move many profiles to a new status in one transaction (admin only)."""
+    profile_ids = request.data.get('profile_ids')
+    new_status = request.data.get('status')
+
+    if new_status not in dict(Profile.STATUS_CHOICES):
+        return Response(
+            {'error': 'Invalid status'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if (
+        not isinstance(profile_ids, list)
+        or not profile_ids
+        or not all(isinstance(pk, int) for pk in profile_ids)
+    ):
+        return Response(
+            {'error': 'profile_ids must be a non-empty list of integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(profile_ids) > MAX_BULK_PROFILES:
+        return Response(
+            {'error': f'At most {MAX_BULK_PROFILES} profiles per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    summary = bulk_transition(profile_ids, new_status, changed_by=request.user)
+    return Response(summary)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_user_card(request, profile_id, file_format):
+    """Download a user's printable card for fulfillment (admin only)."""
+    profile = get_object_or_404(Profile.objects.select_related('user'), pk=profile_id)
+    return _card_response(request, profile, file_format, PRIVATE_CACHE_CONTROL)
@@ -6,3 +6,6 @@ class UsersConfig(AppConfig):
     name = 'users'
 
 
+
+    def ready(self):
+        import users.signals  # noqa: F401
@@ -0,0 +1,79 @@
+"""
+JWT authentication with a short-lived cache of the resolved user.
+
+``JWTAuthentication`` loads the user row on every request. This subclass
+keeps the row (and the user's profile ID) in the cache for
+AUTH_USER_CACHE_TIMEOUT seconds, keyed by user ID and token version. The
+token version is simplejwt's ``hash_password`` claim (CHECK_REVOKE_TOKEN),
+so a password change both revokes old tokens and misses the cache. Saving or
+deleting the user deletes the entry, which covers deactivation and staff
+flag changes as well. The password hash and last login are left out of the
+entry (the cache is shared): on a cached user they are deferred fields.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from profiles.models import Profile
+
+# Never cached: the hash must not sit in a shared cache, and neither is needed
+# to authorize a request (a cached user loads them on access)
+UNCACHED_USER_FIELDS = ('password', 'last_login')
+
+
+def _cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def _user_key(user_id, token_version):
+    return f'auth:user:{user_id}:{token_version}'
+
+
+def forget_user(user_id, *passwords, token_versions=()):
+    """Drop the cached entries of a user for the given password hashes and token versions."""
+    versions = {get_md5_hash_password(password) for password in passwords if password}
+    versions.update(version for version in token_versions if version)
+    _cache().delete_many([_user_key(user_id, version) for version in versions])
+
+
+def profile_id_for(user):
+    """The user's profile ID, resolved during authentication when possible."""
+    if hasattr(user, 'cached_profile_id'):
+        return user.cached_profile_id
+    return Profile.objects.filter(user=user).values_list('pk', flat=True).first()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        token_version = validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+        if user_id is None or token_version is None:
+            return super().get_user(validated_token)
+
+        key = _user_key(user_id, token_version)
+        cached = _cache().get(key)
+        if cached is not None:
+            field_names, values, profile_id = cached
+            user = self.user_model.from_db(DEFAULT_DB_ALIAS, field_names, values)
+        else:
+            # Raises for unknown or inactive users and changed passwords
+            user = super().get_user(validated_token)
+            profile_id = profile_id_for(user)
+            fields = [field for field in user._meta.concrete_fields if field.attname not in UNCACHED_USER_FIELDS]
+            _cache().set(
+                key,
+                (
+                    [field.attname for field in fields],
+                    [getattr(user, field.attname) for field in fields],
+                    profile_id,
+                ),
+                settings.AUTH_USER_CACHE_TIMEOUT,
+            )
+        user.cached_profile_id = profile_id
+        # Lets a save forget this entry even though the password isn't loaded
+        user.token_version = token_version
+        return user
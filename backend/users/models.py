@@ -1,7 +1,20 @@
 from django.contrib.auth.models import AbstractUser
+from django.db import models
 
 
 class User(AbstractUser):
-    pass
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored username so renames can be detected on save
+        instance._loaded_username = instance.__dict__.get('username')
+        # ... and the stored password, to forget auth cache entries keyed by it
+        instance._loaded_password = instance.__dict__.get('password')
+        return instance
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination of the admin user list
+            models.Index(fields=['date_joined', 'id'], name='users_user_joined_id_idx'),
+        ]
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .authentication import forget_user
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    """
+    Drop the cached authentication entry so password, active and staff
+    changes apply on the next request.
+    """
+    forget_user(
+        instance.pk, getattr(instance, '_loaded_password', None), instance.password,
+        token_versions=[getattr(instance, 'token_version', None)],
+    )
+    instance._loaded_password = instance.password
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import CachedJWTAuthentication
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'password123')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def cached_entries(self):
+        return [value for key, value in cache._cache.items() if ':auth:user:' in key]
+
+    def test_password_hash_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/my-profile/').status_code, 200)
+        [entry] = self.cached_entries()
+        self.assertNotIn(self.user.password.encode(), entry)
+        self.assertNotIn(b'last_login', entry)
+
+    def test_password_change_through_a_cached_user_revokes_the_token(self):
+        self.client.get('/api/my-profile/')
+        with self.assertNumQueries(2):
+            # Served from the cache, so the password is deferred
+            self.assertEqual(self.client.get('/api/my-profile/').status_code, 200)
+
+        request = self.client.get('/api/my-profile/').wsgi_request
+        user, token = CachedJWTAuthentication().authenticate(request)
+        self.assertIn('password', user.get_deferred_fields())
+        user.set_password('another-password')
+        user.save()
+
+        self.assertEqual(self.cached_entries(), [])
+        self.assertEqual(self.client.get('/api/my-profile/').status_code, 401)
@@ -0,0 +1,14 @@
+from django.core.exceptions import ValidationError
+
+# Root paths that aren't card pages: backend prefixes and the files browsers
+# and crawlers request by themselves (see the card routes in config/urls.py)
+RESERVED_USERNAMES = frozenset({
+    'admin', 'api', 'c', 'media', 'static',
+    'favicon.ico', 'robots.txt', 'sitemap.xml', 'manifest.json', 'ads.txt', 'humans.txt',
+    'browserconfig.xml', 'apple-touch-icon.png', 'apple-touch-icon-precomposed.png',
+})
+
+
+def validate_username_not_reserved(username):
+    if username.lower() in RESERVED_USERNAMES:
+        raise ValidationError(f'"{username}" is reserved')
@@ -5,7 +5,7 @@ import {
 } from 'react-icons/fa'
 import { SiDevdotto, SiDribbble, SiFigma } from 'react-icons/si'
 
-const BusinessCard = ({ profile, onViewMore, showDetails = false }) => {
+const BusinessCard = ({ profile, onViewMore, showDetails = false, linkHref }) => {
   // Helper function to check if a string is a gradient
   const isGradient = (color) => {
     return color && (color.includes('gradient') || color.includes('linear-gradient') || color.includes('radial-gradient'))
@@ -146,7 +146,7 @@ const BusinessCard = ({ profile, onViewMore, showDetails = false }) => {
             {socialLinks.map(({ icon: Icon, url, key }) => (
               <a
                 key={key}
-                href={url}
+                href={linkHref ? linkHref(key, url) : url}
                 target="_blank"
                 rel="noopener noreferrer"
                 className="transition hover:opacity-70"
@@ -10,6 +10,8 @@ import { FaCheckCircle, FaPrint, FaTruck, FaBox, FaSpinner } from 'react-icons/f
 const AdminPage = () => {
   const navigate = useNavigate()
   const [users, setUsers] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [loading, setLoading] = useState(true)
   const [updating, setUpdating] = useState({})
 
@@ -29,7 +31,8 @@ const AdminPage = () => {
     try {
       setLoading(true)
       const data = await adminAPI.getAllUsers()
-      setUsers(data)
+      setUsers(data.results)
+      setNextCursor(data.next_cursor)
     } catch (err) {
       console.error('Error fetching users:', err)
       toast.error('Failed to load users')
@@ -41,12 +44,32 @@ const AdminPage = () => {
     }
   }
 
+  const fetchMoreUsers = async () => {
+    try {
+      setLoadingMore(true)
+      const data = await adminAPI.getAllUsers({ cursor: nextCursor })
+      setUsers(prev => [...prev, ...data.results])
+      setNextCursor(data.next_cursor)
+    } catch (err) {
+      console.error('Error fetching users:', err)
+      toast.error('Failed to load users')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleStatusChange = async (profileId, newStatus) => {
     try {
       setUpdating(prev => ({ ...prev, [profileId]: true }))
       await adminAPI.updateUserStatus(profileId, newStatus)
       toast.success('Status updated successfully!')
-      fetchUsers() // Refresh the list
+      // Update the row in place instead of reloading every page
+      const statusLabel = statusOptions.find(option => option.value === newStatus)?.label
+      setUsers(prev => prev.map(user => (
+        user.profile_id === profileId
+          ? { ...user, status_value: newStatus, status: statusLabel || user.status }
+          : user
+      )))
     } catch (err) {
       console.error('Error updating status:', err)
       toast.error('Failed to update status')
@@ -218,8 +241,20 @@ const AdminPage = () => {
             </div>
           </div>
 
+          {nextCursor && (
+            <div className="mt-6 text-center">
+              <button
+                onClick={fetchMoreUsers}
+                disabled={loadingMore}
+                className="px-4 py-2 bg-white border border-gray-300 rounded-lg text-sm font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
+
           <div className="mt-6 text-sm text-gray-600">
-            <p>Total Users: <strong>{users.length}</strong></p>
+            <p>Users shown: <strong>{users.length}</strong></p>
           </div>
         </div>
       </main>
@@ -1,8 +1,6 @@
 import { useEffect, useState, useRef } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { toast } from 'react-toastify'
-import jsPDF from 'jspdf'
-import html2canvas from 'html2canvas'
 import { profileAPI } from '../services/api'
 import { getCurrentUser } from '../utils/auth'
 import Navbar from '../components/Navbar'
@@ -45,6 +43,7 @@ const DashboardPage = () => {
   const [saving, setSaving] = useState(false)
   const [error, setError] = useState('')
   const [success, setSuccess] = useState('')
+  const [stats, setStats] = useState(null)
 
   useEffect(() => {
     const fetchProfile = async () => {
@@ -83,6 +82,13 @@ const DashboardPage = () => {
     fetchProfile()
   }, [])
 
+  useEffect(() => {
+    // Stats are optional: the dashboard works without them
+    profileAPI.getMyStats({ days: 30 })
+      .then(setStats)
+      .catch(() => setStats(null))
+  }, [])
+
   const handleChange = (e) => {
     setFormData({
       ...formData,
@@ -121,71 +127,18 @@ const DashboardPage = () => {
   }
 
   const handleSaveAsPDF = async () => {
-    if (!previewRef.current) {
-      toast.error('Preview not available')
-      return
-    }
-
     try {
       toast.info('Generating PDF card...')
-      // Find the card element within preview - the BusinessCard component
-      const cardElement = previewRef.current.querySelector('.bg-white.rounded-t-3xl') || previewRef.current.querySelector('.flex.justify-center')
-      
-      // Get background color for canvas (check if gradient)
-      const bgColor = formData.background_color || profile?.background_color || '#E6E0F2'
-      const canvasBg = bgColor.includes('gradient') ? '#E6E0F2' : bgColor
-      
-      const canvas = await html2canvas(cardElement || previewRef.current, {
-        scale: 2,
-        useCORS: true,
-        backgroundColor: canvasBg,
-        logging: false,
-      })
-
-      const imgData = canvas.toDataURL('image/png')
-      const pdf = new jsPDF('p', 'mm', 'a4')
-      const pdfWidth = pdf.internal.pageSize.getWidth()
-      const pdfHeight = pdf.internal.pageSize.getHeight()
-      
-      // Calculate dimensions for card-based design (centered, with margins)
-      const margin = 20
-      const maxWidth = pdfWidth - (margin * 2)
-      const maxHeight = pdfHeight - (margin * 2)
-      
-      const imgWidth = canvas.width
-      const imgHeight = canvas.height
-      const ratio = Math.min(maxWidth / imgWidth, maxHeight / imgHeight)
-      
-      const imgFinalWidth = imgWidth * ratio
-      const imgFinalHeight = imgHeight * ratio
-      
-      // Center the card on the page
-      const xOffset = (pdfWidth - imgFinalWidth) / 2
-      const yOffset = (pdfHeight - imgFinalHeight) / 2
-      
-      // Add subtle border effect by drawing a rectangle
-      pdf.setDrawColor(200, 200, 200)
-      pdf.setFillColor(255, 255, 255)
-      // Use rect if roundedRect is not available
-      if (typeof pdf.roundedRect === 'function') {
-        pdf.roundedRect(
-          xOffset - 2,
-          yOffset - 2,
-          imgFinalWidth + 4,
-          imgFinalHeight + 4,
-          3,
-          3,
-          'FD'
-        )
-      } else {
-        pdf.rect(xOffset - 2, yOffset - 2, imgFinalWidth + 4, imgFinalHeight + 4, 'FD')
-      }
-      
-      // Add the card image
-      pdf.addImage(imgData, 'PNG', xOffset, yOffset, imgFinalWidth, imgFinalHeight)
-      
-      const fileName = `${formData.name || 'profile'}-card.pdf`
-      pdf.save(fileName)
+      // Rendered by the backend from the saved profile, so unsaved edits are not included
+      const blob = await profileAPI.getMyCard('pdf')
+      const url = URL.createObjectURL(blob)
+      const link = document.createElement('a')
+      link.href = url
+      link.download = `${formData.name || 'profile'}-card.pdf`
+      document.body.appendChild(link)
+      link.click()
+      link.remove()
+      URL.revokeObjectURL(url)
       toast.success('Card saved as PDF!')
     } catch (err) {
       console.error('PDF generation error:', err)
@@ -299,6 +252,8 @@ Profile URL: ${window.location.origin}/${user?.username}
     }
   }
 
+  const maxDailyViews = stats ? Math.max(1, ...stats.series.map((point) => point.views)) : 1
+
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center">
@@ -613,6 +568,45 @@ Profile URL: ${window.location.origin}/${user?.username}
 
             {/* Preview */}
             <div className="bg-white rounded-lg shadow-md p-6">
+              {stats && (
+                <div className="mb-6">
+                  <h2 className="text-xl font-semibold text-gray-800 mb-4">Last 30 Days</h2>
+                  <div className="grid grid-cols-3 gap-3 text-center">
+                    <div className="bg-gray-50 rounded-md p-3">
+                      <p className="text-2xl font-bold text-[#41287b]">{stats.totals.views}</p>
+                      <p className="text-xs text-gray-500">Card views</p>
+                    </div>
+                    <div className="bg-gray-50 rounded-md p-3">
+                      <p className="text-2xl font-bold text-[#41287b]">{stats.totals.vcard_downloads}</p>
+                      <p className="text-xs text-gray-500">Contacts saved</p>
+                    </div>
+                    <div className="bg-gray-50 rounded-md p-3">
+                      <p className="text-2xl font-bold text-[#41287b]">{stats.totals.link_clicks}</p>
+                      <p className="text-xs text-gray-500">Link clicks</p>
+                    </div>
+                  </div>
+                  <div className="flex items-end gap-px h-16 mt-4" aria-label="Daily views">
+                    {stats.series.map((point) => (
+                      <div
+                        key={point.start}
+                        title={`${point.start}: ${point.views} views`}
+                        className="flex-1 bg-[#41287b]/70 rounded-t-sm"
+                        style={{ height: `${(point.views / maxDailyViews) * 100}%` }}
+                      />
+                    ))}
+                  </div>
+                  {stats.links.length > 0 && (
+                    <ul className="mt-4 space-y-1 text-sm text-gray-700">
+                      {stats.links.slice(0, 5).map(({ label, clicks }) => (
+                        <li key={label} className="flex justify-between">
+                          <span>{label}</span>
+                          <span className="font-medium">{clicks}</span>
+                        </li>
+                      ))}
+                    </ul>
+                  )}
+                </div>
+              )}
               <h2 className="text-xl font-semibold text-gray-800 mb-6">Preview</h2>
               <div className="sticky top-8" ref={previewRef}>
                 {/* Show preview with merged formData and profile */}
@@ -194,6 +194,7 @@ View full profile: ${window.location.href}
               profile={profile} 
               onViewMore={handleViewMore}
               showDetails={false}
+              linkHref={(key) => profileAPI.linkUrl(username, key)}
             />
           </div>
 
@@ -258,7 +259,7 @@ View full profile: ${window.location.href}
                     {Object.entries(profile.others).map(([label, url]) => (
                       <a
                         key={label}
-                        href={url}
+                        href={profileAPI.linkUrl(username, label)}
                         target="_blank"
                         rel="noopener noreferrer"
                         className="block text-gray-700 hover:text-[#41287b]"
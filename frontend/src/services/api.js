@@ -112,6 +112,10 @@ export const profileAPI = {
     return response.data
   },
 
+  // Link that redirects through the API so the click is counted
+  linkUrl: (username, label) =>
+    `${API_URL}/profile/${encodeURIComponent(username)}/links/${encodeURIComponent(label)}/`,
+
   getMyProfile: async () => {
     const response = await api.get('/my-profile/')
     return response.data
@@ -153,15 +157,18 @@ export const profileAPI = {
       })
     }
     
+    // A new profile photo goes through the resumable chunked upload first
+    if (data.profile_image instanceof File) {
+      await profileAPI.uploadImage(data.profile_image, { target: 'profile_image' })
+    }
+
     // Add all other fields to FormData
     Object.keys(data).forEach((key) => {
       if (key === 'others' || key === 'gallery') return // Already handled above
       
       if (data[key] !== null && data[key] !== undefined) {
-        if (key === 'profile_image' && data[key] instanceof File) {
-          formData.append(key, data[key])
-        } else if (key === 'profile_image' && typeof data[key] === 'string') {
-          // Skip if it's a URL string (already uploaded image)
+        if (key === 'profile_image') {
+          // Already uploaded above, or a URL string of the current image
           return
         } else {
           formData.append(key, data[key])
@@ -176,11 +183,64 @@ export const profileAPI = {
     })
     return response.data
   },
+
+  // Resumable upload of a profile photo (target 'profile_image') or gallery image
+  // (target 'gallery', optional slot position). Sends the file in chunks and resends
+  // from the server's offset after a dropped connection. Returns the updated profile.
+  uploadImage: async (file, { target = 'profile_image', position } = {}) => {
+    const { data: upload } = await api.post('/my-profile/uploads/', {
+      target,
+      filename: file.name,
+      size: file.size,
+    })
+    let offset = upload.offset
+    let failures = 0
+    while (offset < file.size) {
+      const end = Math.min(offset + upload.chunk_size, file.size)
+      try {
+        const { data } = await api.put(`/my-profile/uploads/${upload.id}/`, file.slice(offset, end), {
+          headers: {
+            'Content-Type': 'application/octet-stream',
+            'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`,
+          },
+        })
+        offset = data.offset
+        failures = 0
+      } catch (error) {
+        if (error.response?.status === 409) {
+          offset = error.response.data.offset
+        } else if (error.response || ++failures > 5) {
+          throw error
+        } else {
+          // Network error: wait a little, then resend the same chunk
+          await new Promise((resolve) => setTimeout(resolve, 1000 * failures))
+        }
+      }
+    }
+    const { data } = await api.post(
+      `/my-profile/uploads/${upload.id}/complete/`,
+      position === undefined ? {} : { position },
+    )
+    return data
+  },
+
+  // Rolled-up analytics: { totals, series, links }. params: { days, granularity: 'day' | 'hour' }
+  getMyStats: async (params = {}) => {
+    const response = await api.get('/my-profile/stats/', { params })
+    return response.data
+  },
+
+  // Printable card rendered by the backend; format is 'pdf' or 'png'. Returns a Blob.
+  getMyCard: async (format = 'pdf') => {
+    const response = await api.get(`/my-profile/card.${format}`, { responseType: 'blob' })
+    return response.data
+  },
 }
 
 export const adminAPI = {
-  getAllUsers: async () => {
-    const response = await api.get('/admin/users/')
+  // Returns one page: { results, next_cursor }. Pass next_cursor back to get the next page.
+  getAllUsers: async (params = {}) => {
+    const response = await api.get('/admin/users/', { params })
     return response.data
   },
 